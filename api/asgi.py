@@ -0,0 +1,114 @@
+"""ASGI entry point serving the same routes as the Flask app on one long-lived event loop.
+
+Run with:
+
+    uvicorn api.asgi:app --workers 4
+
+Every request in a worker is handled on this loop instead of the fresh loop
+Flask creates per async view. The pooled clients are not bound to it: HTTP
+sessions, the OpenAI client, the per-sender mailboxes and the SMS dispatcher
+each run on their own background loop thread, shared with Flask and the job
+workers, and handlers hand work to them and await the result. Blocking SQLite
+calls (idempotency, job queue, transcription cache) run in threads so they
+never hold this loop. The Flask app in api.routes stays available for WSGI
+deployments.
+"""
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from . import routes
+
+logger = logging.getLogger(__name__)
+
+async def webhook(request: Request) -> Response:
+    form = await request.form()
+    twiml, status_code = await routes.handle_webhook(dict(form))
+    return Response(twiml, status_code=status_code, media_type='text/xml')
+
+async def audio_callback(request: Request) -> Response:
+    raw_body = (await request.body()).decode('utf-8', errors='replace')
+    try:
+        data = json.loads(raw_body)
+    except ValueError:
+        data = None
+    body, status_code = await routes.handle_audio_callback(
+        data, raw_body, request.query_params.get('message_sid'), request.query_params.get('cache_key')
+    )
+    return Response(body, status_code=status_code, media_type='application/json')
+
+# Sync endpoints run in Starlette's threadpool, keeping the blocking Pinecone call off the loop
+def status(request: Request) -> Response:
+    body, status_code = routes.status_report()
+    return JSONResponse(body, status_code=status_code)
+
+def metrics(request: Request) -> Response:
+    return Response(routes.metrics_report(), headers={'Content-Type': routes.METRICS_CONTENT_TYPE})
+
+def root(request: Request) -> Response:
+    body, status_code = routes.health_report()
+    return JSONResponse(body, status_code=status_code)
+
+class LatencyMiddleware:
+    """Record http_request_duration_seconds the same way the Flask hooks do"""
+
+    def __init__(self, app, paths):
+        self.app = app
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status_code = {'value': 500}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status_code['value'] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Only label known routes so unmatched paths can't blow up the label cardinality
+            if scope['path'] in self.paths:
+                routes.REQUEST_LATENCY.observe(
+                    time.perf_counter() - start,
+                    route=scope['path'],
+                    status=str(status_code['value'])
+                )
+
+@asynccontextmanager
+async def lifespan(app):
+    logger.info("ASGI app started")
+    yield
+    # Close the pooled clients and stop their loops
+    await asyncio.to_thread(routes.services.http_client.close)
+    if 'openai_client' in routes.services.built():
+        await asyncio.to_thread(routes.services.openai_client.close)
+    if 'sms_dispatcher' in routes.services.built():
+        await asyncio.to_thread(routes.services.sms_dispatcher.close)
+    logger.info("ASGI app stopped")
+
+ROUTES = [
+    Route('/webhook', webhook, methods=['POST']),
+    Route('/audio-callback', audio_callback, methods=['POST']),
+    Route('/status', status, methods=['GET']),
+    Route('/metrics', metrics, methods=['GET']),
+    Route('/', root, methods=['GET']),
+]
+
+app = Starlette(
+    routes=ROUTES,
+    lifespan=lifespan,
+    middleware=[Middleware(LatencyMiddleware, paths=[route.path for route in ROUTES])]
+)
@@ -0,0 +1,273 @@
+import logging
+import os
+import threading
+
+from . import settings
+
+logger = logging.getLogger(__name__)
+
+class lazy:
+    """Build an attribute on first access and cache it on the instance.
+
+    Builders may depend on other lazy attributes, so the lock is re-entrant.
+    """
+
+    def __init__(self, builder):
+        self.builder = builder
+        self.name = builder.__name__
+        self.__doc__ = builder.__doc__
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        with instance._lock:
+            if self.name not in instance.__dict__:
+                instance.__dict__[self.name] = self.builder(instance)
+        return instance.__dict__[self.name]
+
+class ServiceContainer:
+    """Clients and services, built on first use instead of at import time.
+
+    Importing the app no longer pulls in the OpenAI, Supabase, Twilio and
+    Pinecone SDKs or opens network connections, which keeps serverless cold
+    starts short. Anything a request touches is built the first time it is used.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+
+    def built(self) -> list:
+        """Names of the clients and services built so far"""
+        return sorted(name for name, value in vars(type(self)).items()
+                      if isinstance(value, lazy) and name in self.__dict__)
+
+    @lazy
+    def openai_client(self):
+        from .services.openai_client import OpenAIClientManager
+        # One async client pool shared by the audio, vector, chat and tag services
+        return OpenAIClientManager(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            max_connections=settings.openai_max_connections,
+            max_keepalive_connections=settings.openai_max_keepalive_connections,
+            keepalive_expiry=settings.openai_keepalive_expiry,
+            connect_timeout=settings.openai_connect_timeout,
+            timeout=settings.openai_timeout,
+            http2=settings.openai_http2,
+            max_retries=settings.openai_max_retries
+        )
+
+    @lazy
+    def supabase(self):
+        logger.info("Initializing Supabase client...")
+        from supabase import create_client
+        return create_client(
+            os.environ.get("SUPABASE_URL", ""),
+            os.environ.get("SUPABASE_KEY", "")
+        )
+
+    @lazy
+    def twilio_client(self):
+        from .services.twilio_client import AsyncTwilioClient
+        return AsyncTwilioClient(
+            settings.twilio_account_sid,
+            settings.twilio_auth_token,
+            settings.twilio_phone_number,
+            self.twilio_http_client,
+            base_url=settings.twilio_api_base_url
+        )
+
+    @lazy
+    def vector_service(self):
+        from .services.vector import VectorService
+        try:
+            logger.info(f"Initializing Pinecone index: {settings.pinecone_index}")
+            return VectorService(
+                api_key=settings.pinecone_api_key,
+                index_name=settings.pinecone_index,
+                host=settings.pinecone_host,
+                openai_client=self.openai_client,
+                embedding_cache=self.embedding_cache,
+                embedding_model=settings.embedding_model
+            )
+        except Exception as e:
+            logger.error(f"Failed to initialize Pinecone: {str(e)}")
+            return None
+
+    @lazy
+    def embedding_cache(self):
+        from .services.embedding_cache import EmbeddingCache
+        return EmbeddingCache(
+            memory_bytes=settings.embedding_cache_memory_bytes,
+            path=settings.embedding_cache_path,
+            max_bytes=settings.embedding_cache_max_bytes,
+            dtype=settings.embedding_cache_dtype
+        )
+
+    @lazy
+    def http_client(self):
+        from .services.http_client import HTTPClientManager
+        # Shared connection pool for Twilio media downloads and converter uploads
+        return HTTPClientManager(
+            limit=settings.http_pool_limit,
+            limit_per_host=settings.http_pool_limit_per_host,
+            keepalive_timeout=settings.http_keepalive_timeout,
+            dns_cache_ttl=settings.http_dns_cache_ttl,
+            connect_timeout=settings.http_connect_timeout,
+            total_timeout=settings.http_total_timeout
+        )
+
+    @lazy
+    def twilio_http_client(self):
+        from .services.http_client import HTTPClientManager
+        # Outbound SMS get their own pool so bursts don't queue behind media downloads
+        return HTTPClientManager(
+            limit=settings.twilio_pool_limit,
+            limit_per_host=settings.twilio_pool_limit,
+            keepalive_timeout=settings.http_keepalive_timeout,
+            dns_cache_ttl=settings.http_dns_cache_ttl,
+            connect_timeout=settings.http_connect_timeout,
+            total_timeout=settings.http_total_timeout
+        )
+
+    @lazy
+    def storage_service(self):
+        from .services.storage import StorageService
+        return StorageService(
+            supabase_client=self.supabase,
+            vector_service=self.vector_service
+        )
+
+    @lazy
+    def audio_service(self):
+        from .services.audio import AudioService
+        return AudioService(
+            openai_client=self.openai_client,
+            converter_url=settings.audio_converter_url,
+            http_client=self.http_client,
+            transcoder=self.transcoder,
+            transcription_cache=self.transcription_cache,
+            model=settings.whisper_model,
+            spill_threshold=settings.transcription_spill_bytes,
+            long_audio_seconds=settings.long_audio_seconds,
+            chunk_seconds=settings.transcription_chunk_seconds,
+            chunk_overlap=settings.transcription_chunk_overlap,
+            chunk_concurrency=settings.transcription_chunk_concurrency,
+            admission=self.transcription_admission,
+            preprocess_fraction=settings.audio_preprocess_fraction,
+            preprocess_trim_db=settings.audio_preprocess_trim_db,
+            preprocess_bitrate=settings.audio_preprocess_bitrate,
+            max_audio_bytes=settings.audio_max_bytes
+        )
+
+    @lazy
+    def transcription_admission(self):
+        from .services.admission import AdmissionController
+        return AdmissionController(
+            'transcription',
+            max_concurrent=settings.transcription_max_concurrent,
+            max_waiting=settings.transcription_max_waiting,
+            wait_timeout=settings.transcription_wait_timeout
+        )
+
+    @lazy
+    def transcription_cache(self):
+        from .services.transcription_cache import TranscriptionCache
+        return TranscriptionCache(
+            max_entries=settings.transcription_cache_entries,
+            path=settings.transcription_cache_path,
+            max_bytes=settings.transcription_cache_max_bytes
+        )
+
+    @lazy
+    def transcoder(self):
+        if settings.audio_transcoder != 'local':
+            return None
+        from .services.transcoder import FFmpegTranscoder
+        return FFmpegTranscoder(
+            ffmpeg_path=settings.ffmpeg_path,
+            max_workers=settings.ffmpeg_workers,
+            timeout=settings.ffmpeg_timeout,
+            bitrate=settings.ffmpeg_bitrate
+        )
+
+    @lazy
+    def chat_service(self):
+        from .services.chat import ChatService
+        return ChatService(
+            openai_client=self.openai_client,
+            storage_service=self.storage_service
+        )
+
+    @lazy
+    def tag_service(self):
+        from .services.tags import TagService
+        return TagService(self.storage_service, self.vector_service, openai_client=self.openai_client)
+
+    @lazy
+    def thought_pipeline(self):
+        from .services.pipeline import ThoughtPipeline
+        return ThoughtPipeline(self.storage_service, self.vector_service, self.tag_service)
+
+    @lazy
+    def sms_service(self):
+        from .services.sms import SMSService
+        return SMSService(
+            twilio_client=self.twilio_client,
+            phone_number=settings.twilio_phone_number,
+            audio_service=self.audio_service,
+            storage_service=self.storage_service,
+            chat_service=self.chat_service,
+            tag_service=self.tag_service,
+            pending_store=self.pending_store,
+            dispatcher=self.sms_dispatcher,
+            mailboxes=self.user_mailboxes,
+            segment_budget=settings.sms_segment_budget
+        )
+
+    @lazy
+    def user_mailboxes(self):
+        from .services.mailbox import KeyedExecutor
+        return KeyedExecutor(idle_timeout=settings.user_mailbox_idle_timeout)
+
+    @lazy
+    def sms_dispatcher(self):
+        from .services.dispatcher import OutboundDispatcher
+        return OutboundDispatcher(
+            self.twilio_client,
+            rate_per_second=settings.sms_rate_per_second,
+            burst=settings.sms_burst,
+            workers=settings.sms_dispatch_workers,
+            max_queue=settings.sms_queue_size,
+            max_retries=settings.sms_max_retries,
+            retry_backoff=settings.sms_retry_backoff,
+            rate_limit_path=settings.sms_rate_limit_path
+        )
+
+    @lazy
+    def pending_store(self):
+        from .services.pending import create_pending_store
+        return create_pending_store(
+            settings.pending_store_backend,
+            path=settings.pending_store_path,
+            ttl=settings.pending_ttl,
+            max_entries=settings.pending_max_entries
+        )
+
+    @lazy
+    def job_queue(self):
+        from .services.queue import JobQueue
+        return JobQueue(
+            settings.job_queue_path,
+            visibility_timeout=settings.job_visibility_timeout,
+            max_attempts=settings.job_max_attempts
+        )
+
+    @lazy
+    def idempotency_cache(self):
+        from .services.idempotency import IdempotencyCache
+        return IdempotencyCache(
+            ttl=settings.idempotency_ttl,
+            max_entries=settings.idempotency_max_entries,
+            path=settings.idempotency_db_path
+        )
@@ -0,0 +1,131 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import traceback
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+# Phone numbers as Twilio sends them (E.164), e.g. +17805551234
+PHONE_PATTERN = re.compile(r'\+\d{7,15}\b')
+
+# Structured fields that carry user content and are never written out verbatim
+REDACTED_FIELDS = {'transcription', 'transcript', 'body', 'message', 'response', 'form', 'headers'}
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_listener = None
+_listener_pid = None
+
+def redact_phone(text: str) -> str:
+    """Mask all but the last two digits of any phone number in the text"""
+    def mask(match):
+        number = match.group()
+        return '+' + '*' * (len(number) - 3) + number[-2:]
+    return PHONE_PATTERN.sub(mask, text)
+
+def redact_value(key: str, value):
+    if key in REDACTED_FIELDS and value is not None:
+        return f"<redacted {len(str(value))} chars>"
+    if isinstance(value, str):
+        return redact_phone(value)
+    if isinstance(value, dict):
+        return {k: redact_value(k, v) for k, v in value.items()}
+    return value
+
+class RedactingFormatter(logging.Formatter):
+    """Plain-text formatter that masks phone numbers"""
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        record.message = redact_phone(record.message)
+        return super().formatMessage(record)
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, with extra= fields included and user content redacted"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': redact_phone(record.getMessage()),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = redact_value(key, value)
+        if record.exc_info:
+            entry['exc'] = redact_phone(''.join(traceback.format_exception(*record.exc_info)))
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Drop a fraction of records per event name (extra={'event': ...}).
+
+    Warnings and errors are always kept.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, 'event', None), 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue records without formatting them, leaving all formatting to the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def parse_sample_rates(spec: Optional[str]) -> Dict[str, float]:
+    """Parse 'webhook.received=0.1,audio_callback.received=0.5'"""
+    rates = {}
+    for item in (spec or '').split(','):
+        if '=' in item:
+            event, rate = item.split('=', 1)
+            rates[event.strip()] = float(rate)
+    return rates
+
+def configure_logging(level: str = 'INFO', fmt: str = 'json', sample_rates: Optional[Dict[str, float]] = None) -> None:
+    """Route all logging through a queue so callers never block on stdout"""
+    global _listener, _listener_pid
+    # A forked worker inherits the handler but not the listener thread, so it configures its own
+    if _listener is not None and _listener_pid == os.getpid():
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if fmt == 'json':
+        stream_handler.setFormatter(JSONFormatter())
+    else:
+        stream_handler.setFormatter(RedactingFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rates or {}))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+    atexit.register(stop_logging)
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _listener, _listener_pid
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+        _listener = None
+        _listener_pid = None
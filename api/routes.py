@@ -1,30 +1,29 @@
-from flask import Flask, request, Response, jsonify
-import logging
-import sys
-import os
-from openai import OpenAI
-from supabase import create_client, Client
-import pinecone
-from datetime import datetime
+from flask import Flask, request, Response, g
 import asyncio
+import logging
+import json
+import time
+from typing import Optional
+from urllib.parse import urlencode
 from twilio.twiml.messaging_response import MessagingResponse
-from twilio.rest import Client
 import aiohttp
 
-from .services.audio import AudioService
-from .services.chat import ChatService
-from .services.sms import SMSService
-from .services.storage import StorageService
-from .services.vector import VectorService
-from .services.tags import TagService
+from .container import ServiceContainer
+from .services.admission import AdmissionRejected
+from .services.audio import BUSY_REPLY
+from .services.formats import format_from_content_type, whisper_accepts
+from .services.idempotency import IdempotencyCache
+from .services.metrics import registry, track
+from .services.spool import AUDIO_PEAK_MEMORY, MemoryMeter, check_content_length, limit_stream, spool_stream
+from .services.transcription_cache import TranscriptionCache
+from .logging_config import configure_logging, parse_sample_rates
 from . import settings
 
-# Configure detailed logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    stream=sys.stdout,
-    force=True  # Ensure our config takes precedence
+# Log through a background listener so request handlers never block on stdout
+configure_logging(
+    level=settings.log_level,
+    fmt=settings.log_format,
+    sample_rates=parse_sample_rates(settings.log_sample_rates)
 )
 
 # Create logger for this file
@@ -33,89 +32,39 @@ logger = logging.getLogger(__name__)
 # Initialize Flask
 app = Flask(__name__)
 
-# Initialize clients
-logger.info("Initializing OpenAI client...")
-openai_client = OpenAI(api_key=settings.openai_api_key)
-logger.info("OpenAI client initialized successfully")
+# Clients and services are built on first use to keep cold starts fast
+services = ServiceContainer()
 
-logger.info("Initializing Supabase client...")
-try:
-    supabase: Client = create_client(
-        os.environ.get("SUPABASE_URL", ""),
-        os.environ.get("SUPABASE_KEY", "")
-    )
-    logger.info("Supabase client initialized successfully")
-except Exception as e:
-    logger.error(f"Error initializing Supabase client: {str(e)}")
-    raise
-
-logger.info("Initializing Twilio client...")
-twilio_client = Client(
-    settings.twilio_account_sid,
-    settings.twilio_auth_token
-)
-logger.info("Twilio client initialized successfully")
+def __getattr__(name):
+    """Keep module-level access to services (e.g. routes.chat_service) working"""
+    try:
+        return getattr(services, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Initialize Pinecone
-logger.info("Starting application initialization...")
+REQUEST_LATENCY = registry.histogram(
+    'http_request_duration_seconds',
+    'Time spent handling each route',
+    ('route', 'status')
+)
+JOB_QUEUE_DEPTH = registry.gauge('job_queue_depth', 'Background jobs by state', ('state',))
+JOB_QUEUE_OLDEST = registry.gauge('job_queue_oldest_pending_seconds', 'Age of the oldest pending job')
+HTTP_POOL_CONNECTIONS = registry.gauge('http_pool_connections', 'Pooled outbound HTTP connections', ('state',))
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4'
 
-try:
-    logger.info(f"Initializing Pinecone with API key: {settings.pinecone_api_key[:8]}...")
-    logger.info(f"Index name: {settings.pinecone_index}")
-    logger.info(f"Host: {settings.pinecone_host}")
-    
-    vector_service = VectorService(
-        api_key=settings.pinecone_api_key,
-        index_name=settings.pinecone_index,
-        host=settings.pinecone_host
-    )
-    logger.info("Pinecone initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize Pinecone: {str(e)}")
-    logger.error(f"Error type: {type(e)}")
-    logger.error(f"Error args: {e.args}")
-    vector_service = None
-
-# Initialize services
-logger.info("Initializing services...")
-try:
-    if vector_service is None:
-        logger.warning("Initializing storage service without vector service")
-    else:
-        logger.info("Initializing storage service with vector service")
-    
-    storage_service = StorageService(
-        supabase_client=supabase,
-        vector_service=vector_service
-    )
-    
-    audio_service = AudioService(
-        openai_client=openai_client,
-        converter_url=settings.audio_converter_url
-    )
-    
-    chat_service = ChatService(
-        openai_client=openai_client,
-        storage_service=storage_service
-    )
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
 
-    logger.info("Initializing Tag Service...")
-    tag_service = TagService(storage_service, vector_service)
-    logger.info("Tag Service initialized successfully")
-    
-    sms_service = SMSService(
-        twilio_client=twilio_client,
-        phone_number=settings.twilio_phone_number,
-        audio_service=audio_service,
-        storage_service=storage_service,
-        chat_service=chat_service,
-        tag_service=tag_service
-    )
-    
-    logger.info("All services initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize services: {str(e)}")
-    raise e
+@app.after_request
+def record_latency(response):
+    if 'request_start' in g and request.url_rule is not None:
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - g.request_start,
+            route=request.url_rule.rule,
+            status=str(response.status_code)
+        )
+    return response
 
 def create_twiml_response(message: str) -> Response:
     """Create a TwiML response with the given message"""
@@ -123,101 +72,237 @@ def create_twiml_response(message: str) -> Response:
     resp.message(message)
     return Response(str(resp), mimetype='text/xml')
 
-@app.route("/webhook", methods=['POST'])
-async def webhook():
+async def handle_webhook(form_data: dict) -> tuple:
+    """Handle a Twilio webhook and return (TwiML, status code); shared by the Flask and ASGI apps.
+
+    Voice notes handed to a worker or the converter get an empty reply with 202,
+    and so does a Twilio retry that arrives while the original is still running.
+    """
+    idempotency_key = None
     try:
-        logger.info("Webhook received")
-        logger.info(f"Form data: {request.form.to_dict()}")
+        logger.info("Webhook received", extra={
+            'event': 'webhook.received',
+            'message_sid': form_data.get('MessageSid'),
+            'from_number': form_data.get('From'),
+            'has_media': bool(form_data.get('MediaUrl0'))
+        })
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Webhook form data", extra={'form': form_data})
         
-        form_data = request.form.to_dict()
+        # Twilio retries slow webhooks with the same MessageSid; replay instead of reprocessing
+        if form_data.get('MessageSid'):
+            key = f"webhook:{form_data['MessageSid']}"
+            if not await asyncio.to_thread(services.idempotency_cache.reserve, key):
+                logger.info("Duplicate webhook for %s, replaying response", form_data['MessageSid'])
+                cached = await asyncio.to_thread(services.idempotency_cache.get, key)
+                if cached is None:
+                    # The original is still being processed and will answer for both
+                    return str(MessagingResponse()), 202
+                return cached, 200
+            idempotency_key = key
+        
+        status_code = 200
         
         # Branch 1: Audio Message
-        if request.form.get('MediaUrl0'):
+        if form_data.get('MediaUrl0') and (
+            settings.audio_transcoder == 'local'
+            or whisper_accepts(format_from_content_type(form_data.get('MediaContentType0')))
+        ):
+            # Transcode in the worker pool, or skip conversion for formats Whisper reads
+            # natively; either way no converter round trip or callback is needed
+            logger.info("Audio message detected, processing locally")
+            payload = {
+                'from_number': form_data.get('From'),
+                'media_url': form_data.get('MediaUrl0'),
+                'content_type': form_data.get('MediaContentType0')
+            }
+            if form_data.get('MessageSid'):
+                payload['message_sid'] = form_data['MessageSid']
+            if await dispatch_job('voice_note', payload) is not None:
+                status_code = 202
+            twiml = str(MessagingResponse())
+        elif form_data.get('MediaUrl0'):
             logger.info("Audio message detected")
-            await forward_to_rails_processor(
-                from_number=form_data.get('From'),
-                media_url=request.form.get('MediaUrl0'),
-                content_type=request.form.get('MediaContentType0')
+            try:
+                await forward_to_rails_processor(
+                    from_number=form_data.get('From'),
+                    media_url=form_data.get('MediaUrl0'),
+                    content_type=form_data.get('MediaContentType0'),
+                    message_sid=form_data.get('MessageSid')
+                )
+            except AdmissionRejected:
+                # Shed under load: tell the sender now rather than leave them waiting
+                twiml = MessagingResponse()
+                twiml.message(BUSY_REPLY)
+                twiml = str(twiml)
+            else:
+                logger.info("Audio forwarded to Rails")
+                status_code = 202
+                twiml = str(MessagingResponse())
+        else:
+            # Branch 2: Text Message
+            logger.info("Text message detected")
+            # Answer after any earlier message from the same sender has been handled
+            response = await services.user_mailboxes.run(
+                form_data.get('From'), reply_to_text, form_data.get('From'), form_data.get('Body')
             )
-            logger.info("Audio forwarded to Rails")
-            return Response(str(MessagingResponse()), mimetype='text/xml')
             
-        # Branch 2: Text Message
-        logger.info("Text message detected")
-        response = await chat_service.process_message(
-            user_phone=form_data.get('From'),
-            message=form_data.get('Body')
-        )
-        logger.info(f"Generated response: {response}")
-        
-        # Store both the user message and response in chat history
-        await storage_service.store_chat_message(
-            message=form_data.get('Body'),
-            from_number=form_data.get('From'),
-            response=response
-        )
-        logger.info("Chat messages stored in database")
+            # Create TwiML response
+            twiml = MessagingResponse()
+            twiml.message(response)
+            twiml = str(twiml)
         
-        # Create TwiML response
-        twiml = MessagingResponse()
-        twiml.message(response)
-        return Response(str(twiml), mimetype='text/xml')
+        if idempotency_key:
+            await asyncio.to_thread(services.idempotency_cache.put, idempotency_key, twiml)
+        return twiml, status_code
 
     except Exception as e:
-        logger.error(f"Webhook error: {str(e)}", exc_info=True)
+        logger.error("Webhook error: %s", e, exc_info=True)
+        if idempotency_key:
+            await asyncio.to_thread(services.idempotency_cache.release, idempotency_key)
         twiml = MessagingResponse()
         twiml.message(
             "I apologize, but I encountered an error. Please try again."
         )
-        return Response(str(twiml), mimetype='text/xml')
-
-async def forward_to_rails_processor(from_number: str, media_url: str, content_type: str):
-    """Forward audio processing request to Rails"""
-    async with aiohttp.ClientSession() as session:
-        # Add Twilio authentication when downloading the audio file
-        auth = aiohttp.BasicAuth(
-            login=settings.twilio_account_sid,
-            password=settings.twilio_auth_token
+        return str(twiml), 200
+
+@app.route("/webhook", methods=['POST'])
+async def webhook():
+    twiml, status_code = await handle_webhook(request.form.to_dict())
+    return Response(twiml, status=status_code, mimetype='text/xml')
+
+async def reply_to_text(from_number: str, body: str) -> str:
+    """Answer a text message from the user's thoughts and record the exchange"""
+    response = await services.chat_service.process_message(user_phone=from_number, message=body)
+    logger.info("Generated chat response", extra={'event': 'chat.response', 'response': response})
+    
+    # Store both the user message and response in chat history
+    await services.storage_service.store_chat_message(message=body, from_number=from_number, response=response)
+    logger.info("Chat messages stored in database")
+    return response
+
+async def dispatch_job(kind: str, payload: dict) -> Optional[int]:
+    """Queue a job for api.worker, or run it before returning when no worker drains the queue.
+
+    Returns the job id when queued and None when the job already ran. Either way
+    jobs for one sender run in order: the queue orders them by from_number, and
+    inline jobs go through that sender's mailbox.
+    """
+    if settings.job_worker:
+        # The queue's SQLite write can wait on another process's lock, so it runs off the loop
+        return await asyncio.to_thread(services.job_queue.enqueue, kind, payload)
+    logger.info("No job worker configured, running %s inline", kind)
+    await services.user_mailboxes.run(payload['from_number'], JOB_HANDLERS[kind], payload)
+    return None
+
+def audio_callback_url(message_sid: Optional[str] = None, cache_key: Optional[str] = None) -> str:
+    """Where the converter posts the transcription; the MessageSid and cache key ride along in the query string"""
+    url = settings.audio_callback_url or f"https://{settings.vercel_url}/audio-callback"
+    params = {name: value for name, value in (('message_sid', message_sid), ('cache_key', cache_key)) if value}
+    if not params:
+        return url
+    return url + ('&' if '?' in url else '?') + urlencode(params)
+
+async def forward_to_rails_processor(from_number: str, media_url: str, content_type: str,
+                                     message_sid: Optional[str] = None):
+    """Forward audio processing request to Rails, raising AdmissionRejected when too many are in flight"""
+    # Relays share the transcription slots, so a burst is shed before it reaches the converter.
+    # The pooled session lives on the HTTP client's own loop, so the relay runs there.
+    async with services.transcription_admission.slot():
+        cached = await services.http_client.run(
+            lambda session: relay_to_converter(session, from_number, media_url, content_type, message_sid)
         )
-        
+    if cached is not None:
+        logger.info("Transcription cache hit, skipping the converter")
+        payload = {'from_number': from_number, 'transcription': cached}
+        if message_sid:
+            payload['message_sid'] = message_sid
+        await dispatch_job('audio_callback', payload)
+
+async def relay_to_converter(session, from_number: str, media_url: str, content_type: str,
+                             message_sid: Optional[str] = None) -> Optional[str]:
+    """Download the Twilio media and upload it to the converter on the pooled session.
+
+    A buffered relay checks the transcription cache first and returns the cached
+    transcript instead of uploading; a streamed relay never sees the whole clip,
+    so it always uploads and returns None.
+    """
+    # Add Twilio authentication when downloading the audio file
+    auth = aiohttp.BasicAuth(
+        login=settings.twilio_account_sid,
+        password=settings.twilio_auth_token
+    )
+    
+    meter = MemoryMeter()
+    audio = None
+    cache_key = None
+    
+    try:
         # Download audio with authentication
         async with session.get(media_url, auth=auth) as response:
             if response.status != 200:
-                logger.error(f"Failed to download audio from Twilio: {await response.text()}")
+                logger.error("Failed to download audio from Twilio: %s", await response.text())
                 raise Exception("Failed to download audio from Twilio")
-            
-            audio_data = await response.read()
+            check_content_length(response.content_length, settings.audio_max_bytes)
         
-        # Prepare the file upload
-        form_data = aiohttp.FormData()
-        form_data.add_field('audio',
-                          audio_data,
-                          filename='audio.amr',
-                          content_type=content_type)
-        form_data.add_field('callback_url', f"https://{settings.vercel_url}/audio-callback")
-        form_data.add_field('from_number', from_number)
+            if settings.media_relay_streaming:
+                # Pipe the download into the upload so only one chunk is held in memory.
+                # The download then overlaps with (and is timed as part of) converter_post.
+                audio_data = limit_stream(
+                    response.content.iter_chunked(settings.media_relay_chunk_size), settings.audio_max_bytes, meter
+                )
+            else:
+                with track('media_download'):
+                    audio = await spool_stream(
+                        response.content.iter_chunked(settings.media_relay_chunk_size),
+                        settings.transcription_spill_bytes, settings.audio_max_bytes, meter
+                    )
+                cache_key = TranscriptionCache.key_from_digest(audio.sha256, settings.whisper_model)
+                cached = await asyncio.to_thread(services.transcription_cache.get, cache_key)
+                if cached is not None:
+                    return cached
+                audio_data = audio.file()
         
-        # Send to converter service using the Node.js endpoint
-        async with session.post(
-            f"{settings.audio_converter_url}/convert",
-            data=form_data
-        ) as response:
-            if response.status != 200:
-                logger.error(f"Failed to forward to Rails: {await response.text()}")
-                raise Exception("Failed to forward audio processing")
+            # Prepare the file upload
+            form_data = aiohttp.FormData()
+            form_data.add_field('audio',
+                              audio_data,
+                              filename='audio.amr',
+                              content_type=content_type)
+            # The callback stores the transcription under the key computed here
+            form_data.add_field('callback_url', audio_callback_url(message_sid, cache_key))
+            form_data.add_field('from_number', from_number)
+        
+            # Send to converter service using the Node.js endpoint
+            async with track('converter_post'), session.post(
+                f"{settings.audio_converter_url}/convert",
+                data=form_data
+            ) as converter_response:
+                if converter_response.status != 200:
+                    logger.error("Failed to forward to Rails: %s", await converter_response.text())
+                    raise Exception("Failed to forward audio processing")
+    finally:
+        if audio is not None:
+            audio.close()
+        AUDIO_PEAK_MEMORY.observe(meter.peak, path='relay')
 
-@app.route('/status', methods=['GET'])
-def status():
+def status_report() -> tuple:
     """Check service status"""
     try:
         status = {
             'pinecone': False,
             'vector_service': False,
-            'stats': None
+            'stats': None,
+            'queue': services.job_queue.stats(),
+            'http_pool': services.http_client.stats(),
+            'transcription_admission': services.transcription_admission.stats(),
+            'initialized': services.built()
         }
         
-        if vector_service:
+        if services.vector_service:
             status['vector_service'] = True
+        if 'embedding_cache' in services.built():
+            status['embedding_cache'] = services.embedding_cache.stats()
             
         return status, 200
         
@@ -225,13 +310,28 @@ def status():
         logger.error(f"Status check failed: {str(e)}")
         return {'error': str(e)}, 500
 
-@app.route('/', methods=['GET'])
-def root():
+def metrics_report() -> str:
+    """Prometheus text for the scrape endpoint"""
+    try:
+        queue_stats = services.job_queue.stats()
+        for state in ('pending', 'running', 'dead'):
+            JOB_QUEUE_DEPTH.set(queue_stats.get(state, 0), state=state)
+        JOB_QUEUE_OLDEST.set(queue_stats['oldest_pending_age'])
+    except Exception as e:
+        logger.error(f"Failed to collect queue stats: {str(e)}")
+    
+    pool_stats = services.http_client.stats()
+    HTTP_POOL_CONNECTIONS.set(pool_stats['connections_in_use'], state='in_use')
+    HTTP_POOL_CONNECTIONS.set(pool_stats['connections_idle'], state='idle')
+    
+    return registry.render()
+
+def health_report() -> tuple:
     """Basic health check"""
     try:
         stats = None
-        if vector_service:
-            stats = vector_service.pinecone_index.describe_index_stats()
+        if services.vector_service:
+            stats = services.vector_service.verify()
             # Convert stats to a serializable format
             stats = {
                 'dimension': stats.get('dimension'),
@@ -246,86 +346,132 @@ def root():
         return {
             'status': 'healthy',
             'pinecone_stats': stats if stats else None
-        }
+        }, 200
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
         return {'status': 'error', 'message': str(e)}, 500
 
-@app.route("/audio-callback", methods=['POST'])
-async def audio_callback():
-    logger.info("Received request to /audio-callback")
-    logger.info(f"Request headers: {dict(request.headers)}")
-    logger.info(f"Request data: {request.get_data(as_text=True)}")
+@app.route('/status', methods=['GET'])
+def status():
+    """Check service status"""
+    return status_report()
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics_report(), mimetype=METRICS_CONTENT_TYPE)
+
+@app.route('/', methods=['GET'])
+def root():
+    """Basic health check"""
+    return health_report()
+
+async def handle_audio_callback(data: Optional[dict], raw_body: str = '', message_sid: Optional[str] = None,
+                                cache_key: Optional[str] = None) -> tuple:
+    """Validate and queue a converter callback; returns (JSON body, status code)"""
+    logger.info("Received request to /audio-callback", extra={'event': 'audio_callback.received'})
     
     try:
-        data = request.json
-        logger.info(f"Parsed JSON data: {data}")
+        if not isinstance(data, dict):
+            logger.error("Audio callback body is not a JSON object")
+            return json.dumps({'status': 'error', 'message': 'Expected a JSON object'}), 400
         
         if not data.get('transcription'):
             logger.error("Missing transcription in request data")
-            return jsonify({'status': 'error', 'message': 'Missing transcription'}), 400
+            return json.dumps({'status': 'error', 'message': 'Missing transcription'}), 400
             
         if not data.get('from_number'):
             logger.error("Missing from_number in request data")
-            return jsonify({'status': 'error', 'message': 'Missing from_number'}), 400
+            return json.dumps({'status': 'error', 'message': 'Missing from_number'}), 400
         
-        # Store in Supabase
-        logger.info(f"Storing thought in Supabase for user: {data['from_number']}")
-        thought_record = await storage_service.store_thought(
-            data['from_number'],
-            data['transcription']
-        )
-        logger.info(f"Successfully stored thought record: {thought_record}")
+        # A buffered relay keyed the clip before uploading it; a resent voice note then skips the converter
+        if cache_key:
+            await asyncio.to_thread(services.transcription_cache.put, cache_key, data['transcription'])
         
-        # Store embedding in Pinecone
-        if vector_service:
-            logger.info("Storing embedding in Pinecone")
-            metadata = {
-                'user_phone': data['from_number'],
-                'thought_id': thought_record['id'],
-                'created_at': thought_record['created_at']
-            }
-            logger.info(f"Embedding metadata: {metadata}")
-            await vector_service.store_embedding(
-                data['transcription'],
-                metadata=metadata,
-                phone_number=data['from_number']
-            )
-            logger.info("Successfully stored embedding in Pinecone")
-        else:
-            logger.warning("Vector service not available - skipping embedding storage")
-        
-        # Generate tag suggestions
-        logger.info("Generating tag suggestions")
-        try:
-            suggested_tags = await tag_service.suggest_tags(
-                transcription=data['transcription'],
-                user_phone=data['from_number']
-            )
-            logger.info(f"Generated tag suggestions: {suggested_tags}")
-        except Exception as e:
-            logger.error(f"Failed to generate tag suggestions: {str(e)}")
-            suggested_tags = []
-        
-        # Store thought ID for tag confirmation
-        sms_service._store_pending_thought(data['from_number'], thought_record['id'])
-        
-        # Send transcription and tag suggestions
-        message = (
-            f"I've recorded your thought! Here's what I heard: {data['transcription']}\n\n"
-            f"Suggested tags: {', '.join(suggested_tags)}\n"
-            "Reply with your chosen tags (comma-separated) or 'skip' to skip tagging."
-        )
+        # The converter retries callbacks too; only queue each transcription once
+        key = 'audio-callback:' + IdempotencyCache.hash_key(data['from_number'], data['transcription'])
+        if not await asyncio.to_thread(services.idempotency_cache.reserve, key):
+            logger.info("Duplicate audio callback, replaying response")
+            cached = await asyncio.to_thread(services.idempotency_cache.get, key)
+            if cached is None:
+                return json.dumps({'status': 'processing'}), 202
+            return cached, 200 if json.loads(cached)['status'] == 'processed' else 202
         
-        logger.info(f"Sending SMS response to {data['from_number']}")
-        await sms_service.send_message(data['from_number'], message)
-        logger.info("Successfully sent SMS response")
+        payload = {
+            'from_number': data['from_number'],
+            'transcription': data['transcription']
+        }
+        if message_sid:
+            payload['message_sid'] = message_sid
         
-        logger.info("Audio callback processing completed successfully")
-        return jsonify({'status': 'success'})
+        # Hand the slow work to the worker pool so the converter isn't kept waiting
+        try:
+            job_id = await dispatch_job('audio_callback', payload)
+        except Exception:
+            await asyncio.to_thread(services.idempotency_cache.release, key)
+            raise
+        if job_id is None:
+            body, status_code = json.dumps({'status': 'processed'}), 200
+        else:
+            body, status_code = json.dumps({'status': 'queued', 'job_id': job_id}), 202
+        await asyncio.to_thread(services.idempotency_cache.put, key, body)
+        return body, status_code
         
     except Exception as e:
-        logger.error(f"Error in audio callback: {str(e)}")
-        logger.error(f"Stack trace: {e.__traceback__}")
-        logger.error(f"Request data that caused error: {request.get_data(as_text=True)}")
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+        logger.error("Error in audio callback: %s", e, exc_info=True, extra={'body': raw_body})
+        return json.dumps({'status': 'error', 'message': str(e)}), 500
+
+@app.route("/audio-callback", methods=['POST'])
+async def audio_callback():
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Audio callback request", extra={
+            'headers': dict(request.headers),
+            'body': request.get_data(as_text=True)
+        })
+    body, status_code = await handle_audio_callback(
+        request.get_json(silent=True),
+        request.get_data(as_text=True),
+        request.args.get('message_sid'),
+        request.args.get('cache_key')
+    )
+    return Response(body, status=status_code, mimetype='application/json')
+
+async def process_audio_callback(data: dict) -> None:
+    """Store, embed, tag and reply to a transcribed thought (runs in a worker)"""
+    # Storing, embedding and tagging only need the transcription, so run them together
+    logger.info("Running thought pipeline for user: %s", data['from_number'])
+    result = await services.thought_pipeline.run(
+        data['from_number'], data['transcription'], message_sid=data.get('message_sid')
+    )
+    thought_record = result['thought']
+    suggested_tags = result['tags']
+    logger.info("Stored thought %s with tag suggestions %s", thought_record['id'], suggested_tags)
+    
+    # Store thought ID for tag confirmation
+    services.sms_service._store_pending_thought(data['from_number'], thought_record['id'])
+    
+    # Send transcription and tag suggestions, trimmed to the segment budget
+    message = services.sms_service.compose_thought_reply(data['transcription'], suggested_tags)
+    
+    logger.info("Sending SMS response to %s", data['from_number'])
+    await services.sms_service.send_message(data['from_number'], message)
+    logger.info("Successfully sent SMS response")
+    
+    logger.info("Audio callback processing completed successfully")
+
+async def process_voice_note(data: dict) -> None:
+    """Download, transcode and transcribe a voice note locally, then handle it like a converter callback"""
+    transcription = await services.audio_service.transcribe_media(
+        data['media_url'], data['content_type'], data['from_number']
+    )
+    await process_audio_callback({
+        'from_number': data['from_number'],
+        'transcription': transcription,
+        'message_sid': data.get('message_sid')
+    })
+
+# Job kinds drained by api.worker, or run inline by dispatch_job
+JOB_HANDLERS = {
+    'audio_callback': process_audio_callback,
+    'voice_note': process_voice_note,
+}
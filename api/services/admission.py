@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_QUEUE_TIME = registry.histogram('admission_queue_seconds', 'Time work waited for an admission slot', ('workload',))
+ADMISSION_SERVICE_TIME = registry.histogram('admission_service_seconds', 'Time work held an admission slot', ('workload',))
+ADMISSION_ACTIVE = registry.gauge('admission_active', 'Work currently holding an admission slot', ('workload',))
+ADMISSION_WAITING = registry.gauge('admission_waiting', 'Work waiting for an admission slot', ('workload',))
+ADMISSION_REJECTED = registry.counter('admission_rejected_total', 'Work shed by admission control', ('workload', 'reason'))
+
+class AdmissionRejected(Exception):
+    """Work was shed because the wait queue was full or its deadline passed"""
+
+    def __init__(self, workload: str, reason: str):
+        super().__init__(f"{workload} rejected: {reason}")
+        self.workload = workload
+        self.reason = reason
+
+class _Waiter:
+    __slots__ = ('loop', 'future', 'granted')
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+
+class AdmissionController:
+    """Caps concurrent work and queues a bounded number of callers behind it.
+
+    At most `max_concurrent` callers hold a slot; up to `max_waiting` more wait
+    in FIFO order for at most `wait_timeout` seconds. Anything beyond that is
+    rejected at once, so a burst is shed at the door instead of slowing every
+    request down. Slots are handed over under a thread lock, so one controller
+    bounds the whole process even when requests run on different event loops.
+    """
+
+    def __init__(self, workload: str, max_concurrent: int = 8, max_waiting: int = 32, wait_timeout: float = 10.0):
+        self.workload = workload
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self._active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        logger.info(f"Admission control for {workload}: {max_concurrent} concurrent, {max_waiting} waiting, {wait_timeout}s deadline")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'active': self._active, 'waiting': len(self._waiters), 'max_concurrent': self.max_concurrent}
+
+    def _update_gauges(self) -> None:
+        ADMISSION_ACTIVE.set(self._active, workload=self.workload)
+        ADMISSION_WAITING.set(len(self._waiters), workload=self.workload)
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        ADMISSION_REJECTED.inc(workload=self.workload, reason=reason)
+        logger.warning("Shedding %s work: %s", self.workload, reason)
+        return AdmissionRejected(self.workload, reason)
+
+    async def acquire(self) -> None:
+        with self._lock:
+            if self._active < self.max_concurrent and not self._waiters:
+                self._active += 1
+                self._update_gauges()
+                return
+            if len(self._waiters) >= self.max_waiting:
+                raise self._reject('queue_full')
+            waiter = _Waiter(asyncio.get_running_loop())
+            self._waiters.append(waiter)
+            self._update_gauges()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.wait_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                if not waiter.granted:
+                    self._waiters.remove(waiter)
+                    self._update_gauges()
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise self._reject('deadline') from None
+                    raise
+            # The slot was handed over as the wait ended; keep it unless cancelled
+            if isinstance(e, asyncio.CancelledError):
+                self.release()
+                raise
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                try:
+                    waiter.loop.call_soon_threadsafe(self._wake, waiter.future)
+                except RuntimeError:
+                    # The waiter's loop has closed; pass the slot to the next one
+                    continue
+                # The slot moves straight to the waiter, so the active count is unchanged
+                waiter.granted = True
+                break
+            else:
+                self._active -= 1
+            self._update_gauges()
+
+    @staticmethod
+    def _wake(future: asyncio.Future) -> None:
+        if not future.done():
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold a slot for the body of the block, recording queue and service time"""
+        queued_at = time.perf_counter()
+        await self.acquire()
+        started_at = time.perf_counter()
+        ADMISSION_QUEUE_TIME.observe(started_at - queued_at, workload=self.workload)
+        try:
+            yield
+        finally:
+            ADMISSION_SERVICE_TIME.observe(time.perf_counter() - started_at, workload=self.workload)
+            self.release()
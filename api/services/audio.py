@@ -1,21 +1,75 @@
 import logging
+import random
 import tempfile
+import time
 import aiohttp
 import os
-from typing import Optional
-from openai import OpenAI
-import requests
+from typing import Optional, Union
 import asyncio
-from api.config import get_settings
+from .http_client import HTTPClientManager
+from .admission import AdmissionController, AdmissionRejected
+from .chunking import pcm_to_wav, plan_chunks, stitch
+from .formats import format_from_content_type, sniff_format, whisper_accepts
+from .metrics import registry, track
+from .openai_client import OpenAIClientManager
+from .spool import AUDIO_PEAK_MEMORY, AudioTooLarge, MemoryMeter, SpooledAudio, check_content_length, spool_stream
+from .transcoder import FFmpegTranscoder, TranscodeError
+from .transcription_cache import TranscriptionCache
 
 logger = logging.getLogger(__name__)
 
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+BUSY_REPLY = ("I'm getting a lot of voice notes right now and couldn't get to yours. "
+              "Could you send it again in a minute or send your thought as text?")
+
+PREPROCESS_BYTES = registry.counter('audio_preprocess_bytes_total', 'Audio bytes into and out of pre-processing', ('stage',))
+UPLOAD_LATENCY = registry.histogram(
+    'transcription_upload_seconds',
+    'Whisper latency per clip, split by whether the clip was pre-processed',
+    ('preprocessed',)
+)
+
 class AudioService:
-    def __init__(self, openai_client, converter_url: str):
-        self.client = openai_client
+    def __init__(self, openai_client: Optional[OpenAIClientManager], converter_url: str,
+                 http_client: Optional[HTTPClientManager] = None,
+                 transcoder: Optional[FFmpegTranscoder] = None,
+                 transcription_cache: Optional[TranscriptionCache] = None, model: str = 'whisper-1',
+                 spill_threshold: int = 8 * 1024 * 1024, long_audio_seconds: float = 0,
+                 chunk_seconds: float = 30.0, chunk_overlap: float = 1.0, chunk_concurrency: int = 4,
+                 admission: Optional[AdmissionController] = None, preprocess_fraction: float = 0,
+                 preprocess_trim_db: int = -45, preprocess_bitrate: str = '16k',
+                 max_audio_bytes: Optional[int] = None):
+        self.openai = openai_client
         self.converter_url = converter_url
+        self.http = http_client or HTTPClientManager()
+        # A local ffmpeg pool replaces the round trip to the converter service when configured
+        self.transcoder = transcoder
+        # Duplicate clips are answered from here without converting or calling Whisper
+        self.transcription_cache = transcription_cache
+        self.model = model
+        # Each clip lives in one buffer that spills to a temp file above spill_threshold bytes;
+        # downloads and converter responses over max_audio_bytes are cut off
+        self.spill_threshold = spill_threshold
+        self.max_audio_bytes = max_audio_bytes
+        # Clips longer than long_audio_seconds are split at silences and transcribed in parallel;
+        # splitting needs the decoded audio, so it only runs with the local transcoder
+        self.long_audio_seconds = long_audio_seconds if transcoder else 0
+        self.chunk_seconds = chunk_seconds
+        self.chunk_overlap = chunk_overlap
+        self.chunk_concurrency = chunk_concurrency
+        # Bounds how many clips are converted and transcribed at once; the rest queue or are shed
+        self.admission = admission
+        # Share of clips downmixed, resampled, silence-trimmed and re-encoded as Opus before upload.
+        # Anything between 0 and 1 samples clips so the two latency series can be compared.
+        self.preprocess_fraction = preprocess_fraction if transcoder else 0
+        self.preprocess_trim_db = preprocess_trim_db
+        self.preprocess_bitrate = preprocess_bitrate
         self.base_url = os.getenv('BASE_URL')
-        logger.info(f"Audio service initialized with converter URL: {converter_url}")
+        if transcoder:
+            logger.info("Audio service initialized with local ffmpeg transcoding")
+        else:
+            logger.info(f"Audio service initialized with converter URL: {converter_url}")
 
     async def process_audio(self, url: str, content_type: str, from_number: str) -> Optional[str]:
         """Process audio file from URL and return transcription"""
@@ -23,25 +77,13 @@ class AudioService:
             if not content_type:
                 logger.error("No content type provided")
                 return None
-            
-            # Create aiohttp session for async requests
-            async with aiohttp.ClientSession() as session:
-                # Download audio with Twilio auth
-                audio_data = await self._download_audio(session, url)
-                if not audio_data:
-                    return None
-                
-                # Convert to MP3 with timeout
-                mp3_data = await self._convert_audio(session, audio_data, timeout=25, from_number=from_number)
-                if not mp3_data:
-                    return None
-                
-                # Transcribe with timeout
-                return await asyncio.wait_for(
-                    self._transcribe_audio(mp3_data, timeout=None),
-                    timeout=25
-                )
+            return await self.transcribe_media(url, content_type, from_number)
                 
+        except AudioTooLarge as e:
+            logger.warning(str(e))
+            return "That voice note is too large for me to process. Could you send a shorter one or send your thought as text?"
+        except AdmissionRejected:
+            return BUSY_REPLY
         except asyncio.TimeoutError:
             logger.error("Audio processing timed out")
             return "I'm sorry, but the audio message took too long to process. Could you try sending a shorter message or sending your thought as text?"
@@ -49,7 +91,156 @@ class AudioService:
             logger.error(f"Error processing audio: {str(e)}")
             return "I apologize, but I encountered an error processing your audio message. Could you try again or send your thought as text?"
 
-    async def _download_audio(self, session, url):
+    async def transcribe_media(self, url: str, content_type: str, from_number: str) -> str:
+        """Download, convert and transcribe a voice note, raising on any failure"""
+        meter = MemoryMeter()
+        try:
+            # Download audio with Twilio auth on the pooled session, skipping the TCP+TLS handshakes
+            audio = await self.http.run(lambda session: self._download_audio(session, url, meter))
+            if audio is None:
+                raise Exception("Failed to download audio")
+            
+            with audio:
+                cache_key = None
+                if self.transcription_cache:
+                    cache_key = TranscriptionCache.key_from_digest(audio.sha256, self.model)
+                    cached = self.transcription_cache.get(cache_key)
+                    if cached is not None:
+                        logger.info("Transcription cache hit, skipping conversion and Whisper")
+                        return cached
+                
+                if self.admission:
+                    async with self.admission.slot():
+                        transcription = await self._transcribe_downloaded(audio, content_type, from_number, meter)
+                else:
+                    transcription = await self._transcribe_downloaded(audio, content_type, from_number, meter)
+                if cache_key and transcription:
+                    self.transcription_cache.put(cache_key, transcription)
+                return transcription
+        finally:
+            AUDIO_PEAK_MEMORY.observe(meter.peak, path='transcribe')
+
+    async def _transcribe_downloaded(self, audio: SpooledAudio, content_type: str, from_number: str,
+                                     meter: MemoryMeter) -> str:
+        if self.long_audio_seconds:
+            transcription = await self._transcribe_if_long(audio, meter)
+            if transcription is not None:
+                return transcription
+        
+        if self.preprocess_fraction and random.random() < self.preprocess_fraction:
+            transcription = await self._transcribe_preprocessed(audio, meter)
+            if transcription is not None:
+                return transcription
+        
+        # MP3, M4A, OGG, WAV and WebM go to Whisper as they are
+        fmt = sniff_format(audio.head)
+        if whisper_accepts(fmt):
+            logger.info("Audio is already %s, skipping conversion", fmt)
+            return await asyncio.wait_for(
+                self._transcribe_audio(audio, timeout=None, filename=f'audio.{fmt}'),
+                timeout=25
+            )
+        
+        # Convert to MP3 with timeout
+        mp3_data = await self.convert(audio, content_type, from_number, meter)
+        if not mp3_data:
+            raise Exception("Audio conversion returned no data")
+        
+        # Transcribe with timeout
+        try:
+            return await asyncio.wait_for(
+                self._transcribe_audio(mp3_data, timeout=None),
+                timeout=25
+            )
+        finally:
+            if isinstance(mp3_data, SpooledAudio):
+                mp3_data.close()
+            else:
+                meter.sub(len(mp3_data))
+
+    async def _transcribe_if_long(self, audio: SpooledAudio, meter: MemoryMeter) -> Optional[str]:
+        """Split and transcribe a long clip; None sends it down the single-shot path instead"""
+        # Probing reads the header, so short clips are never decoded to PCM
+        duration = await self.transcoder.probe_duration(audio)
+        if duration is None or duration <= self.long_audio_seconds:
+            return None
+        pcm_bytes = int(duration * self.transcoder.sample_rate) * 2
+        if self.max_audio_bytes and pcm_bytes > self.max_audio_bytes:
+            logger.warning("%.0fs clip would decode past the audio size cap, transcribing it whole", duration)
+            return None
+        try:
+            pcm, silences = await self.transcoder.decode(audio)
+        except TranscodeError as e:
+            # e.g. an M4A with its index at the end can't be decoded from a pipe
+            logger.warning("Could not decode long clip, transcribing it whole: %s", e)
+            return None
+        meter.add(len(pcm))
+        try:
+            return await self._transcribe_long(pcm, silences, len(pcm) / (2 * self.transcoder.sample_rate))
+        finally:
+            meter.sub(len(pcm))
+
+    async def _transcribe_preprocessed(self, audio_data: SpooledAudio, meter: MemoryMeter) -> Optional[str]:
+        """Shrink the clip with the local transcoder, then transcribe it; None sends it down the usual path"""
+        try:
+            ogg_data = await self.transcoder.preprocess(audio_data, self.preprocess_trim_db, self.preprocess_bitrate)
+        except TranscodeError as e:
+            logger.warning("Could not pre-process clip, transcribing it as is: %s", e)
+            return None
+        meter.add(len(ogg_data))
+        try:
+            PREPROCESS_BYTES.inc(len(audio_data), stage='input')
+            PREPROCESS_BYTES.inc(len(ogg_data), stage='output')
+            start = time.perf_counter()
+            transcription = await asyncio.wait_for(
+                self._transcribe_audio(ogg_data, timeout=None, filename='audio.ogg', preprocessed=True),
+                timeout=25
+            )
+            logger.info("Pre-processed clip transcribed", extra={
+                'event': 'audio.preprocessed',
+                'bytes_in': len(audio_data),
+                'bytes_out': len(ogg_data),
+                'bytes_saved': len(audio_data) - len(ogg_data),
+                'transcription_seconds': round(time.perf_counter() - start, 3)
+            })
+            return transcription
+        finally:
+            meter.sub(len(ogg_data))
+
+    async def _transcribe_long(self, pcm: bytes, silences, duration: float) -> str:
+        """Transcribe overlapping chunks concurrently and stitch the text back together"""
+        sample_rate = self.transcoder.sample_rate
+        spans = plan_chunks(duration, silences, target=self.chunk_seconds, overlap=self.chunk_overlap)
+        logger.info("Transcribing %.0fs of audio in %d chunks", duration, len(spans))
+        semaphore = asyncio.Semaphore(self.chunk_concurrency)
+        pcm_view = memoryview(pcm)
+
+        async def transcribe_chunk(begin: float, end: float) -> str:
+            async with semaphore:
+                # Built inside the slot, so only chunk_concurrency WAV copies exist at once
+                wav = pcm_to_wav(pcm_view[int(begin * sample_rate) * 2:int(end * sample_rate) * 2], sample_rate)
+                # Each chunk gets the per-clip timeout, so total latency tracks the slowest chunk
+                return await asyncio.wait_for(
+                    self._transcribe_audio(wav, timeout=None, filename='audio.wav'),
+                    timeout=25
+                )
+
+        texts = await asyncio.gather(*(transcribe_chunk(begin, end) for begin, end in spans))
+        return stitch(texts)
+
+    async def convert(self, audio_data: Union[bytes, SpooledAudio], content_type: str, from_number: str,
+                      meter: Optional[MemoryMeter] = None) -> Union[bytes, SpooledAudio]:
+        """Convert to MP3 locally when a transcoder is configured, otherwise via the converter service"""
+        if self.transcoder:
+            mp3_data = await self.transcoder.transcode(audio_data)
+            if meter:
+                meter.add(len(mp3_data))
+            return mp3_data
+        return await self.http.run(
+            lambda session: self._convert_audio(session, audio_data, timeout=25, from_number=from_number, meter=meter)
+        )
+
+    async def _download_audio(self, session, url, meter: Optional[MemoryMeter] = None) -> Optional[SpooledAudio]:
         # Download audio file with Twilio credentials
         logger.info("Downloading audio file...")
         auth = aiohttp.BasicAuth(
@@ -57,84 +248,88 @@ class AudioService:
             password=os.getenv('TWILIO_AUTH_TOKEN')
         )
         
-        async with session.get(url, auth=auth) as response:
+        async with track('media_download'), session.get(url, auth=auth) as response:
             if response.status != 200:
                 logger.error(f"Failed to download audio: {response.status}")
                 logger.error(await response.text())
                 return None
-            audio_data = await response.read()
-            logger.info(f"Audio file downloaded: {len(audio_data)} bytes")
-            logger.info(f"File header: {audio_data[:20].hex()}")
-            return audio_data
+            # Refuse oversized media before reading it, and cut it off if the header lied
+            check_content_length(response.content_length, self.max_audio_bytes)
+            audio = await spool_stream(
+                response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE), self.spill_threshold, self.max_audio_bytes, meter
+            )
+            logger.info("Audio file downloaded: %d bytes (spilled=%s)", len(audio), audio.spilled)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("File header: %s", audio.head[:20].hex())
+            return audio
 
-    async def _convert_audio(self, session, audio_data, timeout, from_number):
+    async def _convert_audio(self, session, audio_data, timeout, from_number, meter: Optional[MemoryMeter] = None):
         # Convert using Rails service
-        logger.info(f"Converting audio using service at {self.converter_url}")
+        logger.info("Converting audio using service at %s", self.converter_url)
         
         # Create form data matching multer's expectations
         data = aiohttp.FormData()
         data.add_field('audio',
-                      audio_data,
+                      audio_data.file() if isinstance(audio_data, SpooledAudio) else audio_data,
                       filename='audio.amr',
                       content_type='audio/amr')
         data.add_field('callback_url', f"{self.base_url}/audio-callback")
         data.add_field('from_number', from_number)
 
-        async with session.post(self.converter_url, data=data) as response:
+        async with track('converter_post'), session.post(self.converter_url, data=data) as response:
             if response.status != 200:
                 error_text = await response.text()
                 logger.error(f"Converter service error: {error_text}")
                 raise Exception(f"Converter service returned {response.status}")
             
-            converted_data = await response.read()
-            logger.info(f"Audio successfully converted: {len(converted_data)} bytes")
+            check_content_length(response.content_length, self.max_audio_bytes)
+            converted_data = await spool_stream(
+                response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE), self.spill_threshold, self.max_audio_bytes, meter
+            )
+            logger.info("Audio successfully converted: %d bytes", len(converted_data))
             
             # Log first few bytes of converted data
-            if len(converted_data) > 0:
-                logger.info(f"Converted data header: {converted_data[:20].hex()}")
+            if len(converted_data) > 0 and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Converted data header: %s", converted_data.head[:20].hex())
 
         return converted_data
 
-    async def _transcribe_audio(self, mp3_data, timeout):
+    async def _transcribe_audio(self, mp3_data, timeout, filename: str = 'audio.mp3', preprocessed: bool = False):
         # Transcribe with OpenAI
-        logger.info("Transcribing with OpenAI...")
-        with tempfile.NamedTemporaryFile(suffix='.mp3') as temp_file:
-            temp_file.write(mp3_data)
-            temp_file.flush()
-            
-            # Verify the MP3 file
-            logger.info(f"MP3 file size: {os.path.getsize(temp_file.name)} bytes")
-            
-            with open(temp_file.name, 'rb') as audio_file:
-                response = self.client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="text"
-                )
+        logger.info("Transcribing with OpenAI (%d bytes)...", len(mp3_data))
+        start = time.perf_counter()
+        if isinstance(mp3_data, SpooledAudio):
+            # Upload from the clip's own buffer, in memory or spilled, without another copy
+            response = await self._create_transcription((filename, mp3_data.file()))
+        elif len(mp3_data) <= self.spill_threshold:
+            # Upload straight from memory; the SDK takes (filename, bytes) tuples
+            response = await self._create_transcription((filename, bytes(mp3_data)))
+        else:
+            # Large clips stream from an anonymous temp file so the upload holds no second copy in memory
+            with tempfile.TemporaryFile() as temp_file:
+                temp_file.write(mp3_data)
+                temp_file.seek(0)
+                response = await self._create_transcription((filename, temp_file))
+        UPLOAD_LATENCY.observe(time.perf_counter() - start, preprocessed=str(preprocessed).lower())
         
-        logger.info(f"Transcription complete: {response[:50]}...")
+        logger.info("Transcription complete", extra={'transcription': response})
         return response
 
+    async def _create_transcription(self, file):
+        async with track('transcription'):
+            return await self.openai.run(lambda client: client.audio.transcriptions.create(
+                model=self.model,
+                file=file,
+                response_format="text"
+            ))
+
     def _get_extension_from_content_type(self, content_type: str) -> str:
         """Convert content type to file extension"""
-        content_type_map = {
-            'audio/amr': 'amr',
-            'audio/amr-wb': 'amr',
-            'audio/mp3': 'mp3',
-            'audio/mpeg': 'mp3',
-            'audio/ogg': 'ogg',
-            'audio/wav': 'wav',
-            'audio/x-wav': 'wav',
-            'audio/webm': 'webm',
-            'audio/aac': 'aac',
-            'audio/m4a': 'm4a',
-        }
-        
         if not content_type:
             logger.error("No content type provided")
             return 'amr'  # Default to AMR as Twilio commonly uses this
         
-        extension = content_type_map.get(content_type.lower())
+        extension = format_from_content_type(content_type)
         if not extension:
             logger.warning(f"Unknown content type: {content_type}, defaulting to amr")
             return 'amr'
@@ -0,0 +1,134 @@
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import os
+import threading
+from typing import Awaitable, Callable, Generic, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+C = TypeVar('C')
+T = TypeVar('T')
+
+class BackgroundLoop:
+    """An event loop running in a daemon thread, shared by callers on any thread or loop.
+
+    Flask runs every async view on a fresh loop, so state that must outlive a
+    request (queues, mailboxes) lives here instead. The loop is started on first
+    use and started again in forked children, which inherit the attributes but
+    not the thread.
+    """
+
+    def __init__(self, name: str, on_start: Optional[Callable[[], None]] = None):
+        self.name = name
+        self.on_start = on_start
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._pid = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._pid == os.getpid()
+
+    def ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self.running:
+                return self._loop
+            self._loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(ready,), name=self.name, daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._pid = os.getpid()
+            return self._loop
+
+    def _run(self, ready: threading.Event) -> None:
+        asyncio.set_event_loop(self._loop)
+        if self.on_start is not None:
+            self.on_start()
+        self._loop.call_soon(ready.set)
+        self._loop.run_forever()
+
+    def call_soon(self, callback: Callable, *args) -> None:
+        """Schedule a plain callback on the background loop"""
+        self.ensure_started().call_soon_threadsafe(callback, *args)
+
+    def submit(self, coro_func: Callable[[], Awaitable]) -> concurrent.futures.Future:
+        """Run a coroutine on the background loop"""
+        return asyncio.run_coroutine_threadsafe(coro_func(), self.ensure_started())
+
+    def stop(self, shutdown: Optional[Callable[[], Awaitable]] = None, timeout: float = 10.0) -> bool:
+        """Run the optional shutdown coroutine, then stop the loop. Returns False if it wasn't running."""
+        with self._lock:
+            if not self.running:
+                return False
+            loop, thread = self._loop, self._thread
+            self._thread = None
+
+        if shutdown is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout)
+            except Exception as e:
+                logger.error(f"Error shutting down {self.name}: {str(e)}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        if not thread.is_alive():
+            loop.close()
+        return True
+
+class LoopBoundClient(Generic[C]):
+    """Owns one pooled client that lives on a BackgroundLoop and is reached through run().
+
+    Pooled clients such as aiohttp sessions and httpx transports are bound to
+    the loop they were created on, and Flask runs each async view on a fresh
+    loop. The client is built on first use by _build() on a background loop,
+    and calls run there, so connections are reused whichever loop the caller
+    is on. Subclasses supply _build() and, when the client can close itself
+    behind our back, _usable().
+    """
+
+    def __init__(self, name: str):
+        self._client: Optional[C] = None
+        # A forked child restarts the loop and must not reuse the parent's sockets
+        self._background = BackgroundLoop(name, on_start=self._forget_client)
+        atexit.register(self.close)
+
+    def _forget_client(self) -> None:
+        self._client = None
+
+    def _build(self) -> C:
+        raise NotImplementedError
+
+    def _usable(self, client: C) -> bool:
+        return True
+
+    def client(self) -> C:
+        """The shared client; only usable from coroutines running under run()"""
+        if asyncio.get_running_loop() is not self._background.ensure_started():
+            raise RuntimeError(f"The pooled client can only be used through {type(self).__name__}.run()")
+        if self._client is None or not self._usable(self._client):
+            self._client = self._build()
+        return self._client
+
+    async def run(self, func: Callable[[C], Awaitable[T]]) -> T:
+        """Await func(client) on the client's loop, from any thread or event loop"""
+        loop = self._background.ensure_started()
+        if asyncio.get_running_loop() is loop:
+            return await func(self.client())
+
+        async def call():
+            return await func(self.client())
+
+        # Cancelling the caller (e.g. a timeout) cancels the request on the background loop too
+        return await asyncio.wrap_future(self._background.submit(call))
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Close the client and stop its loop; the next run() builds a fresh one"""
+        async def close_client():
+            if self._client is not None:
+                await self._client.close()
+            self._client = None
+
+        self._background.stop(close_client, timeout=timeout)
@@ -1,13 +1,16 @@
 import logging
 from datetime import datetime
-from openai import OpenAI
-from typing import List, Dict
+from typing import List, Dict, TYPE_CHECKING
+from .metrics import track
+
+if TYPE_CHECKING:
+    from .openai_client import OpenAIClientManager
 
 logger = logging.getLogger(__name__)
 
 class ChatService:
-    def __init__(self, openai_client: OpenAI, storage_service=None, vector_service=None):
-        self.client = openai_client
+    def __init__(self, openai_client: 'OpenAIClientManager', storage_service=None, vector_service=None):
+        self.openai = openai_client
         self.storage = storage_service
         self.vector = vector_service
 
@@ -52,12 +55,13 @@ class ChatService:
                 {"role": "user", "content": message}
             ]
             
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                max_tokens=150,
-                timeout=30
-            )
+            with track('chat_completion'):
+                response = await self.openai.run(lambda client: client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=messages,
+                    max_tokens=150,
+                    timeout=30
+                ))
             
             return response.choices[0].message.content
 
@@ -0,0 +1,61 @@
+import io
+import re
+import wave
+from typing import List, Sequence, Tuple
+
+Span = Tuple[float, float]
+
+_WORD_EDGES = re.compile(r"^\W+|\W+$")
+
+def plan_chunks(duration: float, silences: Sequence[Span], target: float = 30.0, overlap: float = 1.0) -> List[Span]:
+    """Split [0, duration] into chunks of about `target` seconds, cutting in silences where possible.
+
+    Each cut is placed at the middle of the silence nearest `start + target`
+    within half a target either side; with no silence in reach the cut falls at
+    `start + target`. Chunks extend `overlap` seconds past each cut so a word
+    spoken across it is heard whole by at least one chunk.
+    """
+    midpoints = sorted((start + end) / 2 for start, end in silences)
+    cuts = []
+    start = 0.0
+    while duration - start > target * 1.5:
+        ideal = start + target
+        nearby = [m for m in midpoints if start + target / 2 <= m <= start + target * 1.5]
+        cut = min(nearby, key=lambda m: abs(m - ideal)) if nearby else ideal
+        cuts.append(cut)
+        start = cut
+
+    edges = [0.0] + cuts + [duration]
+    return [
+        (max(0.0, begin - overlap) if i else begin, min(duration, end + overlap))
+        for i, (begin, end) in enumerate(zip(edges, edges[1:]))
+    ]
+
+def _normalize(word: str) -> str:
+    return _WORD_EDGES.sub('', word.lower())
+
+def stitch(texts: Sequence[str], max_overlap_words: int = 12) -> str:
+    """Join chunk transcripts, dropping words the overlap made both neighbours hear"""
+    words = []
+    for text in texts:
+        incoming = text.split()
+        limit = min(max_overlap_words, len(words), len(incoming))
+        tail = [_normalize(w) for w in words[-limit:]] if limit else []
+        head = [_normalize(w) for w in incoming[:limit]]
+        repeated = 0
+        for size in range(limit, 0, -1):
+            if tail[-size:] == head[:size]:
+                repeated = size
+                break
+        words.extend(incoming[repeated:])
+    return ' '.join(words)
+
+def pcm_to_wav(pcm: bytes, sample_rate: int) -> bytes:
+    """Wrap mono 16-bit PCM in a WAV header so Whisper can take it as-is"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
@@ -0,0 +1,226 @@
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import random
+import threading
+import time
+from typing import Dict, Optional, Union, TYPE_CHECKING
+
+from .background import BackgroundLoop
+from .metrics import registry, track
+from .sqlite import SQLiteConnections
+
+if TYPE_CHECKING:
+    from .twilio_client import AsyncTwilioClient
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_QUEUE_DEPTH = registry.gauge('sms_dispatch_queue_depth', 'Outbound SMS waiting to be sent')
+DISPATCH_QUEUE_TIME = registry.histogram('sms_dispatch_queue_seconds', 'Time outbound SMS spend queued before sending')
+DISPATCH_LATENCY = registry.histogram('sms_dispatch_latency_seconds', 'Time from enqueueing an SMS to Twilio accepting it')
+DISPATCH_RESULTS = registry.counter('sms_dispatch_total', 'Outbound SMS by outcome', ('outcome',))
+
+class DispatchQueueFull(Exception):
+    """Raised when the outbound queue is at capacity"""
+
+class TokenBucket:
+    """Token bucket for one sending number; only used from the dispatcher's loop"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(burst, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    async def acquire(self) -> None:
+        while True:
+            wait = self.delay()
+            if wait <= 0:
+                self.tokens -= 1
+                return
+            await asyncio.sleep(wait)
+
+class SharedTokenBucket:
+    """Token bucket for one sending number kept in SQLite, so every process on the host shares it.
+
+    Twilio's per-number limit applies to the account, not to one process; with
+    several web and worker processes each holding its own TokenBucket, the
+    combined rate would be a multiple of the limit.
+    """
+
+    def __init__(self, db: SQLiteConnections, key: str, rate: float, burst: float):
+        self.db = db
+        self.key = key
+        self.rate = rate
+        self.capacity = max(burst, 1.0)
+
+    def _take(self) -> float:
+        """Take a token if one is available; otherwise return the seconds until one is"""
+        conn = self.db.get()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM sms_rate_limits WHERE key = ?', (self.key,)).fetchone()
+            tokens = self.capacity if row is None else min(self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+            if wait <= 0:
+                tokens -= 1
+            conn.execute('INSERT OR REPLACE INTO sms_rate_limits (key, tokens, updated) VALUES (?, ?, ?)',
+                         (self.key, tokens, now))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    async def acquire(self) -> None:
+        while True:
+            # BEGIN IMMEDIATE can wait on another process, so the other sends on the loop carry on meanwhile
+            wait = await asyncio.to_thread(self._take)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+def is_retryable(error: Exception) -> bool:
+    """Twilio throttling (429) and server errors are worth another attempt"""
+    status = getattr(error, 'status', None)
+    return status == 429 or (isinstance(status, int) and status >= 500)
+
+class OutboundDispatcher:
+    """Sends SMS from a background event loop, rate limited per sending number.
+
+    Callers on any thread or event loop enqueue with submit() and get back a
+    concurrent Future they may ignore. Worker tasks take messages off a bounded
+    queue, wait for a token from the sender's bucket and retry throttled or
+    failed sends with exponential backoff. Sends are async HTTP requests, so
+    the worker count only caps how many are in flight; none hold a thread.
+
+    With `rate_limit_path` the buckets live in that SQLite file and hold for
+    every process sharing it; without it each process enforces the rate alone.
+    """
+
+    def __init__(self, twilio_client: 'AsyncTwilioClient', rate_per_second: float = 1.0, burst: float = 1.0, workers: int = 4,
+                 max_queue: int = 1000, max_retries: int = 5, retry_backoff: float = 1.0,
+                 rate_limit_path: Optional[str] = None):
+        self.client = twilio_client
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._buckets: Dict[str, Union[TokenBucket, SharedTokenBucket]] = {}
+        self._rate_limits = SQLiteConnections(rate_limit_path) if rate_limit_path else None
+        if self._rate_limits:
+            self._rate_limits.get().execute(
+                'CREATE TABLE IF NOT EXISTS sms_rate_limits (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+            )
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._queue = None
+        self._tasks = []
+        self._background = BackgroundLoop('sms-dispatcher', on_start=self._start_workers)
+        atexit.register(self.close)
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    def _start_workers(self) -> None:
+        """Runs on the background loop each time it starts"""
+        self._queue = asyncio.Queue()
+        self._depth = 0
+        loop = asyncio.get_event_loop()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"SMS dispatcher started ({self.workers} workers, {self.rate_per_second}/s per number)")
+
+    def submit(self, to: str, body: str, from_: str) -> concurrent.futures.Future:
+        """Queue a message and return immediately; the Future resolves once Twilio accepts it"""
+        self._background.ensure_started()
+        with self._lock:
+            if self._depth >= self.max_queue:
+                DISPATCH_RESULTS.inc(outcome='rejected')
+                raise DispatchQueueFull(f"Outbound SMS queue is full ({self.max_queue} messages)")
+            self._depth += 1
+            DISPATCH_QUEUE_DEPTH.set(self._depth)
+
+        future = concurrent.futures.Future()
+        self._background.call_soon(self._queue.put_nowait, (to, body, from_, future, time.perf_counter()))
+        return future
+
+    def _bucket(self, from_: str) -> Union[TokenBucket, SharedTokenBucket]:
+        bucket = self._buckets.get(from_)
+        if bucket is None:
+            if self._rate_limits:
+                bucket = SharedTokenBucket(self._rate_limits, from_, self.rate_per_second, self.burst)
+            else:
+                bucket = TokenBucket(self.rate_per_second, self.burst)
+            self._buckets[from_] = bucket
+        return bucket
+
+    async def _worker(self) -> None:
+        while True:
+            to, body, from_, future, enqueued_at = await self._queue.get()
+            try:
+                DISPATCH_QUEUE_TIME.observe(time.perf_counter() - enqueued_at)
+                message = await self._deliver(to, body, from_)
+                DISPATCH_LATENCY.observe(time.perf_counter() - enqueued_at)
+                DISPATCH_RESULTS.inc(outcome='sent')
+                if not future.cancelled():
+                    future.set_result(message)
+            except Exception as e:
+                DISPATCH_RESULTS.inc(outcome='failed')
+                logger.error(f"Failed to send SMS: {str(e)}")
+                if not future.cancelled():
+                    future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._depth -= 1
+                    DISPATCH_QUEUE_DEPTH.set(self._depth)
+                self._queue.task_done()
+
+    async def _deliver(self, to: str, body: str, from_: str):
+        bucket = self._bucket(from_)
+        attempt = 0
+        while True:
+            await bucket.acquire()
+            try:
+                async with track('twilio_send'):
+                    message = await self.client.send_message(to, body, from_=from_)
+                logger.info("Message sent successfully: %s", message.get('sid'))
+                return message
+            except Exception as e:
+                attempt += 1
+                if not is_retryable(e) or attempt > self.max_retries:
+                    raise
+                delay = self.retry_backoff * 2 ** (attempt - 1) * (0.5 + random.random())
+                DISPATCH_RESULTS.inc(outcome='retried')
+                logger.warning(f"SMS send throttled or failed (attempt {attempt}), retrying in {delay:.1f}s: {str(e)}")
+                await asyncio.sleep(delay)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Send what is already queued (up to the timeout), then stop the background loop"""
+        async def drain():
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Dropping {self._depth} unsent SMS at shutdown")
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            # The client's pooled session belongs to this loop
+            await self.client.close()
+
+        if self._background.stop(drain, timeout=timeout + 5):
+            logger.info("SMS dispatcher stopped")
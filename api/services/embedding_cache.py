@@ -0,0 +1,78 @@
+import hashlib
+import logging
+import re
+import struct
+import unicodedata
+from typing import List, Optional, Sequence
+
+from .metrics import registry
+from .ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_LOOKUPS = registry.counter('embedding_cache_total', 'Embedding cache lookups by result', ('result',))
+
+_WHITESPACE = re.compile(r'\s+')
+
+# One leading byte records how the rest of a cached blob is packed
+_DTYPE_TAGS = {'float32': b'f', 'float16': b'e'}
+
+def pack(vector: Sequence[float], dtype: str = 'float32') -> bytes:
+    """Little-endian float32 or float16 bytes for a vector"""
+    code = 'e' if dtype == 'float16' else 'f'
+    return struct.pack(f'<{len(vector)}{code}', *vector)
+
+def unpack(blob: bytes, dtype: str = 'float32') -> List[float]:
+    if dtype == 'float16':
+        return list(struct.unpack(f'<{len(blob) // 2}e', blob))
+    return list(struct.unpack(f'<{len(blob) // 4}f', blob))
+
+class EmbeddingCache:
+    """Embeddings keyed by model and a hash of the normalized text.
+
+    Repeated chat queries and re-indexed thoughts are answered without a round
+    trip to OpenAI. Vectors are stored packed as float32 (or float16), an eighth
+    of the size of a list of Python floats or less, so the memory tier is
+    bounded by `memory_bytes` rather than a count.
+    """
+
+    def __init__(self, memory_bytes: int = 16 * 1024 * 1024, path: Optional[str] = None,
+                 max_bytes: int = 200 * 1024 * 1024, dtype: str = 'float32', ttl: Optional[float] = None,
+                 sweep_interval: int = 100):
+        if dtype not in _DTYPE_TAGS:
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+        self.path = path
+        self.dtype = dtype
+        self._cache = TTLCache('embedding_cache', CACHE_LOOKUPS, memory_bytes=memory_bytes, path=path,
+                               max_bytes=max_bytes, ttl=ttl, sweep_interval=sweep_interval)
+        logger.info(f"Embedding cache initialized ({memory_bytes} bytes in memory, {dtype}, persistent={bool(path)})")
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Unicode-normalized text with runs of whitespace collapsed; case is kept"""
+        return _WHITESPACE.sub(' ', unicodedata.normalize('NFKC', text)).strip()
+
+    @staticmethod
+    def key(text: str, model: str) -> str:
+        digest = hashlib.sha256(model.encode('utf-8'))
+        digest.update(b'\x1f')
+        digest.update(EmbeddingCache.normalize(text).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        """Cached embedding for the text, or None"""
+        blob = self._cache.get(self.key(text, model))
+        if blob is None:
+            return None
+        # Rows written by a process with another dtype setting still decode
+        dtype = 'float16' if blob[:1] == _DTYPE_TAGS['float16'] else 'float32'
+        return unpack(blob[1:], dtype)
+
+    def put(self, text: str, model: str, vector: Sequence[float]) -> None:
+        self._cache.put(self.key(text, model), _DTYPE_TAGS[self.dtype] + pack(vector, self.dtype))
+
+    def evict(self) -> int:
+        return self._cache.evict()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
@@ -0,0 +1,57 @@
+from typing import Optional
+
+# Containers Whisper decodes itself; anything else has to be transcoded first
+WHISPER_FORMATS = frozenset({'mp3', 'mp4', 'm4a', 'ogg', 'wav', 'webm', 'flac'})
+
+CONTENT_TYPE_FORMATS = {
+    'audio/amr': 'amr',
+    'audio/amr-wb': 'amr',
+    'audio/3gpp': '3gp',
+    'video/3gpp': '3gp',
+    'audio/mp3': 'mp3',
+    'audio/mpeg': 'mp3',
+    'audio/mp4': 'm4a',
+    'audio/m4a': 'm4a',
+    'audio/x-m4a': 'm4a',
+    'video/mp4': 'mp4',
+    'audio/ogg': 'ogg',
+    'audio/wav': 'wav',
+    'audio/x-wav': 'wav',
+    'audio/webm': 'webm',
+    'audio/flac': 'flac',
+    'audio/aac': 'aac',
+}
+
+def sniff_format(data: bytes) -> Optional[str]:
+    """Identify an audio container from its magic bytes, or None if unrecognized"""
+    head = bytes(data[:16])
+    if head.startswith(b'#!AMR'):
+        return 'amr'
+    if head.startswith(b'ID3'):
+        return 'mp3'
+    if head[4:8] == b'ftyp':
+        brand = head[8:12]
+        # 3GPP files from Android usually carry AMR, which Whisper can't decode
+        if brand.startswith(b'3g'):
+            return '3gp'
+        return 'm4a' if brand.startswith(b'M4A') else 'mp4'
+    if head.startswith(b'OggS'):
+        return 'ogg'
+    if head.startswith(b'RIFF') and head[8:12] == b'WAVE':
+        return 'wav'
+    if head.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'webm'
+    if head.startswith(b'fLaC'):
+        return 'flac'
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        # MPEG frame sync; layer bits of 00 mean an AAC ADTS stream instead
+        return 'mp3' if head[1] & 0x06 else 'aac'
+    return None
+
+def format_from_content_type(content_type: Optional[str]) -> Optional[str]:
+    if not content_type:
+        return None
+    return CONTENT_TYPE_FORMATS.get(content_type.split(';')[0].strip().lower())
+
+def whisper_accepts(fmt: Optional[str]) -> bool:
+    return fmt in WHISPER_FORMATS
@@ -0,0 +1,62 @@
+import logging
+from typing import Any, Dict
+
+import aiohttp
+
+from .background import LoopBoundClient
+
+logger = logging.getLogger(__name__)
+
+class HTTPClientManager(LoopBoundClient[aiohttp.ClientSession]):
+    """Owns one long-lived pooled aiohttp session shared by every outbound HTTP call.
+
+    aiohttp sessions are bound to the event loop they were created on, and
+    Flask runs each async view on a fresh loop, so the session lives on a
+    background loop and requests run there through run(). Keep-alive
+    connections are reused across requests whichever loop the caller is on.
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 20, keepalive_timeout: float = 30,
+                 dns_cache_ttl: int = 300, connect_timeout: float = 5, total_timeout: float = 60,
+                 name: str = 'http-client'):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout, connect=connect_timeout)
+        self._created = 0
+        super().__init__(name)
+
+    def _build(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_cache_ttl
+        )
+        self._created += 1
+        logger.info(f"Created pooled HTTP session (limit={self.limit}, per_host={self.limit_per_host})")
+        return aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    def _usable(self, session: aiohttp.ClientSession) -> bool:
+        return not session.closed
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool utilization of the shared session"""
+        session = self._client
+        live = session is not None and not session.closed
+        in_use = idle = 0
+        if live:
+            connector = session.connector
+            in_use = len(getattr(connector, '_acquired', ()))
+            idle = sum(len(conns) for conns in getattr(connector, '_conns', {}).values())
+        return {
+            'sessions': int(live),
+            'sessions_created': self._created,
+            'limit': self.limit,
+            'limit_per_host': self.limit_per_host,
+            'connections_in_use': in_use,
+            'connections_idle': idle,
+            'utilization': in_use / self.limit if live and self.limit else 0.0
+        }
@@ -0,0 +1,125 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from .sqlite import SQLiteConnections
+
+logger = logging.getLogger(__name__)
+
+# Placeholder stored while the first copy of a request is still being processed
+IN_FLIGHT = ''
+
+class IdempotencyCache:
+    """Bounded TTL cache of responses keyed by request identity, optionally shared through SQLite.
+
+    Request ids such as Twilio's MessageSid never repeat, so expired rows are
+    swept at startup and every `sweep_interval` reservations rather than waiting
+    for their key to come back.
+    """
+
+    def __init__(self, ttl: int = 3600, max_entries: int = 10000, path: Optional[str] = None,
+                 sweep_interval: int = 100):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._entries = OrderedDict()
+        self._reservations = 0
+        self._lock = threading.Lock()
+        self._db = SQLiteConnections(path) if path else None
+        if path:
+            conn = self._db.get()
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS idempotency (key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idempotency_expiry ON idempotency (expires_at)')
+            self.expire()
+        logger.info(f"Idempotency cache initialized (ttl={ttl}s, shared={bool(path)})")
+
+    @staticmethod
+    def hash_key(*parts: str) -> str:
+        """Stable key for requests that carry no id of their own"""
+        return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+    def _remember(self, key: str, response: str, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (response, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def reserve(self, key: str) -> bool:
+        """Claim a key for processing. Returns False if it was already seen."""
+        now = time.time()
+        expires_at = now + self.ttl
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                return False
+            self._entries[key] = (IN_FLIGHT, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._reservations += 1
+            sweep = self._reservations % self.sweep_interval == 0
+
+        if self.path:
+            if sweep:
+                self.expire()
+            conn = self._db.get()
+            conn.execute('DELETE FROM idempotency WHERE key = ? AND expires_at <= ?', (key, now))
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO idempotency (key, response, expires_at) VALUES (?, ?, ?)',
+                (key, IN_FLIGHT, expires_at)
+            )
+            if cursor.rowcount == 0:
+                # Another worker got there first
+                return False
+        return True
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached response for a key, or None if missing or still in flight"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] <= now:
+                del self._entries[key]
+                entry = None
+        if entry and entry[0] != IN_FLIGHT:
+            return entry[0]
+
+        if self.path:
+            row = self._db.get().execute(
+                'SELECT response, expires_at FROM idempotency WHERE key = ? AND expires_at > ?', (key, now)
+            ).fetchone()
+            if row and row[0] != IN_FLIGHT:
+                self._remember(key, row[0], row[1])
+                return row[0]
+        return None
+
+    def put(self, key: str, response: str) -> None:
+        """Record the response to replay for duplicates"""
+        expires_at = time.time() + self.ttl
+        self._remember(key, response, expires_at)
+        if self.path:
+            self._db.get().execute(
+                'INSERT OR REPLACE INTO idempotency (key, response, expires_at) VALUES (?, ?, ?)',
+                (key, response, expires_at)
+            )
+
+    def expire(self) -> int:
+        """Delete expired rows from the shared file and return how many were removed"""
+        if not self.path:
+            return 0
+        return self._db.get().execute('DELETE FROM idempotency WHERE expires_at <= ?', (time.time(),)).rowcount
+
+    def release(self, key: str) -> None:
+        """Forget a reservation so a retry can process the request again"""
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.path:
+            self._db.get().execute('DELETE FROM idempotency WHERE key = ?', (key,))
@@ -0,0 +1,96 @@
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from .background import BackgroundLoop
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+MAILBOXES_ACTIVE = registry.gauge('keyed_mailboxes_active', 'Per-user mailboxes currently alive')
+MAILBOX_WAIT = registry.histogram('keyed_mailbox_wait_seconds', 'Time a message waits behind earlier messages from the same user')
+
+class KeyedExecutor:
+    """Runs coroutines one at a time per key and concurrently across keys.
+
+    Each key gets a mailbox (a queue drained by its own task) when its first
+    message arrives; the mailbox is dropped after `idle_timeout` seconds without
+    messages, so memory tracks active users rather than every user seen. The
+    mailboxes live on a background loop so ordering holds even when callers run
+    on separate per-request loops.
+    """
+
+    def __init__(self, idle_timeout: float = 30.0, name: str = 'keyed-executor'):
+        self.idle_timeout = idle_timeout
+        self._mailboxes: Dict[str, asyncio.Queue] = {}
+        # The loop only keeps weak references to tasks, so hold each drainer until it exits
+        self._drainers: Dict[str, asyncio.Task] = {}
+        self._background = BackgroundLoop(name, on_start=self._reset)
+        atexit.register(self.close)
+
+    def _reset(self) -> None:
+        self._mailboxes.clear()
+        self._drainers.clear()
+
+    def __len__(self) -> int:
+        return len(self._mailboxes)
+
+    def submit(self, key: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> concurrent.futures.Future:
+        """Queue func(*args, **kwargs) behind earlier work for the same key"""
+        future = concurrent.futures.Future()
+        self._background.call_soon(self._post, key, (func, args, kwargs, future, time.perf_counter()))
+        return future
+
+    async def run(self, key: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Await func's result, running it in order with other work for the same key"""
+        return await asyncio.wrap_future(self.submit(key, func, *args, **kwargs))
+
+    def _post(self, key: str, item: tuple) -> None:
+        mailbox = self._mailboxes.get(key)
+        if mailbox is None:
+            mailbox = self._mailboxes[key] = asyncio.Queue()
+            self._drainers[key] = asyncio.get_event_loop().create_task(self._drain(key, mailbox))
+            MAILBOXES_ACTIVE.set(len(self._mailboxes))
+        mailbox.put_nowait(item)
+
+    async def _drain(self, key: str, mailbox: asyncio.Queue) -> None:
+        while True:
+            try:
+                func, args, kwargs, future, posted_at = await asyncio.wait_for(mailbox.get(), self.idle_timeout)
+            except asyncio.TimeoutError:
+                # Nothing can be posted between this check and the delete: both run on this loop
+                if mailbox.empty():
+                    del self._mailboxes[key]
+                    del self._drainers[key]
+                    MAILBOXES_ACTIVE.set(len(self._mailboxes))
+                    return
+                continue
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            MAILBOX_WAIT.observe(time.perf_counter() - posted_at)
+            try:
+                future.set_result(await func(*args, **kwargs))
+            except asyncio.CancelledError:
+                future.set_exception(concurrent.futures.CancelledError())
+                raise
+            except Exception as e:
+                future.set_exception(e)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop the background loop, cancelling anything still queued"""
+        async def cancel_mailboxes():
+            for mailbox in self._mailboxes.values():
+                while not mailbox.empty():
+                    mailbox.get_nowait()[3].cancel()
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if self._background.stop(cancel_mailboxes, timeout=timeout):
+            self._reset()
+            MAILBOXES_ACTIVE.set(0)
@@ -0,0 +1,62 @@
+import logging
+from typing import Optional, TYPE_CHECKING
+
+from .background import LoopBoundClient
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+class OpenAIClientManager(LoopBoundClient['AsyncOpenAI']):
+    """Owns the AsyncOpenAI client shared by the audio, vector, chat and tag services.
+
+    Every call awaits a socket on a pooled httpx transport (HTTP/2 when the h2
+    package is installed) instead of blocking the event loop in the sync SDK.
+    httpx pools are bound to the loop they were created on, so like
+    HTTPClientManager the client lives on a background loop and calls run there.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None, max_connections: int = 100,
+                 max_keepalive_connections: int = 20, keepalive_expiry: float = 30, connect_timeout: float = 5,
+                 timeout: float = 60, http2: bool = True, max_retries: int = 2, name: str = 'openai-client'):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self.http2 = http2
+        self.max_retries = max_retries
+        super().__init__(name)
+
+    def _build(self) -> 'AsyncOpenAI':
+        # Imported here so the SDK stays off the cold-start path
+        import httpx
+        from openai import AsyncOpenAI
+
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("h2 is not installed, falling back to HTTP/1.1 for OpenAI")
+                http2 = False
+
+        http_client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout)
+        )
+        logger.info(f"Created pooled OpenAI client (limit={self.max_connections}, http2={http2})")
+        return AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            max_retries=self.max_retries,
+            http_client=http_client
+        )
@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from .sqlite import SQLiteConnections
+
+logger = logging.getLogger(__name__)
+
+class MemoryPendingStore:
+    """Per-process pending tag confirmations with a TTL and an entry cap.
+
+    Entries all share one TTL, so insertion order is expiry order: each write
+    drops the expired entries at the front, which keeps expiry O(1) amortized
+    without a reaper thread.
+    """
+
+    def __init__(self, ttl: int = 300, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expire_locked(self, now: float) -> int:
+        expired = 0
+        while self._entries:
+            _, (_, expires_at) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            self._entries.popitem(last=False)
+            expired += 1
+        return expired
+
+    def put(self, user_phone: str, thought_id: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._entries[user_phone] = (thought_id, now + self.ttl)
+            self._entries.move_to_end(user_phone)
+            self._expire_locked(now)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, user_phone: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(user_phone)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._entries[user_phone]
+                return None
+            return entry[0]
+
+    def pop(self, user_phone: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.pop(user_phone, None)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    def expire(self) -> int:
+        """Drop every expired entry and return how many were removed"""
+        with self._lock:
+            return self._expire_locked(time.time())
+
+class SQLitePendingStore:
+    """Pending tag confirmations shared by every process on the host through one SQLite file.
+
+    Lookups go through the primary key; expired rows and rows over the cap are
+    swept every `sweep_interval` writes so no single request pays for a full scan.
+    The file is memory-mapped so reads from all workers hit the page cache.
+    """
+
+    def __init__(self, path: str, ttl: int = 300, max_entries: int = 10000,
+                 sweep_interval: int = 100, mmap_size: int = 64 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self.mmap_size = mmap_size
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._db = SQLiteConnections(path, mmap_size=mmap_size)
+        conn = self._db.get()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS pending_thoughts (
+                user_phone TEXT PRIMARY KEY,
+                thought_id TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute('CREATE INDEX IF NOT EXISTS pending_thoughts_expiry ON pending_thoughts (expires_at)')
+        logger.info(f"Pending thought store initialized at {path}")
+
+    def __len__(self) -> int:
+        return self._db.get().execute('SELECT COUNT(*) FROM pending_thoughts').fetchone()[0]
+
+    def put(self, user_phone: str, thought_id: str) -> None:
+        self._db.get().execute(
+            'INSERT OR REPLACE INTO pending_thoughts (user_phone, thought_id, expires_at) VALUES (?, ?, ?)',
+            (user_phone, thought_id, time.time() + self.ttl)
+        )
+        with self._lock:
+            self._writes += 1
+            sweep = self._writes % self.sweep_interval == 0
+        if sweep:
+            self.expire()
+
+    def get(self, user_phone: str) -> Optional[str]:
+        row = self._db.get().execute(
+            'SELECT thought_id FROM pending_thoughts WHERE user_phone = ? AND expires_at > ?',
+            (user_phone, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def pop(self, user_phone: str) -> Optional[str]:
+        conn = self._db.get()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT thought_id, expires_at FROM pending_thoughts WHERE user_phone = ?', (user_phone,)
+            ).fetchone()
+            conn.execute('DELETE FROM pending_thoughts WHERE user_phone = ?', (user_phone,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def expire(self) -> int:
+        """Delete expired rows, then the soonest-expiring rows over the cap"""
+        conn = self._db.get()
+        removed = conn.execute('DELETE FROM pending_thoughts WHERE expires_at <= ?', (time.time(),)).rowcount
+        overflow = len(self) - self.max_entries
+        if overflow > 0:
+            removed += conn.execute(
+                'DELETE FROM pending_thoughts WHERE user_phone IN '
+                '(SELECT user_phone FROM pending_thoughts ORDER BY expires_at LIMIT ?)',
+                (overflow,)
+            ).rowcount
+        return removed
+
+def create_pending_store(backend: str = 'memory', path: Optional[str] = None, ttl: int = 300, max_entries: int = 10000):
+    """Build the configured pending-confirmation backend"""
+    if backend == 'memory':
+        return MemoryPendingStore(ttl=ttl, max_entries=max_entries)
+    if backend == 'sqlite':
+        if not path:
+            raise ValueError("The sqlite pending store needs a path")
+        return SQLitePendingStore(path, ttl=ttl, max_entries=max_entries)
+    raise ValueError(f"Unknown pending store backend: {backend}")
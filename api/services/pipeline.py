@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+class Stage:
+    """A named async step whose inputs are the results of the stages it depends on"""
+
+    def __init__(self, name: str, func: Callable[..., Awaitable[Any]], depends_on: Sequence[str] = ()):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+
+async def run_stages(stages: List[Stage]) -> Dict[str, Any]:
+    """Run stages concurrently, starting each one as soon as its dependencies finish.
+
+    Each stage is called with its dependencies' results as keyword arguments.
+    Returns a dict of stage name -> result and raises the first stage error.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    _check_graph(by_name)
+
+    loop = asyncio.get_running_loop()
+    futures = {name: loop.create_future() for name in by_name}
+
+    async def run(stage: Stage):
+        try:
+            inputs = {dep: await asyncio.shield(futures[dep]) for dep in stage.depends_on}
+            result = await stage.func(**inputs)
+            futures[stage.name].set_result(result)
+        except Exception as e:
+            futures[stage.name].set_exception(e)
+
+    await asyncio.gather(*(run(stage) for stage in stages))
+
+    # Retrieve every exception so none are reported as unhandled
+    errors = [(stage.name, futures[stage.name].exception()) for stage in stages]
+    for name, error in errors:
+        if error is not None:
+            logger.error(f"Pipeline stage '{name}' failed: {str(error)}")
+            raise error
+    return {name: future.result() for name, future in futures.items()}
+
+def _check_graph(by_name: Dict[str, Stage]) -> None:
+    """Reject unknown dependencies and cycles"""
+    visiting, done = set(), set()
+
+    def visit(name: str):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Pipeline has a dependency cycle at stage '{name}'")
+        visiting.add(name)
+        for dep in by_name[name].depends_on:
+            if dep not in by_name:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+
+    for name in by_name:
+        visit(name)
+
+class ThoughtPipeline:
+    """Stores, embeds and tags a transcribed thought with the independent calls run concurrently"""
+
+    def __init__(self, storage_service, vector_service=None, tag_service=None):
+        self.storage = storage_service
+        self.vector = vector_service
+        self.tags = tag_service
+
+    async def run(self, from_number: str, transcription: str, message_sid: Optional[str] = None) -> Dict[str, Any]:
+        """Returns the stored thought record and the suggested tags.
+
+        Passing the Twilio MessageSid makes a retried run reuse the stored thought
+        and overwrite its vector instead of adding duplicates.
+        """
+
+        async def store_thought():
+            return await self.storage.store_thought(from_number, transcription, message_sid=message_sid)
+
+        async def embed():
+            if not self.vector:
+                logger.warning("Vector service not available - skipping embedding storage")
+                return None
+            try:
+                return await self.vector.get_embedding(transcription)
+            except Exception as e:
+                logger.error(f"Failed to embed thought: {str(e)}")
+                return None
+
+        async def suggest_tags():
+            if not self.tags:
+                return []
+            try:
+                return await self.tags.suggest_tags(transcription=transcription, user_phone=from_number)
+            except Exception as e:
+                logger.error(f"Failed to generate tag suggestions: {str(e)}")
+                return []
+
+        async def store_vector(thought: Dict, embedding: Optional[List[float]]):
+            if embedding is None:
+                return False
+            # The thought id only exists once the row is stored, so join it in here
+            metadata = {
+                'user_phone': from_number,
+                'thought_id': thought['id'],
+                'created_at': thought['created_at']
+            }
+            return await self.vector.store_embedding(
+                transcription,
+                metadata=metadata,
+                phone_number=from_number,
+                embedding=embedding,
+                vector_id=str(thought['id'])
+            )
+
+        results = await run_stages([
+            Stage('thought', store_thought),
+            Stage('embedding', embed),
+            Stage('tags', suggest_tags),
+            Stage('vector', store_vector, depends_on=('thought', 'embedding')),
+        ])
+        return {'thought': results['thought'], 'tags': results['tags']}
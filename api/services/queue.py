@@ -0,0 +1,155 @@
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from typing import Optional, Dict, Any
+
+from .sqlite import SQLiteConnections
+
+logger = logging.getLogger(__name__)
+
+class JobQueue:
+    """Durable SQLite-backed job queue shared by the web app and worker processes.
+
+    Each claim gets a fresh token. A worker that outlives the visibility timeout
+    loses its claim when the job is handed to another worker, and its late ack
+    or fail is ignored instead of deleting or rescheduling the newer attempt.
+
+    Jobs whose payload has a from_number run one at a time, in order, per
+    sender: a job is only claimed once every earlier job for the same number
+    has been acked or has died.
+    """
+
+    def __init__(self, path: str, visibility_timeout: int = 60, max_attempts: int = 5, retry_backoff: float = 2.0):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._db = SQLiteConnections(path, timeout=30, row_factory=sqlite3.Row)
+        self._init_schema()
+        logger.info("Job queue initialized at %s", path)
+
+    def _init_schema(self) -> None:
+        conn = self._db.get()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_error TEXT,
+                claim_token TEXT,
+                ordering_key TEXT
+            )
+        """)
+        # Queue files created before claim tokens and ordering keys existed
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+        if 'claim_token' not in columns:
+            conn.execute('ALTER TABLE jobs ADD COLUMN claim_token TEXT')
+        if 'ordering_key' not in columns:
+            conn.execute('ALTER TABLE jobs ADD COLUMN ordering_key TEXT')
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_available ON jobs (status, available_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_ordering ON jobs (ordering_key, id)')
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> int:
+        """Persist a job and return its id"""
+        now = time.time()
+        cursor = self._db.get().execute(
+            'INSERT INTO jobs (kind, payload, available_at, created_at, ordering_key) VALUES (?, ?, ?, ?, ?)',
+            (kind, json.dumps(payload), now, now, payload.get('from_number'))
+        )
+        logger.info("Enqueued %s job %s", kind, cursor.lastrowid)
+        return cursor.lastrowid
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Claim the next available job, hiding it from other workers until the visibility timeout"""
+        conn = self._db.get()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            while True:
+                # Skip jobs queued behind an earlier live job from the same sender
+                row = conn.execute(
+                    "SELECT * FROM jobs AS job WHERE status IN ('pending', 'running') AND available_at <= ? "
+                    "AND (ordering_key IS NULL OR NOT EXISTS ("
+                    "  SELECT 1 FROM jobs AS earlier WHERE earlier.ordering_key = job.ordering_key "
+                    "  AND earlier.id < job.id AND earlier.status IN ('pending', 'running'))) "
+                    "ORDER BY available_at LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    conn.execute('COMMIT')
+                    return None
+
+                # A running job whose visibility timeout expired was abandoned by its worker
+                if row['status'] == 'running' and row['attempts'] >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'dead', last_error = ? WHERE id = ?",
+                        ('visibility timeout expired', row['id'])
+                    )
+                    logger.error("Job %s exceeded max attempts after timing out", row['id'])
+                    continue
+
+                token = uuid.uuid4().hex
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, available_at = ?, claim_token = ? "
+                    "WHERE id = ?",
+                    (now + self.visibility_timeout, token, row['id'])
+                )
+                conn.execute('COMMIT')
+                return {
+                    'id': row['id'],
+                    'kind': row['kind'],
+                    'payload': json.loads(row['payload']),
+                    'attempts': row['attempts'] + 1,
+                    'token': token
+                }
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def ack(self, job_id: int, token: str) -> bool:
+        """Remove a successfully processed job. Returns False if the claim was lost."""
+        cursor = self._db.get().execute('DELETE FROM jobs WHERE id = ? AND claim_token = ?', (job_id, token))
+        if cursor.rowcount == 0:
+            logger.warning("Job %s was reclaimed by another worker, ignoring ack", job_id)
+            return False
+        return True
+
+    def fail(self, job_id: int, error: str, token: str) -> bool:
+        """Schedule a retry with exponential backoff, or mark the job dead. Returns False if the claim was lost."""
+        conn = self._db.get()
+        row = conn.execute(
+            "SELECT attempts FROM jobs WHERE id = ? AND claim_token = ? AND status = 'running'", (job_id, token)
+        ).fetchone()
+        if row is None:
+            logger.warning("Job %s was reclaimed by another worker, ignoring failure: %s", job_id, error)
+            return False
+
+        if row['attempts'] >= self.max_attempts:
+            conn.execute("UPDATE jobs SET status = 'dead', last_error = ? WHERE id = ?", (error, job_id))
+            logger.error("Job %s failed permanently after %s attempts: %s", job_id, row['attempts'], error)
+            return True
+
+        delay = self.retry_backoff ** row['attempts']
+        conn.execute(
+            "UPDATE jobs SET status = 'pending', available_at = ?, last_error = ? WHERE id = ?",
+            (time.time() + delay, error, job_id)
+        )
+        logger.warning("Job %s failed (attempt %s), retrying in %.1fs: %s", job_id, row['attempts'], delay, error)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth metrics"""
+        conn = self._db.get()
+        counts = {'pending': 0, 'running': 0, 'dead': 0}
+        for row in conn.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status'):
+            counts[row['status']] = row['n']
+
+        oldest = conn.execute("SELECT MIN(created_at) AS t FROM jobs WHERE status = 'pending'").fetchone()['t']
+        counts['oldest_pending_age'] = time.time() - oldest if oldest else 0.0
+        return counts
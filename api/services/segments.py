@@ -0,0 +1,94 @@
+import unicodedata
+from typing import List
+
+# GSM 03.38 basic character set; each costs one septet
+GSM7_BASIC = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+# Extension table; each costs an escape plus the character
+GSM7_EXTENDED = set("^{}\\[~]|€\f")
+
+# Typography Whisper and chat models emit that would otherwise force UCS-2
+REPLACEMENTS = {
+    '‘': "'", '’': "'", '‚': "'", '‛': "'", '′': "'",
+    '“': '"', '”': '"', '„': '"', '‟': '"', '″': '"',
+    '–': '-', '—': '-', '‒': '-', '−': '-', '‐': '-', '‑': '-',
+    '…': '...', '•': '-', '·': '-',
+    '\u00a0': ' ', '\u2002': ' ', '\u2003': ' ', '\u2007': ' ', '\u2009': ' ', '\u202f': ' ',
+    '\u200b': '', '\u200c': '', '\u200d': '', '\ufeff': '',
+    '\t': ' ', '`': "'", '´': "'",
+}
+
+GSM7_SINGLE, GSM7_MULTI = 160, 153
+UCS2_SINGLE, UCS2_MULTI = 70, 67
+
+ELLIPSIS = '...'
+
+def is_gsm7(text: str) -> bool:
+    return all(char in GSM7_BASIC or char in GSM7_EXTENDED for char in text)
+
+def encoding(text: str) -> str:
+    """'GSM-7' if every character is in the GSM alphabet, otherwise 'UCS-2'"""
+    return 'GSM-7' if is_gsm7(text) else 'UCS-2'
+
+def _normalize_char(char: str) -> str:
+    if char in GSM7_BASIC or char in GSM7_EXTENDED:
+        return char
+    if char in REPLACEMENTS:
+        return REPLACEMENTS[char]
+    # Drop accents the GSM alphabet lacks (e.g. á -> a) but keep ones it has
+    stripped = ''.join(c for c in unicodedata.normalize('NFKD', char) if not unicodedata.combining(c))
+    if stripped and all(c in GSM7_BASIC or c in GSM7_EXTENDED for c in stripped):
+        return stripped
+    return char
+
+def normalize_gsm(text: str) -> str:
+    """Replace look-alike characters so text stays in GSM-7 where possible.
+
+    Characters with no GSM equivalent (emoji, most non-Latin scripts) are
+    kept, and the message is then sent as UCS-2.
+    """
+    return ''.join(_normalize_char(char) for char in text)
+
+def _units(char: str, gsm: bool) -> int:
+    if gsm:
+        return 2 if char in GSM7_EXTENDED else 1
+    # UCS-2 segments count UTF-16 code units, so astral characters (emoji) take two
+    return 2 if ord(char) > 0xFFFF else 1
+
+def count_segments(text: str) -> int:
+    """Number of billed segments Twilio will split the message into"""
+    if not text:
+        return 1
+    gsm = is_gsm7(text)
+    single, multi = (GSM7_SINGLE, GSM7_MULTI) if gsm else (UCS2_SINGLE, UCS2_MULTI)
+    units = [_units(char, gsm) for char in text]
+    if sum(units) <= single:
+        return 1
+
+    # Escape sequences and surrogate pairs are never split across segments
+    segments, used = 1, 0
+    for size in units:
+        if used + size > multi:
+            segments += 1
+            used = 0
+        used += size
+    return segments
+
+def truncate_to_fit(text: str, fits) -> str:
+    """Longest word-boundary prefix of text (plus an ellipsis) for which fits(candidate) holds"""
+    if fits(text):
+        return text
+    words: List[str] = text.split(' ')
+    low, high = 0, len(words)
+    # Binary search on the number of words kept
+    while low < high:
+        mid = (low + high + 1) // 2
+        if fits(' '.join(words[:mid]).rstrip(' ,.;:') + ELLIPSIS):
+            low = mid
+        else:
+            high = mid - 1
+    if low == 0:
+        return ''
+    return ' '.join(words[:low]).rstrip(' ,.;:') + ELLIPSIS
@@ -1,27 +1,51 @@
+import asyncio
 import logging
-import requests
-from twilio.twiml.messaging_response import MessagingResponse
-from typing import Optional, Tuple
-from twilio.rest import Client
+from typing import List, Optional
 import os
 import hashlib
-from datetime import datetime, timedelta
-import asyncio
+from .dispatcher import OutboundDispatcher
+from .mailbox import KeyedExecutor
+from .metrics import registry
+from .pending import MemoryPendingStore
+from .segments import count_segments, encoding, normalize_gsm, truncate_to_fit
 
 logger = logging.getLogger(__name__)
 
+SMS_SEGMENTS = registry.histogram(
+    'sms_segments_per_message',
+    'Billed segments per outbound SMS',
+    ('encoding',),
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15)
+)
+
+THOUGHT_REPLY_PREFIX = "I've recorded your thought! Here's what I heard: "
+THOUGHT_REPLY_SUFFIX = (
+    "\n\nSuggested tags: {tags}\n"
+    "Reply with your chosen tags (comma-separated) or 'skip' to skip tagging."
+)
+
 class SMSService:
-    def __init__(self, twilio_client, phone_number: str, audio_service=None, storage_service=None, chat_service=None, tag_service=None):
+    def __init__(self, twilio_client, phone_number: str, audio_service=None, storage_service=None, chat_service=None, tag_service=None, pending_store=None, dispatcher=None, mailboxes=None, segment_budget: int = 3):
         self.client = twilio_client
         self.phone_number = phone_number
         self.audio = audio_service
         self.storage = storage_service
         self.chat = chat_service
         self.tags = tag_service
+        # Thoughts awaiting a tag reply; pass a shared store when running several workers
+        self.pending = pending_store if pending_store is not None else MemoryPendingStore()
+        # Sends go through a rate-limited background queue so handlers never wait on Twilio
+        self.dispatcher = dispatcher if dispatcher is not None else OutboundDispatcher(twilio_client)
+        # One mailbox per phone number keeps each user's messages in order
+        self.mailboxes = mailboxes if mailboxes is not None else KeyedExecutor()
+        self.segment_budget = segment_budget
         logger.info(f"SMS service initialized with phone number: {phone_number}")
 
     async def handle_message(self, from_number: str, message: str, media_url: Optional[str] = None, content_type: Optional[str] = None) -> None:
-        """Handle incoming SMS message"""
+        """Handle incoming SMS message after any earlier messages from the same number"""
+        return await self.mailboxes.run(from_number, self._handle_message, from_number, message, media_url, content_type)
+
+    async def _handle_message(self, from_number: str, message: str, media_url: Optional[str] = None, content_type: Optional[str] = None) -> None:
         try:
             # Check for pending tag confirmation
             pending_thought_id = self._get_pending_thought(from_number)
@@ -29,7 +53,7 @@ class SMSService:
             if pending_thought_id and not media_url:
                 # This is a tag confirmation message
                 if message.lower() == 'skip':
-                    del self._pending_thoughts[from_number]
+                    self._clear_pending_thought(from_number)
                     await self.send_sms(from_number, "Skipped tagging. Your thought has been saved!")
                     return
                 
@@ -37,7 +61,7 @@ class SMSService:
                 confirmed_tags = await self.tags.process_tag_confirmation(message)
                 await self.tags.store_thought_tags(pending_thought_id, confirmed_tags, from_number)
                 
-                del self._pending_thoughts[from_number]
+                self._clear_pending_thought(from_number)
                 await self.send_sms(
                     from_number,
                     f"Tags added: {', '.join(confirmed_tags)}\nYour thought has been saved!"
@@ -58,7 +82,7 @@ class SMSService:
     async def handle_text_message(self, from_number: str, message: str) -> None:
         """Handle text message"""
         try:
-            logger.info(f"Processing text from {from_number}: {message}...")
+            logger.info("Processing text from %s", from_number, extra={'body': message})
             response = await self.chat.process_message(from_number, message)
             await self.send_sms(from_number, response)
         except Exception as e:
@@ -68,9 +92,9 @@ class SMSService:
     async def handle_audio_message(self, from_number: str, media_url: str, content_type: str) -> None:
         """Handle audio message"""
         try:
-            logger.info(f"Processing audio from {from_number}")
+            logger.info("Processing audio from %s", from_number)
             audio_transcribed = await self.audio.process_audio(media_url, content_type)
-            logger.info(f"Audio transcribed: {audio_transcribed}")
+            logger.info("Audio transcribed", extra={'transcription': audio_transcribed})
             
             # Store the transcribed thought
             thought_data = await self.storage.store_thought(from_number, audio_transcribed)
@@ -80,12 +104,7 @@ class SMSService:
             suggested_tags = await self.tags.suggest_tags(audio_transcribed, from_number)
             
             # Send transcription and tag suggestions
-            await self.send_sms(
-                from_number,
-                f"I've recorded your thought! Here's what I heard: {audio_transcribed}\n\n" +
-                f"Suggested tags: {', '.join(suggested_tags)}\n" +
-                "Reply with your chosen tags (comma-separated) or 'skip' to skip tagging."
-            )
+            await self.send_sms(from_number, self.compose_thought_reply(audio_transcribed, suggested_tags))
             
             # Store the thought ID in temporary storage for tag confirmation
             self._store_pending_thought(from_number, thought_id)
@@ -94,20 +113,32 @@ class SMSService:
             logger.error(f"Failed to handle audio message: {str(e)}")
             raise
 
+    def compose_thought_reply(self, transcription: str, suggested_tags: List[str]) -> str:
+        """Echo the transcription and tag suggestions within the segment budget.
+
+        The echoed transcription is cut at a word boundary when the full reply
+        would need more than `segment_budget` segments.
+        """
+        suffix = normalize_gsm(THOUGHT_REPLY_SUFFIX.format(tags=', '.join(suggested_tags)))
+        echo = truncate_to_fit(
+            normalize_gsm(transcription.strip()),
+            lambda candidate: count_segments(THOUGHT_REPLY_PREFIX + candidate + suffix) <= self.segment_budget
+        )
+        if not echo:
+            return "I've recorded your thought!" + suffix
+        return THOUGHT_REPLY_PREFIX + echo + suffix
+
+    def _prepare(self, body: str) -> str:
+        """Normalize to GSM-7 where possible and record the segment count"""
+        body = normalize_gsm(body)
+        SMS_SEGMENTS.observe(count_segments(body), encoding=encoding(body))
+        return body
+
     async def send_sms(self, to_number: str, message: str) -> None:
-        """Send SMS message"""
+        """Queue an SMS message for sending"""
         try:
-            logger.info(f"Sending SMS response: {message[:20]}...")
-            # Run Twilio API call in an executor to prevent blocking
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None,
-                lambda: self.client.messages.create(
-                    body=message,
-                    from_=self.phone_number,
-                    to=to_number
-                )
-            )
+            logger.info("Queueing SMS response to %s", to_number)
+            self.dispatcher.submit(to_number, self._prepare(message), from_=self.phone_number)
         except Exception as e:
             logger.error(f"Failed to send SMS: {str(e)}")
             raise
@@ -123,47 +154,30 @@ class SMSService:
             logger.error(f"Failed to send error message: {str(e)}")
             # Don't raise here to avoid error cascade
 
-    async def send_message(self, to: str, body: str) -> None:
-        """Send an SMS message using Twilio"""
+    async def send_message(self, to: str, body: str, wait_for_delivery: bool = False) -> None:
+        """Queue an SMS message for sending through Twilio.
+
+        The dispatcher retries failed sends on its own. Pass wait_for_delivery
+        to return only once Twilio has accepted the message, and to see the
+        error if it never does.
+        """
         try:
-            logger.info(f"Sending message to {to}")
-            # Run Twilio API call in an executor to prevent blocking
-            loop = asyncio.get_event_loop()
-            message = await loop.run_in_executor(
-                None,
-                lambda: self.client.messages.create(
-                    body=body,
-                    from_=self.phone_number,
-                    to=to
-                )
-            )
-            logger.info(f"Message sent successfully: {message.sid}")
+            logger.info("Queueing message to %s", to)
+            future = self.dispatcher.submit(to, self._prepare(body), from_=self.phone_number)
+            if wait_for_delivery:
+                await asyncio.wrap_future(future)
         except Exception as e:
             logger.error(f"Failed to send message: {str(e)}")
             raise
 
     def _store_pending_thought(self, user_phone: str, thought_id: str) -> None:
         """Store thought ID waiting for tag confirmation."""
-        # You might want to use a proper temporary storage solution in production
-        if not hasattr(self, '_pending_thoughts'):
-            self._pending_thoughts = {}
-        self._pending_thoughts[user_phone] = {
-            'thought_id': thought_id,
-            'timestamp': datetime.now()
-        }
+        self.pending.put(user_phone, thought_id)
 
     def _get_pending_thought(self, user_phone: str) -> Optional[str]:
-        """Get pending thought ID for tag confirmation."""
-        if not hasattr(self, '_pending_thoughts'):
-            return None
-        
-        pending = self._pending_thoughts.get(user_phone)
-        if not pending:
-            return None
-            
-        # Check if the pending thought is still valid (within 5 minutes)
-        if datetime.now() - pending['timestamp'] > timedelta(minutes=5):
-            del self._pending_thoughts[user_phone]
-            return None
-            
-        return pending['thought_id']
+        """Get pending thought ID for tag confirmation (None once the TTL has passed)."""
+        return self.pending.get(user_phone)
+
+    def _clear_pending_thought(self, user_phone: str) -> None:
+        """Forget a thought once its tags are confirmed or skipped."""
+        self.pending.pop(user_phone)
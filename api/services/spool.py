@@ -0,0 +1,172 @@
+import hashlib
+import io
+import logging
+import tempfile
+from typing import AsyncIterator, BinaryIO, Optional
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SPOOL_SPILLS = registry.counter('audio_spool_spills_total', 'Audio buffers that outgrew memory and moved to a temp file')
+AUDIO_PEAK_MEMORY = registry.histogram(
+    'audio_request_peak_bytes',
+    'Most audio bytes one voice note held in memory at once',
+    ('path',),
+    buckets=(16384, 65536, 262144, 1048576, 4194304, 8388608, 16777216, 33554432, 67108864)
+)
+
+# Bytes kept from the start of every spool so formats can be sniffed without reading it back
+HEAD_BYTES = 64
+
+class AudioTooLarge(Exception):
+    """Audio exceeded the hard size limit"""
+
+    def __init__(self, size: int, max_bytes: int):
+        super().__init__(f"Audio is larger than {max_bytes} bytes (got at least {size})")
+        self.size = size
+        self.max_bytes = max_bytes
+
+class MemoryMeter:
+    """Tracks the audio bytes one request holds in memory and their high-water mark"""
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+
+    def add(self, size: int) -> None:
+        self.current += size
+        self.peak = max(self.peak, self.current)
+
+    def sub(self, size: int) -> None:
+        self.current -= size
+
+class SpooledAudio:
+    """One buffer for a clip: in memory up to `spill_bytes`, then in an anonymous temp file.
+
+    Writes past `max_bytes` raise AudioTooLarge, so an oversized download is
+    cut off instead of being buffered. The SHA-256 of the contents and the
+    first bytes are kept as data arrives, so hashing and format sniffing never
+    read the buffer back. Uploads and ffmpeg read straight from `file()`.
+    """
+
+    def __init__(self, spill_bytes: int = 8 * 1024 * 1024, max_bytes: Optional[int] = None,
+                 meter: Optional[MemoryMeter] = None):
+        self.spill_bytes = spill_bytes
+        self.max_bytes = max_bytes
+        self.meter = meter
+        self.head = b''
+        self._file: BinaryIO = io.BytesIO()
+        self._size = 0
+        self._spilled = False
+        self._digest = hashlib.sha256()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, spill_bytes: int = 8 * 1024 * 1024, meter: Optional[MemoryMeter] = None) -> 'SpooledAudio':
+        spool = cls(spill_bytes, meter=meter)
+        spool.write(data)
+        return spool
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def spilled(self) -> bool:
+        return self._spilled
+
+    @property
+    def sha256(self) -> str:
+        return self._digest.hexdigest()
+
+    def write(self, chunk: bytes) -> None:
+        if self.max_bytes is not None and self._size + len(chunk) > self.max_bytes:
+            raise AudioTooLarge(self._size + len(chunk), self.max_bytes)
+        if not self._spilled and self._size + len(chunk) > self.spill_bytes:
+            self._spill()
+        self._file.write(chunk)
+        self._digest.update(chunk)
+        if len(self.head) < HEAD_BYTES:
+            self.head += bytes(chunk[:HEAD_BYTES - len(self.head)])
+        self._size += len(chunk)
+        if not self._spilled and self.meter:
+            self.meter.add(len(chunk))
+
+    def _spill(self, outgrown: bool = True) -> None:
+        disk = tempfile.NamedTemporaryFile()
+        disk.write(self._file.getbuffer())
+        self._file = disk
+        self._spilled = True
+        if self.meter:
+            self.meter.sub(self._size)
+        if outgrown:
+            SPOOL_SPILLS.inc()
+        logger.info("Audio buffer spilled to disk at %d bytes", self._size)
+
+    def spill(self) -> str:
+        """Move the contents to the temp file if they aren't there yet and return its path.
+
+        For tools such as ffprobe that need to seek in the input, which a pipe doesn't allow.
+        """
+        if not self._spilled:
+            self._spill(outgrown=False)
+        self._file.flush()
+        return self._file.name
+
+    def file(self) -> BinaryIO:
+        """The underlying file, rewound for reading"""
+        self._file.seek(0)
+        return self._file
+
+    def view(self) -> memoryview:
+        """The contents without a copy; only available while the buffer is in memory"""
+        if self._spilled:
+            raise ValueError("Spilled audio has no in-memory view")
+        return self._file.getbuffer()
+
+    def getvalue(self) -> bytes:
+        """The contents as bytes (a copy, read back from disk if spilled)"""
+        return self.file().read()
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        if not self._spilled and self.meter:
+            self.meter.sub(self._size)
+        self._file.close()
+
+    def __enter__(self) -> 'SpooledAudio':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+def check_content_length(content_length: Optional[int], max_bytes: Optional[int]) -> None:
+    """Reject a response up front when its declared size is already over the limit"""
+    if max_bytes is not None and content_length is not None and content_length > max_bytes:
+        raise AudioTooLarge(content_length, max_bytes)
+
+async def spool_stream(chunks: AsyncIterator[bytes], spill_bytes: int, max_bytes: Optional[int] = None,
+                       meter: Optional[MemoryMeter] = None) -> SpooledAudio:
+    """Read a stream of chunks into a SpooledAudio, enforcing the size limit as it arrives"""
+    spool = SpooledAudio(spill_bytes, max_bytes, meter)
+    try:
+        async for chunk in chunks:
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    return spool
+
+async def limit_stream(chunks: AsyncIterator[bytes], max_bytes: Optional[int],
+                       meter: Optional[MemoryMeter] = None) -> AsyncIterator[bytes]:
+    """Pass chunks through unbuffered, raising once more than max_bytes have gone by"""
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+        if max_bytes is not None and size > max_bytes:
+            raise AudioTooLarge(size, max_bytes)
+        if meter:
+            meter.add(len(chunk))
+        yield chunk
+        if meter:
+            meter.sub(len(chunk))
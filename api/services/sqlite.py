@@ -0,0 +1,31 @@
+import sqlite3
+import threading
+
+class SQLiteConnections:
+    """Per-thread connections to one SQLite file shared by the web app and the workers.
+
+    sqlite3 connections can't cross threads, so each thread opens its own on
+    first use. Connections run in autocommit mode with WAL journaling, so
+    readers in other processes never wait on a writer.
+    """
+
+    def __init__(self, path: str, timeout: float = 10, row_factory=None, mmap_size: int = 0):
+        self.path = path
+        self.timeout = timeout
+        self.row_factory = row_factory
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+
+    def get(self) -> sqlite3.Connection:
+        """The connection for the current thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            if self.row_factory is not None:
+                conn.row_factory = self.row_factory
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if self.mmap_size:
+                conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+            self._local.conn = conn
+        return conn
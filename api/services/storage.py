@@ -1,12 +1,15 @@
+import asyncio
 import logging
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 import os
-from supabase import create_client
-from api.services.vector import VectorService
+from .metrics import track
 
 logger = logging.getLogger(__name__)
 
+# PostgREST and Postgres error codes for a thoughts table without the unique message_sid column
+MISSING_MESSAGE_SID_CODES = {'PGRST204', '42703', '42P10'}
+
 class StorageService:
     def __init__(self, supabase_client, vector_service=None):
         self.supabase = supabase_client
@@ -17,6 +20,8 @@ class StorageService:
             logger.info("Vector service successfully connected to storage service")
         self.messages_table = 'chat_history'
         self.thoughts_table = 'thoughts'
+        # Cleared the first time the table turns out to predate the message_sid migration
+        self.upsert_on_message_sid = True
         logger.info(f"Storage service initialized with vector service: {bool(vector_service)}")
 
     async def store_chat_message(self, message: str, from_number: str = None, response: str = None, related_thought_ids: List[str] = None) -> None:
@@ -39,8 +44,10 @@ class StorageService:
                 'created_at': datetime.now().isoformat()
             }
             
-            logger.info(f"Storing user message: {user_data}")
-            result = await self.supabase.table(self.messages_table).insert(user_data).execute()
+            logger.debug("Storing user message", extra={'user_phone': from_number, 'message_length': len(message)})
+            with track('supabase_insert'):
+                # The Supabase client is synchronous, so its HTTP call runs off the loop
+                result = await asyncio.to_thread(self.supabase.table(self.messages_table).insert(user_data).execute)
             if hasattr(result, 'error') and result.error:
                 raise Exception(f"Supabase error: {result.error}")
             
@@ -52,8 +59,9 @@ class StorageService:
                     'is_user': False,
                     'created_at': datetime.now().isoformat()
                 }
-                logger.info(f"Storing assistant response: {response_data}")
-                result = await self.supabase.table(self.messages_table).insert(response_data).execute()
+                logger.debug("Storing assistant response", extra={'user_phone': from_number, 'response': response})
+                with track('supabase_insert'):
+                    result = await asyncio.to_thread(self.supabase.table(self.messages_table).insert(response_data).execute)
                 if hasattr(result, 'error') and result.error:
                     raise Exception(f"Supabase error storing response: {result.error}")
                 
@@ -61,8 +69,15 @@ class StorageService:
             logger.error(f"Failed to store chat message: {str(e)}")
             raise
 
-    async def store_thought(self, from_number: str, thought: str, embedding: Optional[List[float]] = None) -> Dict:
-        """Store a thought in the database"""
+    async def store_thought(self, from_number: str, thought: str, embedding: Optional[List[float]] = None,
+                            message_sid: Optional[str] = None) -> Dict:
+        """Store a thought in the database.
+
+        With a message_sid the write is an upsert on the thoughts.message_sid
+        unique column, so a retried job returns the row it stored the first time.
+        Before supabase/migrations has added that column, thoughts are inserted
+        without it.
+        """
         try:
             data = {
                 'user_phone': from_number,
@@ -72,8 +87,12 @@ class StorageService:
             if embedding:
                 data['metadata'] = {'embedding': embedding}
             
-            logger.info(f"Storing thought in Supabase: {data}")
-            result = self.supabase.table(self.thoughts_table).insert(data).execute()
+            logger.info("Storing thought in Supabase for %s", from_number)
+            with track('supabase_insert'):
+                if message_sid and self.upsert_on_message_sid:
+                    result = self._upsert_thought(data, message_sid)
+                else:
+                    result = self.supabase.table(self.thoughts_table).insert(data).execute()
             if hasattr(result, 'error') and result.error:
                 raise Exception(f"Supabase error: {result.error}")
             if not result.data:
@@ -83,6 +102,19 @@ class StorageService:
             logger.error(f"Failed to store thought: {str(e)}")
             raise
 
+    def _upsert_thought(self, data: Dict, message_sid: str):
+        try:
+            return self.supabase.table(self.thoughts_table).upsert(
+                {**data, 'message_sid': message_sid}, on_conflict='message_sid'
+            ).execute()
+        except Exception as e:
+            if getattr(e, 'code', None) not in MISSING_MESSAGE_SID_CODES:
+                raise
+            logger.warning("thoughts has no unique message_sid column, so retried jobs may store duplicates; "
+                           "apply supabase/migrations to fix this: %s", e)
+            self.upsert_on_message_sid = False
+            return self.supabase.table(self.thoughts_table).insert(data).execute()
+
     async def search_thoughts(self, query: str, limit: int = 5) -> List[Dict]:
         try:
             if not self.vector_service:
@@ -1,22 +1,26 @@
-from typing import List
-from openai import OpenAI
-from .storage import StorageService
-from .vector import VectorService
+from typing import List, Optional, TYPE_CHECKING
 import logging
+from .metrics import track
+from .openai_client import OpenAIClientManager
+
+if TYPE_CHECKING:
+    from .storage import StorageService
+    from .vector import VectorService
 
 logger = logging.getLogger(__name__)
 
 class TagService:
-    def __init__(self, storage_service: StorageService, vector_service: VectorService):
+    def __init__(self, storage_service: 'StorageService', vector_service: 'VectorService',
+                 openai_client: Optional[OpenAIClientManager] = None):
         self.storage = storage_service
         self.vector = vector_service
-        self.openai_client = OpenAI()
+        self.openai = openai_client or OpenAIClientManager()
 
     async def suggest_tags(self, transcription: str, user_phone: str) -> List[str]:
         """Generate tag suggestions for a transcribed thought."""
         try:
             existing_tags = await self.storage.get_existing_tags(user_phone)
-            logger.info(f"Found existing tags: {existing_tags}")
+            logger.debug("Found existing tags: %s", existing_tags)
             
             prompt = f"""
             Analyze this transcription and suggest relevant tags.
@@ -27,29 +31,30 @@ class TagService:
             Limit to 5 most relevant tags.
             """
             
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{
-                    "role": "system",
-                    "content": "You are a helpful assistant that suggests relevant tags for thoughts. Return only the comma-separated list of tags, nothing else."
-                }, {
-                    "role": "user",
-                    "content": prompt
-                }]
-            )
+            with track('tag_suggestion'):
+                response = await self.openai.run(lambda client: client.chat.completions.create(
+                    model="gpt-3.5-turbo",
+                    messages=[{
+                        "role": "system",
+                        "content": "You are a helpful assistant that suggests relevant tags for thoughts. Return only the comma-separated list of tags, nothing else."
+                    }, {
+                        "role": "user",
+                        "content": prompt
+                    }]
+                ))
             
             if not response.choices or not response.choices[0].message.content:
                 logger.warning("No tag suggestions generated")
                 return []
                 
             suggested_tags = response.choices[0].message.content.strip()
-            logger.info(f"Raw tag suggestions: {suggested_tags}")
+            logger.debug("Raw tag suggestions: %s", suggested_tags)
             
             if not suggested_tags:
                 return []
                 
             tags = [tag.strip() for tag in suggested_tags.split(",") if tag.strip()]
-            logger.info(f"Processed tag suggestions: {tags}")
+            logger.info("Processed tag suggestions: %s", tags)
             return tags
             
         except Exception as e:
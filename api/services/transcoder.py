@@ -0,0 +1,158 @@
+import asyncio
+import concurrent.futures
+import logging
+import os
+import re
+import shutil
+import subprocess
+import threading
+from typing import List, Optional, Tuple, Union
+
+from .metrics import registry, track
+from .spool import SpooledAudio
+
+logger = logging.getLogger(__name__)
+
+TRANSCODE_QUEUE = registry.gauge('transcode_jobs_waiting', 'Transcode jobs waiting for a free ffmpeg slot')
+
+SILENCE_PATTERN = re.compile(r'silence_(start|end): (-?[\d.]+)')
+
+class TranscodeError(Exception):
+    """ffmpeg failed, timed out or could not be started"""
+
+class FFmpegTranscoder:
+    """Converts audio with a bounded pool of ffmpeg processes fed through pipes.
+
+    Each job streams the input to ffmpeg's stdin and reads the result from
+    stdout, so nothing touches disk. At most `max_workers` ffmpeg processes
+    run at once; further jobs wait for a slot. A job that runs longer than
+    `timeout` seconds is killed.
+    """
+
+    def __init__(self, ffmpeg_path: str = 'ffmpeg', max_workers: Optional[int] = None, timeout: float = 20.0,
+                 bitrate: str = '64k', sample_rate: int = 16000, ffprobe_path: Optional[str] = None):
+        self.ffmpeg_path = ffmpeg_path
+        # ffprobe ships next to ffmpeg
+        self.ffprobe_path = ffprobe_path or os.path.join(os.path.dirname(ffmpeg_path), 'ffprobe')
+        self.max_workers = max_workers or os.cpu_count() or 2
+        self.timeout = timeout
+        self.bitrate = bitrate
+        self.sample_rate = sample_rate
+        self._executor = concurrent.futures.ThreadPoolExecutor(self.max_workers, thread_name_prefix='ffmpeg')
+        self._waiting = 0
+        self._lock = threading.Lock()
+        logger.info(f"ffmpeg transcoder initialized ({self.max_workers} workers, {timeout}s timeout)")
+
+    @staticmethod
+    def available(ffmpeg_path: str = 'ffmpeg') -> bool:
+        return shutil.which(ffmpeg_path) is not None
+
+    def command(self, input_format: Optional[str] = None, output_format: str = 'mp3') -> List[str]:
+        cmd = [self.ffmpeg_path, '-hide_banner', '-loglevel', 'error']
+        if input_format:
+            cmd += ['-f', input_format]
+        cmd += ['-i', 'pipe:0', '-vn', '-ac', '1', '-ar', str(self.sample_rate)]
+        if output_format == 'mp3':
+            cmd += ['-codec:a', 'libmp3lame', '-b:a', self.bitrate]
+        cmd += ['-f', output_format, 'pipe:1']
+        return cmd
+
+    def decode_command(self, noise_db: int, min_silence: float) -> List[str]:
+        # silencedetect reports at info level, so stderr carries the silent spans
+        return [self.ffmpeg_path, '-hide_banner', '-nostats', '-loglevel', 'info', '-i', 'pipe:0', '-vn',
+                '-af', f'silencedetect=noise={noise_db}dB:d={min_silence}',
+                '-ac', '1', '-ar', str(self.sample_rate), '-f', 's16le', 'pipe:1']
+
+    def probe_command(self, path: str) -> List[str]:
+        # From a pipe AMR and MP3 report no duration; with a seekable file ffprobe can work it out
+        return [self.ffprobe_path, '-v', 'error', '-show_entries', 'format=duration',
+                '-of', 'default=noprint_wrappers=1:nokey=1', '-i', path]
+
+    def preprocess_command(self, trim_db: int, bitrate: str) -> List[str]:
+        # silenceremove only trims the start, so the clip is reversed to trim the end too
+        trim = f'silenceremove=start_periods=1:start_threshold={trim_db}dB:start_silence=0.2'
+        return [self.ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0', '-vn',
+                '-af', f'{trim},areverse,{trim},areverse',
+                '-ac', '1', '-ar', str(self.sample_rate),
+                '-codec:a', 'libopus', '-b:a', bitrate, '-application', 'voip', '-f', 'ogg', 'pipe:1']
+
+    def _run(self, cmd: List[str], data: Union[bytes, SpooledAudio, None]) -> subprocess.CompletedProcess:
+        try:
+            if data is None:
+                # The command names its own input file
+                result = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=self.timeout)
+            elif isinstance(data, SpooledAudio) and data.spilled:
+                # ffmpeg reads the temp file directly, so it is never loaded into memory
+                result = subprocess.run(cmd, stdin=data.file(), stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=self.timeout)
+            elif isinstance(data, SpooledAudio):
+                with data.view() as view:
+                    result = subprocess.run(cmd, input=view, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=self.timeout)
+            else:
+                result = subprocess.run(cmd, input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            # subprocess.run has already killed and reaped the process
+            raise TranscodeError(f"ffmpeg timed out after {self.timeout}s")
+        except OSError as e:
+            raise TranscodeError(f"Could not start ffmpeg: {str(e)}")
+        if result.returncode != 0:
+            raise TranscodeError(f"ffmpeg exited with {result.returncode}: {result.stderr.decode(errors='replace')[-500:]}")
+        if not result.stdout:
+            raise TranscodeError("ffmpeg produced no output")
+        return result
+
+    async def _submit(self, cmd: List[str], data: Union[bytes, SpooledAudio, None]) -> subprocess.CompletedProcess:
+        self._adjust_waiting(1)
+
+        def run():
+            # Leaves the waiting count once a pool thread picks the job up
+            self._adjust_waiting(-1)
+            return self._run(cmd, data)
+
+        async with track('transcode'):
+            return await asyncio.get_running_loop().run_in_executor(self._executor, run)
+
+    async def transcode(self, data: Union[bytes, SpooledAudio], input_format: Optional[str] = None, output_format: str = 'mp3') -> bytes:
+        """Convert audio bytes to the output format; ffmpeg probes the input unless input_format is given"""
+        output = (await self._submit(self.command(input_format, output_format), data)).stdout
+        logger.info("Transcoded %d bytes to %d bytes of %s", len(data), len(output), output_format)
+        return output
+
+    async def preprocess(self, data: Union[bytes, SpooledAudio], trim_db: int = -45, bitrate: str = '16k') -> bytes:
+        """Mono, resampled, silence-trimmed Ogg Opus at a speech bitrate, ready for Whisper"""
+        output = (await self._submit(self.preprocess_command(trim_db, bitrate), data)).stdout
+        logger.info("Preprocessed %d bytes to %d bytes of ogg", len(data), len(output))
+        return output
+
+    async def probe_duration(self, audio: SpooledAudio) -> Optional[float]:
+        """Duration of the clip in seconds, or None when ffprobe can't tell; spills the clip to disk to probe it"""
+        try:
+            path = await asyncio.to_thread(audio.spill)
+            output = (await self._submit(self.probe_command(path), None)).stdout
+            return float(output.decode().strip())
+        except (TranscodeError, ValueError) as e:
+            logger.info("Could not probe clip duration: %s", e)
+            return None
+
+    async def decode(self, data: Union[bytes, SpooledAudio], noise_db: int = -35, min_silence: float = 0.3) -> Tuple[bytes, List[Tuple[float, float]]]:
+        """Decode to mono 16-bit PCM at sample_rate and return it with the silent spans, in seconds"""
+        result = await self._submit(self.decode_command(noise_db, min_silence), data)
+        duration = len(result.stdout) / (2 * self.sample_rate)
+        silences, start = [], None
+        for kind, value in SILENCE_PATTERN.findall(result.stderr.decode(errors='replace')):
+            if kind == 'start':
+                start = max(0.0, float(value))
+            elif start is not None:
+                silences.append((start, float(value)))
+                start = None
+        if start is not None:
+            # Trailing silence runs to the end of the clip
+            silences.append((start, duration))
+        return result.stdout, silences
+
+    def _adjust_waiting(self, delta: int) -> None:
+        with self._lock:
+            self._waiting += delta
+            TRANSCODE_QUEUE.set(self._waiting)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
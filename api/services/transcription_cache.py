@@ -0,0 +1,35 @@
+import hashlib
+import logging
+from typing import Optional
+
+from .metrics import registry
+from .ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_LOOKUPS = registry.counter('transcription_cache_total', 'Transcription cache lookups by result', ('result',))
+
+class TranscriptionCache(TTLCache):
+    """Transcripts keyed by a hash of the audio bytes and the model that produced them.
+
+    A forwarded voice note or a retried Twilio delivery carries the same media,
+    so its transcript can be replayed without converting or calling Whisper.
+    The memory tier holds up to `max_entries` transcripts and the shared file
+    up to `max_bytes` of transcript text.
+    """
+
+    def __init__(self, max_entries: int = 1000, path: Optional[str] = None,
+                 max_bytes: int = 50 * 1024 * 1024, ttl: Optional[float] = None, sweep_interval: int = 50):
+        super().__init__('transcription_cache', CACHE_LOOKUPS, max_entries=max_entries, path=path,
+                         max_bytes=max_bytes, ttl=ttl, sweep_interval=sweep_interval)
+        logger.info(f"Transcription cache initialized (max_entries={max_entries}, persistent={bool(path)})")
+
+    @staticmethod
+    def key(audio: bytes, model: str) -> str:
+        """Content address for a clip; a different model gets a different key"""
+        return TranscriptionCache.key_from_digest(hashlib.sha256(audio).hexdigest(), model)
+
+    @staticmethod
+    def key_from_digest(audio_sha256: str, model: str) -> str:
+        """Same key as key(), from a SHA-256 taken while the audio streamed in"""
+        return hashlib.sha256(f"{model}\x1f{audio_sha256}".encode('utf-8')).hexdigest()
@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Union
+
+from .metrics import Counter
+from .sqlite import SQLiteConnections
+
+logger = logging.getLogger(__name__)
+
+Value = Union[str, bytes]
+
+class TTLCache:
+    """An in-memory LRU in front of an optional SQLite file shared by every process on the host.
+
+    The memory tier is bounded by `max_entries` and/or `memory_bytes`. The file
+    is trimmed to `max_bytes` by least recent use every `sweep_interval` writes.
+    Entries older than `ttl` seconds are treated as misses and swept with the
+    rest; with no ttl they live until evicted. Values are str or bytes, and
+    every lookup is counted on `lookups` by result (memory, disk or miss).
+    """
+
+    def __init__(self, table: str, lookups: Counter, max_entries: Optional[int] = None,
+                 memory_bytes: Optional[int] = None, path: Optional[str] = None,
+                 max_bytes: int = 50 * 1024 * 1024, ttl: Optional[float] = None, sweep_interval: int = 100):
+        self.table = table
+        self.lookups = lookups
+        self.max_entries = max_entries
+        self.memory_bytes = memory_bytes
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        # key -> (value, size, expires_at)
+        self._entries = OrderedDict()
+        self._resident = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._db = SQLiteConnections(path) if path else None
+        if path:
+            conn = self._db.get()
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    expires_at REAL
+                )
+            """)
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed_at)')
+
+    @staticmethod
+    def _size(value: Value) -> int:
+        return len(value.encode('utf-8')) if isinstance(value, str) else len(value)
+
+    def _remember(self, key: str, value: Value, size: int, expires_at: Optional[float]) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._resident -= previous[1]
+            self._entries[key] = (value, size, expires_at)
+            self._resident += size
+            while self._entries and (
+                (self.max_entries is not None and len(self._entries) > self.max_entries)
+                or (self.memory_bytes is not None and self._resident > self.memory_bytes)
+            ):
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self._resident -= evicted
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._resident -= entry[1]
+
+    def get(self, key: str) -> Optional[Value]:
+        """Cached value for a key, or None if it is missing or expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= now:
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            self.lookups.inc(result='memory')
+            return entry[0]
+        self._forget(key)
+
+        if self.path:
+            conn = self._db.get()
+            row = conn.execute(
+                f'SELECT value, size, expires_at FROM {self.table} WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)',
+                (key, now)
+            ).fetchone()
+            if row:
+                conn.execute(f'UPDATE {self.table} SET accessed_at = ? WHERE key = ?', (now, key))
+                self._remember(key, row[0], row[1], row[2])
+                self.lookups.inc(result='disk')
+                return row[0]
+        self.lookups.inc(result='miss')
+        return None
+
+    def put(self, key: str, value: Value) -> None:
+        now = time.time()
+        size = self._size(value)
+        expires_at = now + self.ttl if self.ttl is not None else None
+        self._remember(key, value, size, expires_at)
+        if not self.path:
+            return
+        self._db.get().execute(
+            f'INSERT OR REPLACE INTO {self.table} (key, value, size, accessed_at, expires_at) VALUES (?, ?, ?, ?, ?)',
+            (key, value, size, now, expires_at)
+        )
+        with self._lock:
+            self._writes += 1
+            sweep = self._writes % self.sweep_interval == 0
+        if sweep:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired rows, then the least recently used until the file holds at most max_bytes"""
+        if not self.path:
+            return 0
+        conn = self._db.get()
+        removed = conn.execute(f'DELETE FROM {self.table} WHERE expires_at <= ?', (time.time(),)).rowcount
+        total = conn.execute(f'SELECT COALESCE(SUM(size), 0) FROM {self.table}').fetchone()[0]
+        excess = total - self.max_bytes
+        if excess > 0:
+            for key, size in conn.execute(f'SELECT key, size FROM {self.table} ORDER BY accessed_at').fetchall():
+                if excess <= 0:
+                    break
+                conn.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+                excess -= size
+                removed += 1
+        if removed:
+            logger.info("Evicted %d rows from %s", removed, self.table)
+        return removed
+
+    def stats(self) -> dict:
+        """Entries and bytes held in memory, plus lookups and hit rate since start"""
+        lookups = {result: self.lookups.value(result=result) for result in ('memory', 'disk', 'miss')}
+        total = sum(lookups.values())
+        with self._lock:
+            entries, resident = len(self._entries), self._resident
+        return {
+            'entries': entries,
+            'memory_bytes': resident,
+            'lookups': lookups,
+            'hit_rate': (lookups['memory'] + lookups['disk']) / total if total else 0.0
+        }
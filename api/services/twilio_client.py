@@ -0,0 +1,55 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+TWILIO_API_BASE_URL = 'https://api.twilio.com'
+
+class TwilioAPIError(Exception):
+    """A non-2xx response from the Twilio REST API"""
+
+    def __init__(self, status: int, message: str, code: Optional[int] = None):
+        super().__init__(f"Twilio API error {status}: {message}")
+        self.status = status
+        self.code = code
+
+class AsyncTwilioClient:
+    """Sends messages through Twilio's REST API on a pooled aiohttp session.
+
+    A send is a coroutine waiting on a socket rather than a thread blocked in
+    the SDK, so the number in flight is bounded only by the connection pool.
+    """
+
+    def __init__(self, account_sid: str, auth_token: str, from_number: str, http_client,
+                 base_url: Optional[str] = None):
+        self.account_sid = account_sid
+        self.from_number = from_number
+        self.http = http_client
+        self.base_url = (base_url or TWILIO_API_BASE_URL).rstrip('/')
+        self.auth = aiohttp.BasicAuth(account_sid or '', auth_token or '')
+
+    @property
+    def messages_url(self) -> str:
+        return f"{self.base_url}/2010-04-01/Accounts/{self.account_sid}/Messages.json"
+
+    async def send_message(self, to: str, body: str, from_: Optional[str] = None) -> Dict[str, Any]:
+        """Create an outbound message and return Twilio's message resource"""
+        form = {'To': to, 'From': from_ or self.from_number, 'Body': body}
+        return await self.http.run(lambda session: self._post(session, form))
+
+    async def _post(self, session, form: Dict[str, str]) -> Dict[str, Any]:
+        async with session.post(self.messages_url, data=form, auth=self.auth) as response:
+            try:
+                payload = await response.json(content_type=None)
+            except ValueError:
+                payload = {'message': await response.text()}
+            if response.status >= 400:
+                raise TwilioAPIError(response.status, payload.get('message', response.reason), payload.get('code'))
+            return payload
+
+    async def close(self) -> None:
+        """Close the pooled session"""
+        await asyncio.to_thread(self.http.close)
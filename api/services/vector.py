@@ -1,32 +1,32 @@
-from openai import OpenAI
+import asyncio
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional
 import uuid
-from pinecone import Pinecone
-from urllib.parse import urlparse
+from .embedding_cache import EmbeddingCache
+from .metrics import track
+from .openai_client import OpenAIClientManager
 
 logger = logging.getLogger(__name__)
 
 class VectorService:
-    def __init__(self, api_key: str, index_name: str, host: str):
+    def __init__(self, api_key: str, index_name: str, host: str, openai_client: Optional[OpenAIClientManager] = None,
+                 embedding_cache: Optional[EmbeddingCache] = None, embedding_model: str = 'text-embedding-ada-002'):
         try:
             logger.info(f"Initializing Pinecone for index: {index_name}")
             
+            # Imported here so the SDK is only loaded when vectors are needed
+            from pinecone import Pinecone
+            
             # Initialize with new API
             pc = Pinecone(api_key=api_key)
             logger.info("Pinecone core initialized successfully")
             
-            # Get index using new API
+            # Get index using new API; a known host skips the describe_index lookup
             logger.info(f"Connecting to index: {index_name}")
-            self.pinecone_index = pc.Index(index_name)
-            
-            # Verify connection
-            try:
-                stats = self.pinecone_index.describe_index_stats()
-                logger.info(f"Successfully connected to index. Stats: {stats}")
-            except Exception as e:
-                logger.error(f"Failed to get index stats: {str(e)}")
-                raise e
+            if host:
+                self.pinecone_index = pc.Index(index_name, host=host)
+            else:
+                self.pinecone_index = pc.Index(index_name)
             
         except Exception as e:
             logger.error(f"Failed to initialize Pinecone index: {str(e)}")
@@ -35,30 +35,47 @@ class VectorService:
             logger.error(f"Host: {host}")
             raise e
 
-        # Add OpenAI client initialization
-        self.openai_client = OpenAI()
+        # Shared async OpenAI pool for embeddings
+        self.openai = openai_client or OpenAIClientManager()
+        # Repeated queries and re-indexed text skip the OpenAI round trip
+        self.embedding_cache = embedding_cache
+        self.embedding_model = embedding_model
 
-    async def store_embedding(self, text: str, metadata: dict, phone_number: str) -> bool:
-        """Store text embedding in vector database with user's phone number"""
+    def verify(self):
+        """Check the index is reachable and return its stats (kept off the startup path)"""
+        try:
+            stats = self.pinecone_index.describe_index_stats()
+            logger.info(f"Successfully connected to index. Stats: {stats}")
+            return stats
+        except Exception as e:
+            logger.error(f"Failed to get index stats: {str(e)}")
+            raise
+
+    async def store_embedding(self, text: str, metadata: dict, phone_number: str, embedding: Optional[List[float]] = None,
+                              vector_id: Optional[str] = None) -> bool:
+        """Store text embedding in vector database with user's phone number (upserted by vector_id when given)"""
         try:
             if not self.pinecone_index:
                 logger.warning("Vector service not available for storage")
                 return False
 
-            # Generate embedding
-            embedding = await self._get_embedding(text)
+            # Generate embedding unless the caller already computed it
+            if embedding is None:
+                embedding = await self._get_embedding(text)
             
             # Add phone number to metadata
             metadata['phone_number'] = phone_number
             
-            # Store in Pinecone
-            await self.pinecone_index.upsert(
-                vectors=[{
-                    'id': str(uuid.uuid4()),
-                    'values': embedding,
-                    'metadata': metadata
-                }]
-            )
+            # Store in Pinecone; the index client is synchronous, so the call runs off the loop
+            with track('pinecone_upsert'):
+                await asyncio.to_thread(
+                    self.pinecone_index.upsert,
+                    vectors=[{
+                        'id': vector_id or str(uuid.uuid4()),
+                        'values': embedding,
+                        'metadata': metadata
+                    }]
+                )
             
             return True
 
@@ -69,13 +86,22 @@ class VectorService:
     async def _get_embedding(self, text: str) -> List[float]:
         """Get embedding for text using OpenAI"""
         try:
-            response = await self.openai_client.embeddings.create(
-                model="text-embedding-ada-002",
-                input=text
-            )
+            if self.embedding_cache:
+                cached = self.embedding_cache.get(text, self.embedding_model)
+                if cached is not None:
+                    return cached
+            # Only the OpenAI call is timed, so cache hits don't drag the latency down
+            with track('embedding'):
+                response = await self.openai.run(lambda client: client.embeddings.create(
+                    model=self.embedding_model,
+                    input=text
+                ))
             if not response.data:
                 raise Exception("No embedding data returned from OpenAI")
-            return response.data[0].embedding
+            embedding = response.data[0].embedding
+            if self.embedding_cache:
+                self.embedding_cache.put(text, self.embedding_model, embedding)
+            return embedding
         except Exception as e:
             logger.error(f"Failed to get embedding: {str(e)}")
             raise
@@ -86,12 +112,14 @@ class VectorService:
             embedding = await self._get_embedding(query)
             
             # 2. Search Pinecone for similar vectors with phone number filter
-            results = await self.pinecone_index.query(
-                vector=embedding,
-                top_k=limit,
-                include_metadata=True,
-                filter={"phone_number": {"$eq": phone_number}}
-            )
+            with track('pinecone_query'):
+                results = await asyncio.to_thread(
+                    self.pinecone_index.query,
+                    vector=embedding,
+                    top_k=limit,
+                    include_metadata=True,
+                    filter={"phone_number": {"$eq": phone_number}}
+                )
             return results.matches
         except Exception as e:
             logger.error(f"Error searching vectors: {str(e)}")
@@ -109,7 +137,7 @@ class VectorService:
     async def upsert(self, vectors, metadata=None):
         """Upsert vectors to Pinecone"""
         try:
-            await self.pinecone_index.upsert(vectors=vectors, metadata=metadata)
+            await asyncio.to_thread(self.pinecone_index.upsert, vectors=vectors, metadata=metadata)
             return True
         except Exception as e:
             logger.error(f"Error upserting vectors: {str(e)}")
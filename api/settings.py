@@ -5,6 +5,15 @@ load_dotenv()
 
 # OpenAI settings
 openai_api_key = os.getenv('OPENAI_API_KEY')
+openai_base_url = os.getenv('OPENAI_BASE_URL')
+# Shared async client pool; HTTP/2 needs the h2 package
+openai_max_connections = int(os.getenv('OPENAI_MAX_CONNECTIONS', '100'))
+openai_max_keepalive_connections = int(os.getenv('OPENAI_MAX_KEEPALIVE_CONNECTIONS', '20'))
+openai_keepalive_expiry = float(os.getenv('OPENAI_KEEPALIVE_EXPIRY', '30'))
+openai_connect_timeout = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '5'))
+openai_timeout = float(os.getenv('OPENAI_TIMEOUT', '60'))
+openai_http2 = os.getenv('OPENAI_HTTP2', 'true').lower() in ('1', 'true', 'yes')
+openai_max_retries = int(os.getenv('OPENAI_MAX_RETRIES', '2'))
 
 # Supabase settings
 supabase_url = os.getenv('SUPABASE_URL')
@@ -14,6 +23,8 @@ supabase_key = os.getenv('SUPABASE_KEY')
 twilio_account_sid = os.getenv('TWILIO_ACCOUNT_SID')
 twilio_auth_token = os.getenv('TWILIO_AUTH_TOKEN')
 twilio_phone_number = os.getenv('TWILIO_PHONE_NUMBER')
+# Override the REST API host, e.g. to point at the load-test fakes
+twilio_api_base_url = os.getenv('TWILIO_API_BASE_URL')
 
 # Pinecone settings
 pinecone_api_key = os.getenv('PINECONE_API_KEY')
@@ -23,4 +34,109 @@ pinecone_host = os.getenv('PINECONE_HOST')
 
 # Service URLs
 vercel_url = os.getenv('VERCEL_URL', 'https://thought-collector-agent.vercel.app')
-audio_converter_url = os.getenv('AUDIO_CONVERTER_URL', 'https://audio-converter-service-production.up.railway.app')
\ No newline at end of file
+audio_converter_url = os.getenv('AUDIO_CONVERTER_URL', 'https://audio-converter-service-production.up.railway.app')
+# Where the converter posts transcriptions; defaults to the Vercel deployment
+audio_callback_url = os.getenv('AUDIO_CALLBACK_URL')
+
+# 'local' converts voice notes with an in-process ffmpeg pool instead of the converter service
+audio_transcoder = os.getenv('AUDIO_TRANSCODER', 'remote')
+ffmpeg_path = os.getenv('FFMPEG_PATH', 'ffmpeg')
+ffmpeg_workers = int(os.getenv('FFMPEG_WORKERS', '0')) or None
+ffmpeg_timeout = float(os.getenv('FFMPEG_TIMEOUT', '20'))
+ffmpeg_bitrate = os.getenv('FFMPEG_BITRATE', '64k')
+
+# Transcripts keyed by a hash of the audio; unset TRANSCRIPTION_CACHE_PATH keeps them in memory only.
+# Voice notes relayed to the converter only use the cache with MEDIA_RELAY_STREAMING=false.
+whisper_model = os.getenv('WHISPER_MODEL', 'whisper-1')
+transcription_cache_entries = int(os.getenv('TRANSCRIPTION_CACHE_ENTRIES', '1000'))
+transcription_cache_path = os.getenv('TRANSCRIPTION_CACHE_PATH', '/tmp/thought-collector-transcriptions.db') or None
+transcription_cache_max_bytes = int(os.getenv('TRANSCRIPTION_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+# Audio up to this size is held in memory; larger clips spill to a temp file
+transcription_spill_bytes = int(os.getenv('TRANSCRIPTION_SPILL_BYTES', str(8 * 1024 * 1024)))
+# Hard cap on downloaded and converted audio; larger media is refused while it downloads
+audio_max_bytes = int(os.getenv('AUDIO_MAX_BYTES', str(50 * 1024 * 1024)))
+# Voice notes longer than this many seconds are split at silences and transcribed in parallel
+# (needs AUDIO_TRANSCODER=local; 0 turns it off)
+long_audio_seconds = float(os.getenv('LONG_AUDIO_SECONDS', '45'))
+transcription_chunk_seconds = float(os.getenv('TRANSCRIPTION_CHUNK_SECONDS', '30'))
+transcription_chunk_overlap = float(os.getenv('TRANSCRIPTION_CHUNK_OVERLAP', '1.0'))
+transcription_chunk_concurrency = int(os.getenv('TRANSCRIPTION_CHUNK_CONCURRENCY', '4'))
+# Share of clips (0-1) downmixed, resampled to 16 kHz, silence-trimmed and re-encoded as
+# low-bitrate Opus before Whisper; needs AUDIO_TRANSCODER=local
+audio_preprocess_fraction = float(os.getenv('AUDIO_PREPROCESS_FRACTION', '0'))
+audio_preprocess_trim_db = int(os.getenv('AUDIO_PREPROCESS_TRIM_DB', '-45'))
+audio_preprocess_bitrate = os.getenv('AUDIO_PREPROCESS_BITRATE', '16k')
+
+# Admission control for conversion + Whisper; work beyond the queue or past the deadline is shed
+transcription_max_concurrent = int(os.getenv('TRANSCRIPTION_MAX_CONCURRENT', '8'))
+transcription_max_waiting = int(os.getenv('TRANSCRIPTION_MAX_WAITING', '32'))
+transcription_wait_timeout = float(os.getenv('TRANSCRIPTION_WAIT_TIMEOUT', '10'))
+
+# Embeddings keyed by model and normalized text; unset EMBEDDING_CACHE_PATH keeps them in memory only
+embedding_model = os.getenv('EMBEDDING_MODEL', 'text-embedding-ada-002')
+embedding_cache_memory_bytes = int(os.getenv('EMBEDDING_CACHE_MEMORY_BYTES', str(16 * 1024 * 1024)))
+embedding_cache_path = os.getenv('EMBEDDING_CACHE_PATH', '/tmp/thought-collector-embeddings.db') or None
+embedding_cache_max_bytes = int(os.getenv('EMBEDDING_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+# float16 halves the disk and memory footprint at a small cost in precision
+embedding_cache_dtype = os.getenv('EMBEDDING_CACHE_DTYPE', 'float32')
+
+# Background job queue settings. Set JOB_WORKER=true only where `python -m api.worker` drains
+# JOB_QUEUE_PATH; without it voice notes and converter callbacks are processed inline
+job_worker = os.getenv('JOB_WORKER', 'false').lower() in ('1', 'true', 'yes')
+job_queue_path = os.getenv('JOB_QUEUE_PATH', '/tmp/thought-collector-jobs.db')
+job_queue_workers = int(os.getenv('JOB_QUEUE_WORKERS', '2'))
+job_visibility_timeout = int(os.getenv('JOB_VISIBILITY_TIMEOUT', '120'))
+job_max_attempts = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+job_poll_interval = float(os.getenv('JOB_POLL_INTERVAL', '0.5'))
+# Jobs each worker process runs at once; transcription admission caps the voice notes among them
+job_concurrency = int(os.getenv('JOB_CONCURRENCY', '16'))
+
+# Idempotency cache for Twilio and converter retries
+idempotency_ttl = int(os.getenv('IDEMPOTENCY_TTL', '3600'))
+idempotency_max_entries = int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', '10000'))
+idempotency_db_path = os.getenv('IDEMPOTENCY_DB_PATH') or None
+
+# Outbound SMS dispatcher; Twilio long codes accept about one message per second
+sms_rate_per_second = float(os.getenv('SMS_RATE_PER_SECOND', '1'))
+sms_burst = float(os.getenv('SMS_BURST', '3'))
+sms_dispatch_workers = int(os.getenv('SMS_DISPATCH_WORKERS', '32'))
+sms_queue_size = int(os.getenv('SMS_QUEUE_SIZE', '1000'))
+sms_max_retries = int(os.getenv('SMS_MAX_RETRIES', '5'))
+sms_retry_backoff = float(os.getenv('SMS_RETRY_BACKOFF', '1.0'))
+# SQLite file holding the per-number rate limit for every process on the host; empty limits each process alone
+sms_rate_limit_path = os.getenv('SMS_RATE_LIMIT_PATH', '/tmp/thought-collector-sms-rate-limits.db') or None
+# Most segments a tag-suggestion reply may use; the echoed transcription is trimmed to fit
+sms_segment_budget = int(os.getenv('SMS_SEGMENT_BUDGET', '3'))
+# Connections to api.twilio.com; sends beyond this wait for a free connection, not a thread
+twilio_pool_limit = int(os.getenv('TWILIO_POOL_LIMIT', '200'))
+
+# Per-user mailboxes that keep each sender's messages in order
+user_mailbox_idle_timeout = float(os.getenv('USER_MAILBOX_IDLE_TIMEOUT', '30'))
+
+# Thoughts awaiting a tag reply; the sqlite backend is shared by the web app and the workers
+pending_store_backend = os.getenv('PENDING_STORE_BACKEND', 'sqlite')
+pending_store_path = os.getenv('PENDING_STORE_PATH', '/tmp/thought-collector-pending.db')
+pending_ttl = int(os.getenv('PENDING_TTL', '300'))
+pending_max_entries = int(os.getenv('PENDING_MAX_ENTRIES', '10000'))
+
+# Shared outbound HTTP connection pool
+http_pool_limit = int(os.getenv('HTTP_POOL_LIMIT', '100'))
+http_pool_limit_per_host = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '20'))
+http_keepalive_timeout = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '30'))
+http_dns_cache_ttl = int(os.getenv('HTTP_DNS_CACHE_TTL', '300'))
+http_connect_timeout = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+http_total_timeout = float(os.getenv('HTTP_TOTAL_TIMEOUT', '60'))
+
+# Relay Twilio media to the converter chunk-by-chunk instead of buffering it. Streamed relays
+# bypass the transcription cache, which needs the whole clip before the upload starts.
+media_relay_streaming = os.getenv('MEDIA_RELAY_STREAMING', 'true').lower() in ('1', 'true', 'yes')
+media_relay_chunk_size = int(os.getenv('MEDIA_RELAY_CHUNK_SIZE', '65536'))
+
+# Cold-start budget for importing the app (checked by tests/test_startup.py)
+startup_import_budget_ms = int(os.getenv('STARTUP_IMPORT_BUDGET_MS', '1000'))
+
+# Logging
+log_level = os.getenv('LOG_LEVEL', 'INFO')
+log_format = os.getenv('LOG_FORMAT', 'json')
+# Per-event sampling rates, e.g. "webhook.received=0.1,audio_callback.received=0.25"
+log_sample_rates = os.getenv('LOG_SAMPLE_RATES', '')
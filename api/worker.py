@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+
+from . import settings
+from .container import ServiceContainer
+from .services.admission import AdmissionRejected
+from .services.queue import JobQueue
+
+logger = logging.getLogger(__name__)
+
+async def run_job(queue: JobQueue, handlers: dict, job: dict) -> None:
+    """Run one claimed job, then ack it or schedule its retry"""
+    handler = handlers.get(job['kind'])
+    if handler is None:
+        await asyncio.to_thread(queue.fail, job['id'], f"No handler for job kind: {job['kind']}", job['token'])
+        return
+
+    try:
+        logger.info("Processing %s job %s (attempt %s)", job['kind'], job['id'], job['attempts'])
+        await handler(job['payload'])
+        if await asyncio.to_thread(queue.ack, job['id'], job['token']):
+            logger.info("Job %s completed", job['id'])
+    except AdmissionRejected as e:
+        # Shed under load; the retry backoff brings it back once the burst has passed
+        logger.warning("Job %s shed: %s", job['id'], e)
+        await asyncio.to_thread(queue.fail, job['id'], str(e), job['token'])
+    except Exception as e:
+        logger.error("Job %s failed: %s", job['id'], e, exc_info=True)
+        await asyncio.to_thread(queue.fail, job['id'], str(e), job['token'])
+
+async def drain(queue: JobQueue, handlers: dict, stop: asyncio.Event, poll_interval: float,
+                concurrency: int = 1) -> None:
+    """Process up to `concurrency` jobs at once until the stop event is set, then finish those in flight.
+
+    Queue calls run in threads: a claim can wait on another process's write
+    lock, and that would otherwise stall every job in flight.
+    """
+    running = set()
+    while not stop.is_set():
+        job = await asyncio.to_thread(queue.claim) if len(running) < concurrency else None
+        if job is not None:
+            running.add(asyncio.create_task(run_job(queue, handlers, job)))
+            continue
+
+        # Wake when a job finishes, the poll interval passes or we're asked to stop
+        stopping = asyncio.create_task(stop.wait())
+        await asyncio.wait(running | {stopping}, timeout=poll_interval, return_when=asyncio.FIRST_COMPLETED)
+        stopping.cancel()
+        running = {task for task in running if not task.done()}
+
+    if running:
+        await asyncio.wait(running)
+
+def run_worker(worker_id: int) -> None:
+    """Entry point for a single worker process"""
+    from .routes import JOB_HANDLERS, services
+
+    async def main():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        logger.info("Worker %s started (pid %s)", worker_id, os.getpid())
+        await drain(services.job_queue, JOB_HANDLERS, stop, settings.job_poll_interval, settings.job_concurrency)
+        # Flush replies queued by the last jobs; atexit hooks don't run in multiprocessing children
+        if 'sms_dispatcher' in services.built():
+            await asyncio.to_thread(services.sms_dispatcher.close)
+        logger.info("Worker %s stopped", worker_id)
+
+    asyncio.run(main())
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Drain the background job queue")
+    parser.add_argument('--workers', type=int, default=settings.job_queue_workers)
+    args = parser.parse_args()
+
+    # Create the schema once before the workers start competing for it
+    ServiceContainer().job_queue
+
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(i,), name=f"worker-{i}")
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+
+    def shutdown(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for process in processes:
+        process.join()
+
+if __name__ == '__main__':
+    main()
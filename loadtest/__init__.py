@@ -0,0 +1,6 @@
+"""Load-test harness: local fakes for every external dependency plus an open-loop traffic generator.
+
+Run with:
+
+    python -m loadtest --rps 20 --duration 60
+"""
@@ -0,0 +1,145 @@
+"""Run the load test: python -m loadtest --rps 20 --duration 60"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from .fakes import DEPENDENCIES, FakeDependencies, parse_profiles
+from .traffic import DEFAULT_MIX, LoadGenerator, format_report, parse_mix
+
+logger = logging.getLogger('loadtest')
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def app_environment(fakes_url: str, app_url: str, workdir: str) -> dict:
+    """Point every dependency of the real app at the fakes"""
+    env = dict(os.environ)
+    env.update({
+        'OPENAI_API_KEY': 'sk-loadtest',
+        'OPENAI_BASE_URL': f"{fakes_url}/v1",
+        'SUPABASE_URL': fakes_url,
+        'SUPABASE_KEY': 'loadtest.fake.key',
+        'PINECONE_API_KEY': 'loadtest',
+        'PINECONE_INDEX': 'loadtest',
+        'PINECONE_HOST': fakes_url,
+        'TWILIO_ACCOUNT_SID': 'ACloadtest',
+        'TWILIO_AUTH_TOKEN': 'loadtest',
+        'TWILIO_PHONE_NUMBER': '+15550000000',
+        'TWILIO_API_BASE_URL': fakes_url,
+        'AUDIO_CONVERTER_URL': fakes_url,
+        'AUDIO_CALLBACK_URL': f"{app_url}/audio-callback",
+        'JOB_WORKER': 'true',
+        'JOB_QUEUE_PATH': os.path.join(workdir, 'jobs.db'),
+        'PENDING_STORE_PATH': os.path.join(workdir, 'pending.db'),
+        'TRANSCRIPTION_CACHE_PATH': os.path.join(workdir, 'transcriptions.db'),
+        'EMBEDDING_CACHE_PATH': os.path.join(workdir, 'embeddings.db'),
+        'LOG_LEVEL': env.get('LOG_LEVEL', 'WARNING'),
+    })
+    env.pop('IDEMPOTENCY_DB_PATH', None)
+    return env
+
+async def wait_until_ready(app_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{app_url}/status") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"App at {app_url} did not become ready within {timeout:.0f}s")
+
+async def wait_for_voice_replies(generator: LoadGenerator, fakes: FakeDependencies, timeout: float) -> None:
+    """Give queued voice notes time to reach the fake Twilio before reporting"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(token in fakes.delivered for token in generator.voice_started):
+            return
+        await asyncio.sleep(0.25)
+
+async def run(args) -> dict:
+    profiles = parse_profiles(args.latency)
+    fakes = FakeDependencies(profiles, seed=args.seed)
+    fakes_url = await fakes.start(port=args.fakes_port)
+
+    processes = []
+    with tempfile.TemporaryDirectory(prefix='thought-loadtest-') as workdir:
+        try:
+            app_url = args.app_url
+            if app_url is None:
+                port = free_port()
+                app_url = f"http://127.0.0.1:{port}"
+                env = app_environment(fakes_url, app_url, workdir)
+                processes.append(subprocess.Popen(
+                    [sys.executable, '-m', 'uvicorn', 'api.asgi:app', '--host', '127.0.0.1', '--port', str(port),
+                     '--workers', str(args.app_workers), '--log-level', 'warning', '--no-access-log'],
+                    env=env
+                ))
+                processes.append(subprocess.Popen(
+                    [sys.executable, '-m', 'api.worker', '--workers', str(args.job_workers)],
+                    env=env
+                ))
+            await wait_until_ready(app_url)
+            logger.info(f"Driving {args.rps} req/s at {app_url} for {args.duration:.0f}s")
+
+            generator = LoadGenerator(app_url, fakes_url, args.rps, mix=parse_mix(args.mix),
+                                      users=args.users, seed=args.seed, timeout=args.timeout)
+            await generator.run(args.duration)
+            await wait_for_voice_replies(generator, fakes, args.drain)
+
+            return {
+                'routes': generator.report(fakes.delivered),
+                'errors': dict(generator.error_kinds),
+                'dependencies': fakes.stats(),
+            }
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+            await fakes.stop()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the webhook and audio callback loop against local fakes")
+    parser.add_argument('--rps', type=float, default=10.0, help="Target arrival rate (requests per second)")
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds of traffic to offer")
+    parser.add_argument('--mix', default=','.join(f"{k}={v}" for k, v in DEFAULT_MIX.items()),
+                        help="Scenario weights, e.g. text=6,voice=3,tag=1")
+    parser.add_argument('--latency', action='append', default=[], metavar='DEP=MEDIAN[:ERRORS[:DIST]]',
+                        help=f"Override a fake's profile; dependencies: {', '.join(DEPENDENCIES)}")
+    parser.add_argument('--users', type=int, default=50, help="Distinct phone numbers to send from")
+    parser.add_argument('--app-url', help="Target an already running app instead of starting one")
+    parser.add_argument('--app-workers', type=int, default=2, help="uvicorn worker processes")
+    parser.add_argument('--job-workers', type=int, default=2, help="api.worker processes")
+    parser.add_argument('--fakes-port', type=int, default=0, help="Port for the fake dependencies (0 picks one)")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument('--drain', type=float, default=30.0, help="Seconds to wait for outstanding voice replies")
+    parser.add_argument('--seed', type=int, help="Seed for reproducible traffic and latencies")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(format_report(result['routes'], result['dependencies'], result['errors']))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Dependencies the fake server stands in for, each with its own latency profile
+DEPENDENCIES = (
+    'twilio_media', 'twilio_send',
+    'openai_chat', 'openai_embeddings', 'openai_transcription',
+    'pinecone', 'supabase', 'converter'
+)
+
+# Rough medians from production traces; the converter one is the delay before the callback
+DEFAULT_MEDIANS = {
+    'twilio_media': 0.08,
+    'twilio_send': 0.15,
+    'openai_chat': 0.8,
+    'openai_embeddings': 0.12,
+    'openai_transcription': 1.5,
+    'pinecone': 0.04,
+    'supabase': 0.03,
+    'converter': 2.0,
+}
+
+EMBEDDING_DIMENSION = 1536
+
+# Voice notes carry a token in the audio bytes so the reply SMS can be matched to the request
+TOKEN_PATTERN = re.compile(r'voice-note ([0-9a-f]{32})')
+AMR_HEADER = b'#!AMR\n'
+
+class LatencyProfile:
+    """Latency distribution and error rate for one fake dependency"""
+
+    DISTRIBUTIONS = ('fixed', 'lognormal', 'exponential')
+
+    def __init__(self, median: float, distribution: str = 'lognormal', sigma: float = 0.5,
+                 error_rate: float = 0.0, error_status: int = 500):
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution: {distribution}")
+        if not 0.0 <= error_rate <= 1.0:
+            raise ValueError(f"Error rate must be between 0 and 1, got {error_rate}")
+        self.median = median
+        self.distribution = distribution
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    def sample(self, rng: random.Random = random) -> float:
+        """Draw one latency in seconds"""
+        if self.median <= 0:
+            return 0.0
+        if self.distribution == 'fixed':
+            return self.median
+        if self.distribution == 'exponential':
+            # The median of an exponential distribution is ln(2) / rate
+            return rng.expovariate(math.log(2) / self.median)
+        return self.median * math.exp(self.sigma * rng.gauss(0, 1))
+
+    def should_fail(self, rng: random.Random = random) -> bool:
+        return self.error_rate > 0 and rng.random() < self.error_rate
+
+    @classmethod
+    def parse(cls, spec: str) -> 'LatencyProfile':
+        """Parse 'median[:error_rate[:distribution]]', e.g. '0.8:0.02:exponential'"""
+        parts = spec.split(':')
+        median = float(parts[0])
+        error_rate = float(parts[1]) if len(parts) > 1 and parts[1] else 0.0
+        distribution = parts[2] if len(parts) > 2 else 'lognormal'
+        return cls(median, distribution=distribution, error_rate=error_rate)
+
+def default_profiles() -> Dict[str, LatencyProfile]:
+    profiles = {name: LatencyProfile(median) for name, median in DEFAULT_MEDIANS.items()}
+    # Twilio signals throttling with 429 rather than 500
+    profiles['twilio_send'].error_status = 429
+    return profiles
+
+def parse_profiles(specs: List[str], base: Optional[Dict[str, LatencyProfile]] = None) -> Dict[str, LatencyProfile]:
+    """Apply 'dependency=median[:error_rate[:distribution]]' overrides to the defaults"""
+    profiles = dict(base or default_profiles())
+    for spec in specs:
+        if '=' not in spec:
+            raise ValueError(f"Expected dependency=profile, got {spec!r}")
+        name, value = spec.split('=', 1)
+        name = name.strip()
+        if name not in DEPENDENCIES:
+            raise ValueError(f"Unknown dependency {name!r}, expected one of {', '.join(DEPENDENCIES)}")
+        profile = LatencyProfile.parse(value)
+        if name == 'twilio_send':
+            profile.error_status = 429
+        profiles[name] = profile
+    return profiles
+
+def fake_embedding(text: str) -> List[float]:
+    """Deterministic unit vector so identical text embeds identically"""
+    rng = random.Random(hashlib.sha256(text.encode('utf-8')).digest())
+    values = [rng.gauss(0, 1) for _ in range(EMBEDDING_DIMENSION)]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return [v / norm for v in values]
+
+def voice_note_audio(token: str) -> bytes:
+    """AMR-looking bytes whose payload identifies the voice note"""
+    return AMR_HEADER + f"voice-note {token}".encode('ascii') + bytes(2048)
+
+class FakeDependencies:
+    """One aiohttp app serving Twilio, OpenAI, Pinecone, Supabase and converter stand-ins.
+
+    Every handler sleeps for a latency drawn from its dependency's profile and
+    fails at the profile's error rate. Outbound SMS are recorded with their
+    arrival time so the load generator can measure end-to-end voice latency.
+    """
+
+    def __init__(self, profiles: Optional[Dict[str, LatencyProfile]] = None, seed: Optional[int] = None):
+        self.profiles = profiles or default_profiles()
+        self.rng = random.Random(seed)
+        self.calls = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.sent_messages = []
+        self.delivered = {}
+        self.vectors = {}
+        self.base_url = None
+        self._runner = None
+        self._session = None
+        self._callbacks = set()
+
+    def build_app(self) -> web.Application:
+        app = web.Application(client_max_size=50 * 1024 * 1024)
+        app.router.add_get('/media/{token}', self._dependency('twilio_media', self.media))
+        app.router.add_post('/2010-04-01/Accounts/{sid}/Messages.json', self._dependency('twilio_send', self.send_message))
+        app.router.add_post('/v1/chat/completions', self._dependency('openai_chat', self.chat_completion))
+        app.router.add_post('/v1/embeddings', self._dependency('openai_embeddings', self.embeddings))
+        app.router.add_post('/v1/audio/transcriptions', self._dependency('openai_transcription', self.transcription))
+        app.router.add_post('/vectors/upsert', self._dependency('pinecone', self.upsert))
+        app.router.add_post('/query', self._dependency('pinecone', self.query))
+        app.router.add_route('*', '/describe_index_stats', self._dependency('pinecone', self.describe_index_stats))
+        app.router.add_route('*', '/rest/v1/{table}', self._dependency('supabase', self.postgrest))
+        app.router.add_post('/convert', self._dependency('converter', self.convert, delay=False))
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Serve the fakes and return their base URL"""
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.base_url = f"http://{host}:{site._server.sockets[0].getsockname()[1]}"
+        logger.info(f"Fake dependencies listening on {self.base_url}")
+        return self.base_url
+
+    async def stop(self) -> None:
+        for task in list(self._callbacks):
+            task.cancel()
+        await asyncio.gather(*self._callbacks, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: {'calls': self.calls[name], 'errors': self.errors[name]} for name in DEPENDENCIES}
+
+    def _dependency(self, name: str, handler, delay: bool = True):
+        """Wrap a handler with the dependency's latency and error injection"""
+        async def wrapped(request: web.Request) -> web.StreamResponse:
+            profile = self.profiles[name]
+            self.calls[name] += 1
+            if delay:
+                await asyncio.sleep(profile.sample(self.rng))
+            if profile.should_fail(self.rng):
+                self.errors[name] += 1
+                return web.json_response(
+                    {'error': {'message': f"Injected {name} failure", 'code': profile.error_status}},
+                    status=profile.error_status
+                )
+            return await handler(request)
+        return wrapped
+
+    # Twilio
+
+    async def media(self, request: web.Request) -> web.Response:
+        return web.Response(body=voice_note_audio(request.match_info['token']), content_type='audio/amr')
+
+    async def send_message(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        body = form.get('Body', '')
+        self.sent_messages.append({'to': form.get('To'), 'body': body, 'at': time.perf_counter()})
+        match = TOKEN_PATTERN.search(body)
+        if match:
+            self.delivered.setdefault(match.group(1), time.perf_counter())
+        sid = 'SM' + uuid.uuid4().hex
+        return web.json_response({
+            'sid': sid,
+            'account_sid': request.match_info['sid'],
+            'body': body,
+            'to': form.get('To'),
+            'from': form.get('From'),
+            'status': 'queued',
+            'num_segments': '1',
+            'direction': 'outbound-api',
+            'uri': f"/2010-04-01/Accounts/{request.match_info['sid']}/Messages/{sid}.json",
+        }, status=201)
+
+    # OpenAI
+
+    async def chat_completion(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        system = payload['messages'][0].get('content', '') if payload.get('messages') else ''
+        if 'tags' in system:
+            content = 'ideas, work, health'
+        else:
+            content = 'Here is a short answer based on your earlier thoughts.'
+        return web.json_response({
+            'id': 'chatcmpl-' + uuid.uuid4().hex,
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': payload.get('model', 'gpt-4o-mini'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': 50, 'completion_tokens': 12, 'total_tokens': 62}
+        })
+
+    async def embeddings(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        inputs = payload.get('input', '')
+        inputs = inputs if isinstance(inputs, list) else [inputs]
+        return web.json_response({
+            'object': 'list',
+            'model': payload.get('model', 'text-embedding-ada-002'),
+            'data': [
+                {'object': 'embedding', 'index': i, 'embedding': fake_embedding(str(text))}
+                for i, text in enumerate(inputs)
+            ],
+            'usage': {'prompt_tokens': 8, 'total_tokens': 8}
+        })
+
+    async def transcription(self, request: web.Request) -> web.Response:
+        text = 'A transcribed voice note.'
+        reader = await request.multipart()
+        async for part in reader:
+            if part.name == 'file':
+                match = TOKEN_PATTERN.search((await part.read()).decode('latin-1'))
+                if match:
+                    text = f"Transcribed voice-note {match.group(1)}."
+        return web.json_response({'text': text})
+
+    # Pinecone data plane
+
+    async def upsert(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        for vector in payload.get('vectors', []):
+            self.vectors[vector['id']] = vector.get('metadata', {})
+        return web.json_response({'upsertedCount': len(payload.get('vectors', []))})
+
+    async def query(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        top_k = payload.get('topK', 5)
+        matches = [
+            {'id': vector_id, 'score': 0.9, 'values': [], 'metadata': metadata}
+            for vector_id, metadata in list(self.vectors.items())[-top_k:]
+        ]
+        return web.json_response({'matches': matches, 'namespace': ''})
+
+    async def describe_index_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            'namespaces': {'': {'vectorCount': len(self.vectors)}},
+            'dimension': EMBEDDING_DIMENSION,
+            'indexFullness': 0.0,
+            'totalVectorCount': len(self.vectors)
+        })
+
+    # Supabase PostgREST
+
+    async def postgrest(self, request: web.Request) -> web.Response:
+        if request.method == 'GET':
+            return web.json_response([])
+        if request.method != 'POST':
+            return web.json_response([], status=200)
+        rows = await request.json()
+        rows = rows if isinstance(rows, list) else [rows]
+        inserted = [{'id': str(uuid.uuid4()), **row} for row in rows]
+        return web.json_response(inserted, status=201)
+
+    # Audio converter
+
+    async def convert(self, request: web.Request) -> web.Response:
+        fields = {}
+        reader = await request.multipart()
+        async for part in reader:
+            fields[part.name] = await part.read()
+
+        match = TOKEN_PATTERN.search(fields.get('audio', b'').decode('latin-1'))
+        transcription = f"Transcribed voice-note {match.group(1)}." if match else 'A transcribed voice note.'
+        task = asyncio.create_task(self._deliver_callback(
+            fields.get('callback_url', b'').decode(),
+            {'from_number': fields.get('from_number', b'').decode(), 'transcription': transcription}
+        ))
+        self._callbacks.add(task)
+        task.add_done_callback(self._callbacks.discard)
+        return web.json_response({'status': 'processing'})
+
+    async def _deliver_callback(self, callback_url: str, payload: dict) -> None:
+        """Post the transcription back after the converter's processing delay"""
+        await asyncio.sleep(self.profiles['converter'].sample(self.rng))
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+        try:
+            async with self._session.post(callback_url, data=json.dumps(payload),
+                                          headers={'Content-Type': 'application/json'}) as response:
+                if response.status >= 400:
+                    logger.warning(f"Audio callback returned {response.status}")
+        except aiohttp.ClientError as e:
+            logger.warning(f"Audio callback failed: {str(e)}")
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import random
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Traffic mix by scenario; tag confirmations are the comma-separated replies to a voice note
+DEFAULT_MIX = {'text': 0.6, 'voice': 0.3, 'tag': 0.1}
+
+TEXT_QUERIES = (
+    "What did I say about the garden last week?",
+    "Remind me of my ideas for the conference talk",
+    "How have I been feeling about work lately?",
+    "What books did I want to read?",
+    "Summarize my thoughts on moving",
+)
+TAG_REPLIES = ("ideas, work", "health", "skip", "family, weekend", "reading")
+
+# The webhook swallows errors into a polite TwiML reply, so look for it in the body
+APOLOGY_MARKER = 'encountered an error'
+
+# Voice notes are queued for transcription and acknowledged with 202
+OK_STATUSES = {'voice': (200, 202)}
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse 'text=6,voice=3,tag=1' into normalized weights"""
+    weights = {}
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        name, weight = item.split('=', 1)
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown scenario {name!r}, expected one of {', '.join(DEFAULT_MIX)}")
+        weights[name] = float(weight)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("Traffic mix must have a positive weight")
+    return {name: weight / total for name, weight in weights.items()}
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(-(-q * len(sorted_values) // 100)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(latencies: List[float], errors: int, duration: float) -> Dict[str, float]:
+    values = sorted(latencies)
+    return {
+        'requests': len(values) + errors,
+        'ok': len(values),
+        'errors': errors,
+        'throughput': len(values) / duration if duration > 0 else 0.0,
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'max': values[-1] if values else 0.0,
+    }
+
+class LoadGenerator:
+    """Open-loop traffic against the webhook at a target rate.
+
+    Arrivals follow a Poisson process and are never held back by slow
+    responses, so queueing in the app shows up as latency instead of as a
+    lower offered load.
+    """
+
+    def __init__(self, app_url: str, media_base_url: str, rps: float, mix: Optional[Dict[str, float]] = None,
+                 users: int = 50, seed: Optional[int] = None, timeout: float = 30.0):
+        self.app_url = app_url.rstrip('/')
+        self.media_base_url = media_base_url.rstrip('/')
+        self.rps = rps
+        self.mix = mix or DEFAULT_MIX
+        self.users = [f"+1555{i:07d}" for i in range(users)]
+        self.rng = random.Random(seed)
+        self.timeout = timeout
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_kinds = defaultdict(int)
+        self.voice_started = {}
+        self.duration = 0.0
+
+    def _pick_scenario(self) -> str:
+        names = list(self.mix)
+        return self.rng.choices(names, weights=[self.mix[name] for name in names])[0]
+
+    def _form(self, scenario: str, user: str) -> dict:
+        form = {
+            'MessageSid': 'SM' + uuid.uuid4().hex,
+            'AccountSid': 'ACloadtest',
+            'From': user,
+            'To': '+15550000000',
+            'NumMedia': '0',
+            'Body': '',
+        }
+        if scenario == 'voice':
+            token = uuid.uuid4().hex
+            form['NumMedia'] = '1'
+            form['MediaUrl0'] = f"{self.media_base_url}/media/{token}"
+            form['MediaContentType0'] = 'audio/amr'
+            self.voice_started[token] = time.perf_counter()
+        elif scenario == 'tag':
+            form['Body'] = self.rng.choice(TAG_REPLIES)
+        else:
+            form['Body'] = self.rng.choice(TEXT_QUERIES)
+        return form
+
+    async def _send(self, session: aiohttp.ClientSession, scenario: str) -> None:
+        form = self._form(scenario, self.rng.choice(self.users))
+        start = time.perf_counter()
+        try:
+            async with session.post(f"{self.app_url}/webhook", data=form) as response:
+                body = await response.text()
+                elapsed = time.perf_counter() - start
+                if response.status not in OK_STATUSES.get(scenario, (200,)):
+                    self._record_error(scenario, f"http_{response.status}")
+                elif APOLOGY_MARKER in body:
+                    self._record_error(scenario, 'app_error')
+                else:
+                    self.latencies[scenario].append(elapsed)
+        except asyncio.TimeoutError:
+            self._record_error(scenario, 'timeout')
+        except aiohttp.ClientError as e:
+            self._record_error(scenario, type(e).__name__)
+
+    def _record_error(self, scenario: str, kind: str) -> None:
+        self.errors[scenario] += 1
+        self.error_kinds[f"{scenario}:{kind}"] += 1
+
+    async def run(self, duration: float) -> None:
+        """Offer traffic for the given number of seconds and wait for every response"""
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            tasks = set()
+            start = time.perf_counter()
+            next_arrival = start
+            while next_arrival - start < duration:
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                task = asyncio.create_task(self._send(session, self._pick_scenario()))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                next_arrival += self.rng.expovariate(self.rps)
+            if tasks:
+                await asyncio.gather(*tasks)
+            self.duration = time.perf_counter() - start
+        logger.info(f"Offered {sum(len(v) for v in self.latencies.values()) + sum(self.errors.values())} "
+                    f"requests in {self.duration:.1f}s")
+
+    def voice_end_to_end(self, delivered: Dict[str, float]) -> List[float]:
+        """Seconds from sending each voice note to the reply SMS reaching the fake Twilio"""
+        return [delivered[token] - started for token, started in self.voice_started.items() if token in delivered]
+
+    def report(self, delivered: Optional[Dict[str, float]] = None) -> Dict[str, dict]:
+        routes = {
+            f"webhook:{scenario}": summarize(self.latencies[scenario], self.errors[scenario], self.duration)
+            for scenario in self.mix
+        }
+        if delivered is not None and self.voice_started:
+            e2e = self.voice_end_to_end(delivered)
+            routes['voice:end_to_end'] = summarize(e2e, len(self.voice_started) - len(e2e), self.duration)
+        return routes
+
+def format_report(routes: Dict[str, dict], dependencies: Optional[Dict[str, dict]] = None,
+                  error_kinds: Optional[Dict[str, int]] = None) -> str:
+    """Render the per-route table printed at the end of a run"""
+    header = f"{'route':<20} {'reqs':>6} {'ok':>6} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}"
+    lines = [header, '-' * len(header)]
+    for route, s in routes.items():
+        lines.append(
+            f"{route:<20} {s['requests']:>6} {s['ok']:>6} {s['errors']:>5} {s['throughput']:>8.2f} "
+            f"{s['p50'] * 1000:>7.0f}ms {s['p95'] * 1000:>6.0f}ms {s['p99'] * 1000:>6.0f}ms {s['max'] * 1000:>6.0f}ms"
+        )
+    if error_kinds:
+        lines.append('')
+        lines.append('errors: ' + ', '.join(f"{kind}={count}" for kind, count in sorted(error_kinds.items())))
+    if dependencies:
+        lines.append('')
+        lines.append('dependency calls: ' + ', '.join(
+            f"{name}={s['calls']}" + (f" ({s['errors']} injected errors)" if s['errors'] else '')
+            for name, s in dependencies.items()
+        ))
+    return '\n'.join(lines)
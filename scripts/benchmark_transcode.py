@@ -0,0 +1,77 @@
+"""Compare AMR->MP3 latency of the local ffmpeg pool and the remote converter service.
+
+    python scripts/benchmark_transcode.py test.amr --runs 20 --concurrency 4
+    python scripts/benchmark_transcode.py test.amr --skip-remote
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api import settings
+from api.services.audio import AudioService
+from api.services.http_client import HTTPClientManager
+from api.services.transcoder import FFmpegTranscoder
+from loadtest.traffic import percentile
+
+async def measure(label, convert, runs, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await convert()
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors += 1
+                print(f"{label}: {e}", file=sys.stderr)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(runs)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"{label:<8} runs={runs} errors={errors} throughput={len(latencies) / elapsed:.1f}/s "
+          f"p50={percentile(latencies, 50) * 1000:.0f}ms p95={percentile(latencies, 95) * 1000:.0f}ms "
+          f"max={(latencies[-1] if latencies else 0) * 1000:.0f}ms")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('audio', type=Path, help="AMR file to convert")
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=None, help="ffmpeg processes (default: CPU count)")
+    parser.add_argument('--converter-url', default=f"{settings.audio_converter_url}/convert",
+                        help="Converter endpoint; timed until it responds")
+    parser.add_argument('--skip-remote', action='store_true')
+    parser.add_argument('--skip-local', action='store_true')
+    args = parser.parse_args()
+
+    audio = args.audio.read_bytes()
+    print(f"Input: {args.audio} ({len(audio)} bytes), {args.runs} runs, concurrency {args.concurrency}")
+
+    if not args.skip_local:
+        if FFmpegTranscoder.available(settings.ffmpeg_path):
+            transcoder = FFmpegTranscoder(settings.ffmpeg_path, max_workers=args.workers, timeout=settings.ffmpeg_timeout)
+            await measure('local', lambda: transcoder.transcode(audio), args.runs, args.concurrency)
+            transcoder.close()
+        else:
+            print(f"local    skipped: {settings.ffmpeg_path} not found")
+
+    if not args.skip_remote:
+        http = HTTPClientManager()
+        service = AudioService(None, args.converter_url, http_client=http)
+        await measure(
+            'remote',
+            lambda: http.run(lambda session: service._convert_audio(session, audio, timeout=25, from_number='+15550000000')),
+            args.runs, args.concurrency
+        )
+        http.close()
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,6 @@
+-- Voice-note thoughts are upserted on their Twilio MessageSid, so a retried job
+-- returns the row it stored the first time instead of storing the thought twice.
+-- Text thoughts have no MessageSid and keep a NULL, which the unique index allows.
+alter table public.thoughts add column if not exists message_sid text;
+
+create unique index if not exists thoughts_message_sid_key on public.thoughts (message_sid);
@@ -1,8 +1,12 @@
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
+import os
 import sys
 from pathlib import Path
 
+# Services are built lazily, so give the OpenAI client a key it can be constructed with
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
 # Add project root to Python path
 project_root = str(Path(__file__).parent.parent)
 sys.path.append(project_root)
@@ -34,10 +38,40 @@ pinecone.Index = mock_index
 # Add before app import
 import api.settings
 api.settings.vercel_url = "https://test-vercel-url.com"
+# Route tests check what is queued for api.worker
+api.settings.job_worker = True
 
 # Now we can safely import the app
 from api.routes import app
 
+@pytest.fixture
+def audio_service():
+    """Build an AudioService whose download, conversion and Whisper calls are mocked.
+
+    Each download returns `audio` in a fresh spool; other keywords go to AudioService.
+    """
+    from api.services.audio import AudioService
+    from api.services.spool import SpooledAudio
+
+    def make(audio=b'ID3 mp3', converted=b'ID3 mp3', transcription='a thought', **kwargs):
+        service = AudioService(None, 'http://converter', **kwargs)
+        service._download_audio = AsyncMock(side_effect=lambda *args: SpooledAudio.from_bytes(audio))
+        service.convert = AsyncMock(return_value=converted)
+        service._transcribe_audio = AsyncMock(return_value=transcription)
+        return service
+    return make
+
+@pytest.fixture
+def fake_openai():
+    """An OpenAIClientManager stand-in whose run() hands the given client to each call"""
+    def make(client):
+        manager = MagicMock()
+        async def run(func):
+            return await func(client)
+        manager.run = run
+        return manager
+    return make
+
 @pytest.fixture
 def test_client():
     app.config['TESTING'] = True
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import pytest
+from unittest.mock import AsyncMock, patch
+from api.services.admission import AdmissionController, AdmissionRejected, ADMISSION_REJECTED
+from api.services.queue import JobQueue
+from api.worker import drain
+
+async def test_concurrency_is_capped():
+    controller = AdmissionController('test-cap', max_concurrent=2, max_waiting=10)
+    running, peak = 0, 0
+
+    async def work():
+        nonlocal running, peak
+        async with controller.slot():
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.05)
+            running -= 1
+
+    await asyncio.gather(*(work() for _ in range(6)))
+    assert peak == 2
+    assert controller.stats() == {'active': 0, 'waiting': 0, 'max_concurrent': 2}
+
+async def test_full_queue_is_shed():
+    controller = AdmissionController('test-full', max_concurrent=1, max_waiting=1)
+    release = asyncio.Event()
+
+    async def hold():
+        async with controller.slot():
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    waiter = asyncio.create_task(hold())
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.acquire()
+    assert rejected.value.reason == 'queue_full'
+    assert ADMISSION_REJECTED.value(workload='test-full', reason='queue_full') == 1
+
+    release.set()
+    await asyncio.gather(holder, waiter)
+
+async def test_waiters_past_deadline_are_shed():
+    controller = AdmissionController('test-deadline', max_concurrent=1, max_waiting=5, wait_timeout=0.05)
+    await controller.acquire()
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.acquire()
+    assert rejected.value.reason == 'deadline'
+    assert controller.stats()['waiting'] == 0
+
+    controller.release()
+    await controller.acquire()
+
+def test_slots_are_shared_across_event_loops():
+    controller = AdmissionController('test-loops', max_concurrent=1, max_waiting=5)
+    order = []
+
+    async def work(name):
+        async with controller.slot():
+            order.append(f"{name} start")
+            await asyncio.sleep(0.05)
+            order.append(f"{name} end")
+
+    threads = [threading.Thread(target=asyncio.run, args=(work(name),)) for name in ('a', 'b')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Never two at once, even though each thread runs its own loop
+    assert [entry.split()[1] for entry in order] == ['start', 'end', 'start', 'end']
+
+async def test_drain_sheds_jobs_past_the_limit_and_retries_them(tmp_path):
+    controller = AdmissionController('test-drain', max_concurrent=1, max_waiting=0)
+    job_queue = JobQueue(str(tmp_path / 'jobs.db'), retry_backoff=0.2)
+    stop = asyncio.Event()
+    done = []
+
+    async def voice_note(payload):
+        async with controller.slot():
+            await asyncio.sleep(0.05)
+        done.append(payload['from_number'])
+        if len(done) == 2:
+            stop.set()
+
+    job_queue.enqueue('voice_note', {'from_number': '+15550001'})
+    job_queue.enqueue('voice_note', {'from_number': '+15550002'})
+    shed_before = ADMISSION_REJECTED.value(workload='test-drain', reason='queue_full')
+
+    await drain(job_queue, {'voice_note': voice_note}, stop, poll_interval=0.01, concurrency=2)
+
+    # Both ran at once, so one was shed and came back on retry
+    assert ADMISSION_REJECTED.value(workload='test-drain', reason='queue_full') > shed_before
+    assert sorted(done) == ['+15550001', '+15550002']
+    assert job_queue.stats()['dead'] == 0
+
+async def test_shed_relay_gets_a_busy_reply():
+    from api import routes
+    controller = AdmissionController('test-relay', max_concurrent=1, max_waiting=0)
+    form = {'From': '+15550001', 'MediaUrl0': 'https://media', 'MediaContentType0': 'audio/amr'}
+
+    await controller.acquire()
+    with patch.dict(routes.services.__dict__, {'transcription_admission': controller}), \
+         patch.object(routes.settings, 'audio_transcoder', 'remote'), \
+         patch.object(routes.services.http_client, 'run', new_callable=AsyncMock) as relay:
+        twiml, status_code = await routes.handle_webhook(form)
+
+    assert status_code == 200
+    assert 'a lot of voice notes' in twiml
+    relay.assert_not_awaited()
+    controller.release()
@@ -0,0 +1,46 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from starlette.testclient import TestClient
+from api.asgi import app
+
+@pytest.fixture
+def asgi_client():
+    with TestClient(app) as client:
+        yield client
+
+def test_webhook_text_message(asgi_client):
+    mock_chat = AsyncMock(return_value="You said work is busy.")
+    
+    with patch('api.services.chat.ChatService.process_message', mock_chat), \
+         patch('api.services.storage.StorageService.store_chat_message', AsyncMock()):
+        response = asgi_client.post('/webhook', data={'From': '+1234567890', 'Body': 'What about work?'})
+    
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/xml')
+    assert 'You said work is busy.' in response.text
+    mock_chat.assert_awaited_once_with(user_phone='+1234567890', message='What about work?')
+
+def test_audio_callback_is_queued(asgi_client):
+    callback_data = {'from_number': '+1234567890', 'transcription': 'ASGI callback thought'}
+    
+    with patch('api.routes.job_queue.enqueue', return_value=7) as mock_enqueue:
+        response = asgi_client.post('/audio-callback', json=callback_data)
+    
+    assert response.status_code == 202
+    assert response.json() == {'status': 'queued', 'job_id': 7}
+    mock_enqueue.assert_called_once_with('audio_callback', callback_data)
+
+def test_audio_callback_rejects_missing_fields(asgi_client):
+    response = asgi_client.post('/audio-callback', json={'from_number': '+1234567890'})
+    assert response.status_code == 400
+
+def test_audio_callback_rejects_non_json(asgi_client):
+    response = asgi_client.post('/audio-callback', content=b'not json')
+    assert response.status_code == 400
+
+def test_metrics_include_asgi_routes(asgi_client):
+    asgi_client.get('/status')
+    response = asgi_client.get('/metrics')
+    
+    assert response.status_code == 200
+    assert 'http_request_duration_seconds_count{route="/status",status="200"}' in response.text
@@ -0,0 +1,54 @@
+import asyncio
+import pytest
+from api.services.background import LoopBoundClient
+
+class FakeClient:
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+class FakeManager(LoopBoundClient[FakeClient]):
+    def __init__(self):
+        self.built = 0
+        super().__init__('fake-client')
+
+    def _build(self) -> FakeClient:
+        self.built += 1
+        return FakeClient()
+
+    def _usable(self, client: FakeClient) -> bool:
+        return not client.closed
+
+async def grab(client):
+    return client
+
+def test_one_client_serves_every_caller_loop():
+    manager = FakeManager()
+    first = asyncio.run(manager.run(grab))
+    second = asyncio.run(manager.run(grab))
+
+    assert first is second
+    assert first.loop is manager._background.ensure_started()
+    manager.close()
+    assert first.closed
+    # The next call starts a fresh loop and client
+    assert asyncio.run(manager.run(grab)) is not first
+    assert manager.built == 2
+    manager.close()
+
+async def test_closed_client_is_rebuilt():
+    manager = FakeManager()
+    first = await manager.run(grab)
+    await manager.run(lambda client: client.close())
+
+    assert await manager.run(grab) is not first
+    manager.close()
+
+async def test_client_is_only_reachable_through_run():
+    manager = FakeManager()
+    with pytest.raises(RuntimeError, match=r'FakeManager\.run\(\)'):
+        manager.client()
+    manager.close()
@@ -1,41 +1,57 @@
+import json
 import pytest
 from unittest.mock import AsyncMock, patch
 
 def test_audio_callback(test_client):
-    """Test handling of transcription callback from Rails"""
+    """Test that the transcription callback from Rails is queued for the workers"""
     callback_data = {
         'from_number': '+1234567890',
         'transcription': 'Remember to buy milk and eggs'
     }
     
-    # Create async mocks with predefined return values
-    mock_store = AsyncMock(return_value={'id': 'test-id'})
-    mock_chat = AsyncMock(return_value="Got it! I'll remember you need milk and eggs.")
-    mock_sms = AsyncMock()
-    
-    with patch('api.services.storage.StorageService.store_thought', mock_store), \
-         patch('api.services.chat.ChatService.process_message', mock_chat), \
-         patch('api.services.sms.SMSService.send_message', mock_sms):
-        
+    with patch('api.routes.job_queue.enqueue', return_value=1) as mock_enqueue:
         response = test_client.post(
             '/audio-callback',
             json=callback_data
         )
         
-        assert response.status_code == 200
-        assert response.json['status'] == 'success'
+        assert response.status_code == 202
+        assert response.json['status'] == 'queued'
+        mock_enqueue.assert_called_once_with('audio_callback', callback_data)
+
+async def test_process_audio_callback():
+    """Test the queued job stores the thought and replies to the user"""
+    from api.routes import process_audio_callback
+    
+    callback_data = {
+        'from_number': '+1234567890',
+        'transcription': 'Remember to buy milk and eggs'
+    }
+    
+    mock_store = AsyncMock(return_value={'id': 'test-id', 'created_at': '2024-01-01T00:00:00'})
+    mock_tags = AsyncMock(return_value=['errands'])
+    mock_sms = AsyncMock()
+    
+    with patch('api.services.storage.StorageService.store_thought', mock_store), \
+         patch('api.services.tags.TagService.suggest_tags', mock_tags), \
+         patch('api.services.sms.SMSService.send_message', mock_sms):
+        
+        await process_audio_callback(callback_data)
         
-        # Verify the flow
         mock_store.assert_awaited_once_with(
             callback_data['from_number'],
-            callback_data['transcription']
+            callback_data['transcription'],
+            message_sid=None
         )
-        
-        # Verify chat service call with exact parameters
-        mock_chat.assert_called_once()
-        call_args = mock_chat.call_args
-        assert call_args.kwargs['from_number'] == callback_data['from_number']
-        assert call_args.kwargs['message'] == callback_data['transcription']
+        mock_sms.assert_awaited_once()
+        assert mock_sms.call_args.args[0] == callback_data['from_number']
+        assert callback_data['transcription'] in mock_sms.call_args.args[1]
+
+def test_audio_callback_rejects_non_json(test_client):
+    response = test_client.post('/audio-callback', data='transcription=hi', content_type='application/x-www-form-urlencoded')
+    
+    assert response.status_code == 400
+    assert response.json['status'] == 'error'
 
 def test_audio_callback_error(test_client):
     """Test handling of error callback from Rails"""
@@ -52,4 +68,20 @@ def test_audio_callback_error(test_client):
         
         assert response.status_code == 200
         assert response.json['status'] == 'error handled'
-        mock_sms.assert_awaited_once() 
\ No newline at end of file
+        mock_sms.assert_awaited_once()
+
+async def test_audio_callback_runs_inline_without_a_worker():
+    """Without JOB_WORKER the callback is processed before the response instead of queued"""
+    from api import routes
+    callback_data = {'from_number': '+1234567890', 'transcription': 'Nobody drains the queue'}
+    process = AsyncMock()
+    
+    with patch.object(routes.settings, 'job_worker', False), \
+         patch.object(routes.services.job_queue, 'enqueue') as mock_enqueue, \
+         patch.dict(routes.JOB_HANDLERS, {'audio_callback': process}):
+        body, status_code = await routes.handle_audio_callback(callback_data, message_sid='SMinline1')
+    
+    assert status_code == 200
+    assert json.loads(body) == {'status': 'processed'}
+    mock_enqueue.assert_not_called()
+    process.assert_awaited_once_with({**callback_data, 'message_sid': 'SMinline1'})
@@ -0,0 +1,143 @@
+import asyncio
+import io
+import wave
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+import pytest
+from api.services.chunking import pcm_to_wav, plan_chunks, stitch
+from api.services.spool import SpooledAudio
+from api.services.transcoder import FFmpegTranscoder, TranscodeError
+
+SAMPLE_AMR = Path(__file__).parent.parent / 'test.amr'
+
+def test_short_audio_is_one_chunk():
+    assert plan_chunks(40.0, [], target=30.0) == [(0.0, 40.0)]
+
+def test_cuts_land_in_silences_and_overlap():
+    chunks = plan_chunks(100.0, [(27.0, 29.0), (61.0, 62.0)], target=30.0, overlap=1.0)
+    assert chunks == [(0.0, 29.0), (27.0, 62.5), (60.5, 100.0)]
+
+def test_cuts_fall_back_to_the_target_without_silence():
+    chunks = plan_chunks(90.0, [], target=30.0, overlap=0.5)
+    assert chunks == [(0.0, 30.5), (29.5, 60.5), (59.5, 90.0)]
+
+def test_stitch_drops_repeated_overlap():
+    texts = ["I need to call the plumber about", "plumber about the leak. Also buy milk"]
+    assert stitch(texts) == "I need to call the plumber about the leak. Also buy milk"
+    assert stitch(["Remember this.", "Something new"]) == "Remember this. Something new"
+
+def test_pcm_to_wav():
+    with wave.open(io.BytesIO(pcm_to_wav(b'\x00\x01' * 160, 16000))) as wav:
+        assert (wav.getnchannels(), wav.getframerate(), wav.getnframes()) == (1, 16000, 160)
+
+async def test_decode_reports_silences(tmp_path):
+    ffmpeg = tmp_path / 'ffmpeg'
+    ffmpeg.write_text(
+        "#!/bin/sh\n"
+        "echo '[silencedetect @ 0x1] silence_start: 1.5' >&2\n"
+        "echo '[silencedetect @ 0x1] silence_end: 2.25 | silence_duration: 0.75' >&2\n"
+        "echo '[silencedetect @ 0x1] silence_start: 3.5' >&2\n"
+        "exec cat\n"
+    )
+    ffmpeg.chmod(0o755)
+    transcoder = FFmpegTranscoder(str(ffmpeg), sample_rate=8)
+
+    pcm, silences = await transcoder.decode(b'\x00' * 64)
+    assert pcm == b'\x00' * 64
+    assert silences == [(1.5, 2.25), (3.5, 4.0)]
+    transcoder.close()
+
+async def test_probe_reads_the_duration(tmp_path):
+    ffprobe = tmp_path / 'ffprobe'
+    # Only answers when handed the clip as a file it can seek in
+    ffprobe.write_text('#!/bin/sh\nfor arg; do last=$arg; done\ntest -s "$last" && echo 93.5\n')
+    ffprobe.chmod(0o755)
+    transcoder = FFmpegTranscoder(str(tmp_path / 'ffmpeg'))
+
+    with SpooledAudio.from_bytes(b'audio') as audio:
+        assert await transcoder.probe_duration(audio) == 93.5
+        assert audio.spilled
+    ffprobe.write_text("#!/bin/sh\necho N/A\n")
+    with SpooledAudio.from_bytes(b'audio') as audio:
+        assert await transcoder.probe_duration(audio) is None
+    transcoder.close()
+
+@pytest.mark.skipif(not FFmpegTranscoder.available('ffprobe'), reason="ffprobe is not installed")
+async def test_probe_reads_amr_duration():
+    transcoder = FFmpegTranscoder()
+    # 130 frames of 12.2 kbit/s AMR-NB at 20ms each
+    with SpooledAudio.from_bytes(SAMPLE_AMR.read_bytes()) as audio:
+        assert await transcoder.probe_duration(audio) == pytest.approx(2.6, abs=0.05)
+    transcoder.close()
+
+async def test_long_audio_is_transcribed_in_parallel_chunks(audio_service):
+    sample_rate = 100
+    transcoder = MagicMock(sample_rate=sample_rate)
+    transcoder.probe_duration = AsyncMock(return_value=90.0)
+    transcoder.decode = AsyncMock(return_value=(b'\x00' * 2 * sample_rate * 90, []))
+    service = audio_service(audio=b'amr', transcoder=transcoder,
+                            long_audio_seconds=45, chunk_seconds=30, chunk_overlap=0)
+    running, peak, sizes = 0, 0, []
+
+    async def transcribe(wav, timeout, filename):
+        nonlocal running, peak
+        sizes.append(len(wav))
+        part = len(sizes)
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+        return f"part {part}"
+
+    service._transcribe_audio = transcribe
+    assert await service.transcribe_media('https://media', 'audio/amr', '+15550001') == 'part 1 part 2 part 3'
+    # Three 30-second chunks run at once
+    assert peak == 3
+    assert sizes == [len(pcm_to_wav(b'\x00' * 2 * sample_rate * 30, sample_rate))] * 3
+    service.convert.assert_not_awaited()
+
+async def test_chunk_wavs_are_built_inside_the_concurrency_limit(audio_service):
+    sample_rate = 100
+    transcoder = MagicMock(sample_rate=sample_rate)
+    transcoder.probe_duration = AsyncMock(return_value=120.0)
+    transcoder.decode = AsyncMock(return_value=(b'\x00' * 2 * sample_rate * 120, []))
+    service = audio_service(transcoder=transcoder, long_audio_seconds=45, chunk_seconds=30,
+                            chunk_overlap=0, chunk_concurrency=2)
+    live, peak = 0, 0
+
+    def build(pcm, rate):
+        nonlocal live, peak
+        live += 1
+        peak = max(peak, live)
+        return pcm_to_wav(pcm, rate)
+
+    async def transcribe(wav, timeout, filename):
+        nonlocal live
+        await asyncio.sleep(0.01)
+        live -= 1
+        return 'part'
+
+    service._transcribe_audio = transcribe
+    with patch('api.services.audio.pcm_to_wav', side_effect=build):
+        await service.transcribe_media('https://media', 'audio/amr', '+15550001')
+    # Four chunks, but never more WAV copies in memory than slots
+    assert peak == 2
+
+def undecodable_transcoder(duration):
+    transcoder = MagicMock(sample_rate=100)
+    transcoder.probe_duration = AsyncMock(return_value=duration)
+    transcoder.decode = AsyncMock(side_effect=TranscodeError("moov atom not found"))
+    return transcoder
+
+async def test_short_clips_are_not_decoded(audio_service):
+    transcoder = undecodable_transcoder(duration=20.0)
+    service = audio_service(transcoder=transcoder, long_audio_seconds=45)
+    assert await service.transcribe_media('https://media', 'audio/mpeg', '+15550001') == 'a thought'
+    transcoder.decode.assert_not_awaited()
+
+async def test_undecodable_long_clip_is_transcribed_whole(audio_service):
+    transcoder = undecodable_transcoder(duration=90.0)
+    service = audio_service(transcoder=transcoder, long_audio_seconds=45)
+    assert await service.transcribe_media('https://media', 'audio/mpeg', '+15550001') == 'a thought'
+    transcoder.decode.assert_awaited_once()
+    service._transcribe_audio.assert_awaited_once()
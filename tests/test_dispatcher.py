@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import time
+import pytest
+from api.services.dispatcher import DISPATCH_RESULTS, DispatchQueueFull, OutboundDispatcher, TokenBucket
+from api.services.sms import SMSService
+from api.services.twilio_client import TwilioAPIError
+
+class FakeTwilio:
+    """Async messaging client whose sends run the given coroutine function"""
+
+    def __init__(self, send=None):
+        self.calls = []
+        self.send = send
+        self.closed = False
+
+    async def send_message(self, to, body, from_=None):
+        self.calls.append({'to': to, 'body': body, 'from_': from_})
+        if self.send is not None:
+            return await self.send(len(self.calls))
+        return {'sid': 'SM1'}
+
+    async def close(self):
+        self.closed = True
+
+def blocking_send(release):
+    async def send(attempt):
+        while not release.is_set():
+            await asyncio.sleep(0.01)
+        return {'sid': 'SM1'}
+    return send
+
+@pytest.fixture
+def dispatchers():
+    created = []
+    def make(client, **kwargs):
+        dispatcher = OutboundDispatcher(client, **kwargs)
+        created.append(dispatcher)
+        return dispatcher
+    yield make
+    for dispatcher in created:
+        dispatcher.close(timeout=1)
+
+def test_token_bucket_delay():
+    bucket = TokenBucket(rate=2, burst=1)
+    assert bucket.delay() == 0
+    bucket.tokens -= 1
+    assert 0.4 < bucket.delay() <= 0.5
+
+def test_retries_throttled_sends(dispatchers):
+    async def send(attempt):
+        if attempt < 3:
+            raise TwilioAPIError(429, "Too Many Requests")
+        return {'sid': 'SM1'}
+
+    retried = DISPATCH_RESULTS.value(outcome='retried')
+    client = FakeTwilio(send)
+    dispatcher = dispatchers(client, rate_per_second=100, retry_backoff=0.01)
+    message = dispatcher.submit('+15550001', 'hello', from_='+15550000').result(timeout=5)
+
+    assert message['sid'] == 'SM1'
+    assert len(client.calls) == 3
+    assert DISPATCH_RESULTS.value(outcome='retried') == retried + 2
+
+def test_other_errors_are_not_retried(dispatchers):
+    async def send(attempt):
+        raise TwilioAPIError(400, "Invalid 'To' Phone Number", code=21211)
+
+    client = FakeTwilio(send)
+    dispatcher = dispatchers(client, rate_per_second=100)
+    with pytest.raises(TwilioAPIError):
+        dispatcher.submit('+15550001', 'hello', from_='+15550000').result(timeout=5)
+    assert len(client.calls) == 1
+
+def test_sends_are_rate_limited_per_number(dispatchers):
+    dispatcher = dispatchers(FakeTwilio(), rate_per_second=20, burst=1)
+    start = time.perf_counter()
+    futures = [dispatcher.submit(f"+1555000{i}", 'hi', from_='+15550000') for i in range(5)]
+    for future in futures:
+        future.result(timeout=5)
+    # One token up front, then one every 50ms
+    assert time.perf_counter() - start >= 0.19
+
+def test_many_sends_in_flight_without_threads(dispatchers):
+    release = threading.Event()
+    client = FakeTwilio(blocking_send(release))
+    dispatcher = dispatchers(client, rate_per_second=10000, burst=500, workers=500)
+    threads = threading.active_count()
+
+    futures = [dispatcher.submit(f"+1555{i:07d}", 'hi', from_='+15550000') for i in range(500)]
+    deadline = time.monotonic() + 5
+    while len(client.calls) < 500 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert len(client.calls) == 500
+    # Only the dispatcher's own loop thread was added
+    assert threading.active_count() <= threads + 1
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+
+def test_queue_is_bounded(dispatchers):
+    release = threading.Event()
+    dispatcher = dispatchers(FakeTwilio(blocking_send(release)), rate_per_second=100, workers=1, max_queue=1)
+    first = dispatcher.submit('+15550001', 'one', from_='+15550000')
+    with pytest.raises(DispatchQueueFull):
+        dispatcher.submit('+15550002', 'two', from_='+15550000')
+    release.set()
+    first.result(timeout=5)
+    dispatcher.close(timeout=1)
+    assert dispatcher.depth == 0
+
+async def test_send_message_returns_before_twilio_responds(dispatchers):
+    release = threading.Event()
+    client = FakeTwilio(blocking_send(release))
+    sms = SMSService(client, '+15550000', dispatcher=dispatchers(client, rate_per_second=100))
+
+    start = time.perf_counter()
+    await sms.send_message('+15550001', 'Your thought was saved')
+    assert time.perf_counter() - start < 0.5
+
+    release.set()
+    sms.dispatcher.close(timeout=5)
+    assert client.calls == [{'to': '+15550001', 'body': 'Your thought was saved', 'from_': '+15550000'}]
+    assert client.closed
+
+async def test_send_message_can_wait_for_twilio(dispatchers):
+    async def send(attempt):
+        raise TwilioAPIError(400, "Invalid 'To' Phone Number", code=21211)
+
+    client = FakeTwilio(send)
+    sms = SMSService(client, '+15550000', dispatcher=dispatchers(client, rate_per_second=100))
+
+    with pytest.raises(TwilioAPIError):
+        await sms.send_message('+15550001', 'Your thought was saved', wait_for_delivery=True)
+
+def test_rate_limit_is_shared_between_dispatchers(dispatchers, tmp_path):
+    path = str(tmp_path / 'rate_limits.db')
+    first = dispatchers(FakeTwilio(), rate_per_second=10, burst=1, rate_limit_path=path)
+    second = dispatchers(FakeTwilio(), rate_per_second=10, burst=1, rate_limit_path=path)
+
+    start = time.perf_counter()
+    futures = [dispatcher.submit('+15550001', 'hi', from_='+15550000') for dispatcher in (first, second) * 2]
+    for future in futures:
+        future.result(timeout=5)
+    # Four sends from one number across both dispatchers: one token up front, then one every 100ms
+    assert time.perf_counter() - start >= 0.29
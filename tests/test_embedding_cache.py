@@ -0,0 +1,55 @@
+from unittest.mock import AsyncMock, MagicMock
+from api.services.embedding_cache import EmbeddingCache, CACHE_LOOKUPS, pack
+from api.services.vector import VectorService
+
+VECTOR = [0.25, -0.5, 0.125, 1.0]
+
+def test_key_normalizes_whitespace_and_includes_model():
+    key = EmbeddingCache.key('what did I say  about\nwork ', 'text-embedding-ada-002')
+    assert key == EmbeddingCache.key('what did I say about work', 'text-embedding-ada-002')
+    assert key != EmbeddingCache.key('what did I say about work', 'text-embedding-3-small')
+
+def test_vectors_are_packed():
+    assert len(pack(VECTOR)) == 16
+    assert len(pack(VECTOR, 'float16')) == 8
+
+def test_memory_tier_evicts_by_bytes():
+    cache = EmbeddingCache(memory_bytes=40)
+    cache.put('a', 'model', VECTOR)
+    cache.put('b', 'model', VECTOR)
+    cache.get('a', 'model')
+    cache.put('c', 'model', VECTOR)
+
+    assert cache.get('a', 'model') == VECTOR
+    assert cache.get('b', 'model') is None
+    # Two 16-byte vectors, each behind a one-byte dtype tag
+    assert cache.stats()['memory_bytes'] == 34
+
+def test_disk_tier_is_shared(tmp_path):
+    path = str(tmp_path / 'embeddings.db')
+    EmbeddingCache(path=path, dtype='float16').put('a thought', 'model', VECTOR)
+
+    hits_before = CACHE_LOOKUPS.value(result='disk')
+    assert EmbeddingCache(path=path).get('a thought', 'model') == VECTOR
+    assert CACHE_LOOKUPS.value(result='disk') == hits_before + 1
+
+def test_disk_tier_is_size_bounded(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / 'embeddings.db'), max_bytes=20, sweep_interval=1)
+    cache.put('old', 'model', VECTOR)
+    cache.put('new', 'model', VECTOR)
+
+    fresh = EmbeddingCache(path=cache.path)
+    assert fresh.get('old', 'model') is None
+    assert fresh.get('new', 'model') == VECTOR
+
+async def test_repeated_queries_skip_openai(fake_openai):
+    client = MagicMock()
+    client.embeddings.create = AsyncMock(return_value=MagicMock(data=[MagicMock(embedding=VECTOR)]))
+    service = VectorService.__new__(VectorService)
+    service.openai = fake_openai(client)
+    service.embedding_cache = EmbeddingCache()
+    service.embedding_model = 'text-embedding-ada-002'
+
+    assert await service.get_embedding('what did I say about work') == VECTOR
+    assert await service.get_embedding('what did I say about  work') == VECTOR
+    client.embeddings.create.assert_awaited_once()
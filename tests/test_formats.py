@@ -0,0 +1,58 @@
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+import pytest
+from api.services.formats import format_from_content_type, sniff_format, whisper_accepts
+
+ROOT = Path(__file__).parent.parent
+
+@pytest.mark.parametrize('header, expected', [
+    (b'#!AMR\n\x3c', 'amr'),
+    (b'#!AMR-WB\n', 'amr'),
+    (b'ID3\x04\x00', 'mp3'),
+    (b'\xff\xfb\x90\x64', 'mp3'),
+    (b'\xff\xf1\x50\x80', 'aac'),
+    (b'\x00\x00\x00\x20ftypM4A \x00\x00', 'm4a'),
+    (b'\x00\x00\x00\x18ftypisom\x00\x00', 'mp4'),
+    (b'\x00\x00\x00\x18ftyp3gp4\x00\x00', '3gp'),
+    (b'OggS\x00\x02', 'ogg'),
+    (b'RIFF\x24\x00\x00\x00WAVEfmt ', 'wav'),
+    (b'\x1a\x45\xdf\xa3\x9f', 'webm'),
+    (b'fLaC\x00', 'flac'),
+    (b'not audio', None),
+])
+def test_sniff_format(header, expected):
+    assert sniff_format(header) == expected
+
+def test_sample_files():
+    assert sniff_format((ROOT / 'test.amr').read_bytes()) == 'amr'
+    assert sniff_format((ROOT / 'test.mp3').read_bytes()) == 'mp3'
+
+def test_whisper_accepts():
+    assert whisper_accepts('m4a') and whisper_accepts('ogg')
+    assert not whisper_accepts('amr') and not whisper_accepts('3gp') and not whisper_accepts(None)
+    assert format_from_content_type('audio/mp4; codecs=mp4a.40.2') == 'm4a'
+
+async def test_native_formats_skip_conversion(audio_service):
+    service = audio_service(audio=b'OggS\x00\x02 opus')
+
+    assert await service.transcribe_media('https://media', 'audio/ogg', '+15550001') == 'a thought'
+    service.convert.assert_not_awaited()
+    assert service._transcribe_audio.await_args.kwargs['filename'] == 'audio.ogg'
+
+async def test_amr_is_still_converted(audio_service):
+    service = audio_service(audio=b'#!AMR\n\x3c')
+
+    await service.transcribe_media('https://media', 'audio/amr', '+15550001')
+    service.convert.assert_awaited_once()
+
+async def test_webhook_skips_converter_for_native_formats():
+    from api import routes
+    form = {'MessageSid': 'SMnative1', 'From': '+15550001', 'MediaUrl0': 'https://media', 'MediaContentType0': 'audio/mp4'}
+
+    with patch.object(routes.settings, 'audio_transcoder', 'remote'), \
+         patch.object(routes.services.job_queue, 'enqueue') as enqueue, \
+         patch.object(routes, 'forward_to_rails_processor', new_callable=AsyncMock) as forward:
+        await routes.handle_webhook(form)
+
+    assert enqueue.call_args.args[0] == 'voice_note'
+    forward.assert_not_awaited()
@@ -0,0 +1,64 @@
+import asyncio
+from aiohttp import web
+from api.services.http_client import HTTPClientManager
+
+async def test_session_is_reused_across_calls():
+    manager = HTTPClientManager(limit=10, limit_per_host=5)
+    
+    async def grab(session):
+        return session
+    
+    first = await manager.run(grab)
+    assert await manager.run(grab) is first
+    assert first.connector.limit == 10
+    assert first.connector.limit_per_host == 5
+    
+    manager.close()
+    assert first.closed
+
+async def test_stats_report_pool_utilization():
+    async def hello(request):
+        return web.Response(text='ok')
+    
+    app = web.Application()
+    app.router.add_get('/', hello)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    
+    manager = HTTPClientManager(limit=4)
+    
+    async def fetch(session):
+        async with session.get(f'http://127.0.0.1:{port}/') as response:
+            return await response.text()
+    
+    try:
+        for _ in range(3):
+            assert await manager.run(fetch) == 'ok'
+        
+        stats = manager.stats()
+        assert stats['sessions'] == 1
+        assert stats['sessions_created'] == 1
+        assert stats['connections_in_use'] == 0
+        # Keep-alive leaves the single connection idle in the pool
+        assert stats['connections_idle'] == 1
+    finally:
+        manager.close()
+        await runner.cleanup()
+
+def test_one_session_serves_every_caller_loop():
+    # Flask runs each async view on a fresh loop; they must all share the pool
+    manager = HTTPClientManager()
+    
+    async def grab(session):
+        return session
+    
+    first = asyncio.run(manager.run(grab))
+    second = asyncio.run(manager.run(grab))
+    
+    assert first is second
+    assert manager.stats()['sessions_created'] == 1
+    manager.close()
+    assert first.closed
@@ -0,0 +1,74 @@
+import time
+from unittest.mock import AsyncMock, patch
+from api.services.idempotency import IdempotencyCache
+
+def test_duplicate_is_short_circuited():
+    cache = IdempotencyCache(ttl=60)
+    
+    assert cache.reserve('webhook:SM1') is True
+    assert cache.reserve('webhook:SM1') is False
+    assert cache.get('webhook:SM1') is None  # still in flight
+    
+    cache.put('webhook:SM1', '<Response />')
+    assert cache.get('webhook:SM1') == '<Response />'
+
+def test_entries_expire_and_are_bounded():
+    cache = IdempotencyCache(ttl=0.05, max_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.reserve(key)
+        cache.put(key, key)
+    
+    assert cache.get('a') is None  # evicted by the size bound
+    time.sleep(0.1)
+    assert cache.reserve('c') is True  # expired
+
+def test_release_allows_retry():
+    cache = IdempotencyCache()
+    cache.reserve('key')
+    cache.release('key')
+    assert cache.reserve('key') is True
+
+def test_shared_sqlite_file(tmp_path):
+    path = str(tmp_path / 'idempotency.db')
+    first = IdempotencyCache(path=path)
+    second = IdempotencyCache(path=path)
+    
+    assert first.reserve('webhook:SM2') is True
+    assert second.reserve('webhook:SM2') is False
+    
+    first.put('webhook:SM2', '<Response />')
+    assert second.get('webhook:SM2') == '<Response />'
+
+def test_webhook_retry_replays_twiml(test_client):
+    form = {'From': '+1234567890', 'Body': 'What did I say about work?', 'MessageSid': 'SM-retry-test'}
+    mock_chat = AsyncMock(return_value="You said work is busy.")
+    
+    with patch('api.services.chat.ChatService.process_message', mock_chat), \
+         patch('api.services.storage.StorageService.store_chat_message', AsyncMock()):
+        first = test_client.post('/webhook', data=form)
+        second = test_client.post('/webhook', data=form)
+    
+    assert mock_chat.await_count == 1
+    assert first.get_data(as_text=True) == second.get_data(as_text=True)
+    assert 'You said work is busy.' in second.get_data(as_text=True)
+
+def test_expired_rows_are_swept(tmp_path):
+    cache = IdempotencyCache(ttl=0.01, path=str(tmp_path / 'idempotency.db'), sweep_interval=3)
+    for sid in ('SM1', 'SM2'):
+        cache.reserve(f"webhook:{sid}")
+    time.sleep(0.02)
+    
+    # The third reservation sweeps the rows whose MessageSids will never come back
+    cache.reserve('webhook:SM3')
+    assert cache._db.get().execute('SELECT key FROM idempotency').fetchall() == [('webhook:SM3',)]
+
+async def test_retry_while_in_flight_gets_a_processing_reply():
+    from api import routes
+    form = {'MessageSid': 'SMinflight1', 'From': '+15550001', 'MediaUrl0': 'https://media', 'MediaContentType0': 'audio/amr'}
+    routes.services.idempotency_cache.reserve('webhook:SMinflight1')
+    
+    with patch.object(routes, 'forward_to_rails_processor', new_callable=AsyncMock) as forward:
+        twiml, status_code = await routes.handle_webhook(form)
+    
+    assert status_code == 202
+    forward.assert_not_awaited()
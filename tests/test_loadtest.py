@@ -0,0 +1,138 @@
+import asyncio
+import random
+import aiohttp
+import pytest
+from unittest.mock import MagicMock
+from aiohttp import web
+
+from loadtest.fakes import FakeDependencies, LatencyProfile, default_profiles, parse_profiles
+from loadtest.traffic import LoadGenerator, parse_mix, percentile, summarize
+
+def test_percentile_nearest_rank():
+    values = [i / 100 for i in range(1, 101)]
+    assert percentile(values, 50) == 0.5
+    assert percentile(values, 95) == 0.95
+    assert percentile(values, 99) == 0.99
+    assert percentile([0.3], 99) == 0.3
+    assert percentile([], 50) == 0.0
+
+def test_summarize_counts_errors_separately():
+    summary = summarize([0.1, 0.2, 0.3, 0.4], errors=1, duration=2.0)
+    assert summary['requests'] == 5
+    assert summary['ok'] == 4
+    assert summary['throughput'] == 2.0
+    assert summary['max'] == 0.4
+
+def test_parse_mix_normalizes_weights():
+    assert parse_mix('text=6,voice=3,tag=1') == {'text': 0.6, 'voice': 0.3, 'tag': 0.1}
+    with pytest.raises(ValueError):
+        parse_mix('video=1')
+
+class QueuedResponse:
+    status = 202
+
+    async def text(self):
+        return '<Response/>'
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+async def test_queued_voice_notes_count_as_ok():
+    generator = LoadGenerator('http://app', 'http://fakes', rps=1, seed=1)
+    session = MagicMock()
+    session.post.return_value = QueuedResponse()
+
+    await generator._send(session, 'voice')
+    await generator._send(session, 'text')
+    assert len(generator.latencies['voice']) == 1
+    # Text replies come back straight away, so a 202 there is still unexpected
+    assert dict(generator.error_kinds) == {'text:http_202': 1}
+
+def test_latency_profile_parsing_and_sampling():
+    profile = LatencyProfile.parse('0.2:0.5:fixed')
+    assert profile.sample() == 0.2
+    assert profile.error_rate == 0.5
+
+    rng = random.Random(7)
+    samples = sorted(LatencyProfile(0.1).sample(rng) for _ in range(2001))
+    assert 0.08 < samples[1000] < 0.12
+
+    profiles = parse_profiles(['twilio_send=0.1:0.2'])
+    assert profiles['twilio_send'].error_status == 429
+    with pytest.raises(ValueError):
+        parse_profiles(['redis=0.1'])
+
+@pytest.fixture
+async def fakes():
+    profiles = {name: LatencyProfile(0, distribution='fixed') for name in default_profiles()}
+    fakes = FakeDependencies(profiles, seed=1)
+    await fakes.start()
+    yield fakes
+    await fakes.stop()
+
+async def test_fakes_serve_dependency_apis(fakes):
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"{fakes.base_url}/v1/embeddings", json={'input': 'hello', 'model': 'm'}) as response:
+            data = await response.json()
+        assert len(data['data'][0]['embedding']) == 1536
+
+        async with session.post(f"{fakes.base_url}/rest/v1/thoughts", json={'transcription': 'hi'}) as response:
+            rows = await response.json()
+        assert response.status == 201
+        assert rows[0]['transcription'] == 'hi' and rows[0]['id']
+
+        async with session.post(f"{fakes.base_url}/vectors/upsert", json={'vectors': [{'id': 'a', 'values': [0.1]}]}) as response:
+            assert (await response.json()) == {'upsertedCount': 1}
+
+    assert fakes.stats()['openai_embeddings'] == {'calls': 1, 'errors': 0}
+
+async def test_fakes_inject_errors(fakes):
+    fakes.profiles['twilio_send'] = LatencyProfile(0, distribution='fixed', error_rate=1.0, error_status=429)
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"{fakes.base_url}/2010-04-01/Accounts/AC1/Messages.json", data={'Body': 'x'}) as response:
+            assert response.status == 429
+    assert fakes.stats()['twilio_send']['errors'] == 1
+
+async def test_voice_note_round_trip_is_tracked(fakes):
+    """Media -> converter -> callback carries the token through to the reply SMS"""
+    callbacks = asyncio.Queue()
+
+    async def audio_callback(request):
+        await callbacks.put(await request.json())
+        return web.json_response({'status': 'queued'}, status=202)
+
+    app = web.Application()
+    app.router.add_post('/audio-callback', audio_callback)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    app_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    generator = LoadGenerator(app_url, fakes.base_url, rps=1, users=1)
+    form = generator._form('voice', '+15550000001')
+    token = form['MediaUrl0'].rsplit('/', 1)[1]
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get(form['MediaUrl0']) as response:
+            audio = await response.read()
+        upload = aiohttp.FormData()
+        upload.add_field('audio', audio, filename='audio.amr', content_type='audio/amr')
+        upload.add_field('callback_url', f"{app_url}/audio-callback")
+        upload.add_field('from_number', '+15550000001')
+        async with session.post(f"{fakes.base_url}/convert", data=upload) as response:
+            assert response.status == 200
+
+        callback = await asyncio.wait_for(callbacks.get(), timeout=5)
+        assert token in callback['transcription']
+
+        reply = f"I've recorded your thought! Here's what I heard: {callback['transcription']}"
+        async with session.post(f"{fakes.base_url}/2010-04-01/Accounts/AC1/Messages.json",
+                                data={'Body': reply, 'To': '+15550000001'}) as response:
+            assert response.status == 201
+
+    await runner.cleanup()
+    assert len(generator.voice_end_to_end(fakes.delivered)) == 1
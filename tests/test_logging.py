@@ -0,0 +1,48 @@
+import json
+import logging
+from api.logging_config import JSONFormatter, RedactingFormatter, SamplingFilter, DeferredQueueHandler, parse_sample_rates, redact_phone
+
+def _record(msg, *args, level=logging.INFO, **extra):
+    record = logging.LogRecord('api.test', level, __file__, 1, msg, args, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+def test_phone_numbers_are_masked():
+    assert redact_phone("Sending SMS to +17805551234") == "Sending SMS to +*********34"
+    assert redact_phone("2024-01-01 12:00:00,123") == "2024-01-01 12:00:00,123"
+
+def test_json_records_redact_user_content():
+    record = _record("Processing text from %s", '+17805551234', event='sms.text', body='my secret thought')
+    entry = json.loads(JSONFormatter().format(record))
+    
+    assert entry['msg'] == "Processing text from +*********34"
+    assert entry['event'] == 'sms.text'
+    assert entry['body'] == '<redacted 17 chars>'
+
+def test_text_format_masks_message_only():
+    formatter = RedactingFormatter('%(levelname)s %(message)s')
+    assert formatter.format(_record("To %s", '+17805551234')) == "INFO To +*********34"
+
+def test_sampling_keeps_warnings():
+    sampler = SamplingFilter(parse_sample_rates('webhook.received=0'))
+    
+    assert not sampler.filter(_record("Webhook received", event='webhook.received'))
+    assert sampler.filter(_record("Webhook failed", level=logging.WARNING, event='webhook.received'))
+    assert sampler.filter(_record("Other event", event='chat.response'))
+
+def test_queue_handler_defers_formatting():
+    class Loud:
+        formatted = False
+        def __str__(self):
+            Loud.formatted = True
+            return 'loud'
+    
+    queued = []
+    handler = DeferredQueueHandler(None)
+    handler.enqueue = queued.append
+    handler.handle(_record("value: %s", Loud()))
+    
+    assert len(queued) == 1
+    assert Loud.formatted is False
+    assert queued[0].getMessage() == 'value: loud'
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from api.services.mailbox import KeyedExecutor
+from api.services.sms import SMSService
+
+@pytest.fixture
+def executor():
+    executor = KeyedExecutor(idle_timeout=0.1)
+    yield executor
+    executor.close()
+
+async def test_same_key_runs_in_order(executor):
+    events = []
+
+    async def work(label, delay):
+        events.append(('start', label))
+        await asyncio.sleep(delay)
+        events.append(('end', label))
+        return label
+
+    results = await asyncio.gather(
+        executor.run('+15550001', work, 'voice', 0.05),
+        executor.run('+15550001', work, 'tags', 0)
+    )
+
+    assert results == ['voice', 'tags']
+    assert events == [('start', 'voice'), ('end', 'voice'), ('start', 'tags'), ('end', 'tags')]
+
+async def test_different_keys_run_in_parallel(executor):
+    async def work():
+        await asyncio.sleep(0.1)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(executor.run(f"+1555000{i}", work) for i in range(10)))
+    assert time.perf_counter() - start < 0.5
+
+async def test_errors_propagate_and_mailbox_keeps_going(executor):
+    async def fail():
+        raise ValueError("boom")
+
+    async def ok():
+        return 'ok'
+
+    with pytest.raises(ValueError):
+        await executor.run('+15550001', fail)
+    assert await executor.run('+15550001', ok) == 'ok'
+
+async def test_idle_mailboxes_are_reaped(executor):
+    async def noop():
+        return None
+
+    await asyncio.gather(*(executor.run(f"+1555000{i}", noop) for i in range(5)))
+    assert len(executor) == 5
+    await asyncio.sleep(0.3)
+    assert len(executor) == 0
+    assert not executor._drainers
+
+def test_order_holds_across_threads(executor):
+    """Flask runs each request on its own loop and thread"""
+    events = []
+    started = threading.Event()
+
+    async def voice_note():
+        started.set()
+        await asyncio.sleep(0.05)
+        events.append('thought stored')
+
+    async def tag_reply():
+        events.append('tags stored')
+
+    first = threading.Thread(target=lambda: asyncio.run(executor.run('+15550001', voice_note)))
+    first.start()
+    started.wait(1)
+    asyncio.run(executor.run('+15550001', tag_reply))
+    first.join()
+
+    assert events == ['thought stored', 'tags stored']
+
+async def test_tag_reply_waits_for_voice_note(executor):
+    storage = MagicMock()
+    tags = MagicMock()
+    tags.suggest_tags = AsyncMock(return_value=['ideas'])
+    tags.process_tag_confirmation = AsyncMock(return_value=['ideas'])
+    tags.store_thought_tags = AsyncMock()
+
+    async def store_thought(from_number, transcription):
+        await asyncio.sleep(0.05)
+        return {'id': 'thought-1'}
+    storage.store_thought = store_thought
+
+    audio = MagicMock()
+    audio.process_audio = AsyncMock(return_value='a thought')
+    sms = SMSService(MagicMock(), '+15550000', audio_service=audio, storage_service=storage,
+                     tag_service=tags, mailboxes=executor)
+    sms.send_sms = AsyncMock()
+
+    await asyncio.gather(
+        sms.handle_message('+15550001', '', media_url='https://media', content_type='audio/amr'),
+        sms.handle_message('+15550001', 'ideas')
+    )
+
+    tags.store_thought_tags.assert_awaited_once_with('thought-1', ['ideas'], '+15550001')
+
+async def test_inline_jobs_for_one_sender_run_in_order(executor):
+    from api import routes
+    events = []
+
+    async def job(payload):
+        events.append(('start', payload['n']))
+        await asyncio.sleep(0.05 if payload['n'] == 1 else 0)
+        events.append(('end', payload['n']))
+
+    with patch.object(routes.settings, 'job_worker', False), \
+         patch.dict(routes.services.__dict__, {'user_mailboxes': executor}), \
+         patch.dict(routes.JOB_HANDLERS, {'voice_note': job}):
+        await asyncio.gather(
+            routes.dispatch_job('voice_note', {'from_number': '+15550001', 'n': 1}),
+            routes.dispatch_job('voice_note', {'from_number': '+15550001', 'n': 2})
+        )
+
+    assert events == [('start', 1), ('end', 1), ('start', 2), ('end', 2)]
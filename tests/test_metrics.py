@@ -0,0 +1,45 @@
+import pytest
+from api.services.metrics import Registry, STAGE_LATENCY, STAGE_CALLS, track
+
+def test_histogram_renders_prometheus_text():
+    registry = Registry()
+    latency = registry.histogram('stage_seconds', 'Stage latency', ('stage',), buckets=(0.1, 1.0))
+    latency.observe(0.05, stage='embedding')
+    latency.observe(0.5, stage='embedding')
+    
+    text = registry.render()
+    assert '# TYPE stage_seconds histogram' in text
+    assert 'stage_seconds_bucket{stage="embedding",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="embedding",le="1.0"} 2' in text
+    assert 'stage_seconds_bucket{stage="embedding",le="+Inf"} 2' in text
+    assert 'stage_seconds_count{stage="embedding"} 2' in text
+
+def test_labels_are_validated():
+    registry = Registry()
+    counter = registry.counter('calls_total', 'Calls', ('stage',))
+    with pytest.raises(ValueError):
+        counter.inc(route='/webhook')
+
+async def test_track_decorator_and_context_manager():
+    @track('test_decorated')
+    async def work():
+        return 42
+    
+    assert await work() == 42
+    
+    with pytest.raises(RuntimeError):
+        with track('test_context'):
+            raise RuntimeError("boom")
+    
+    assert STAGE_LATENCY.count(stage='test_decorated') == 1
+    assert STAGE_CALLS.value(stage='test_decorated', outcome='success') == 1
+    assert STAGE_CALLS.value(stage='test_context', outcome='error') == 1
+
+def test_metrics_endpoint(test_client):
+    test_client.get('/status')
+    response = test_client.get('/metrics')
+    
+    assert response.status_code == 200
+    text = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{route="/status",status="200"}' in text
+    assert 'job_queue_depth{state="pending"}' in text
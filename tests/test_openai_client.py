@@ -0,0 +1,45 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+from api.container import ServiceContainer
+from api.services.chat import ChatService
+from api.services.openai_client import OpenAIClientManager
+
+def test_one_client_serves_every_caller_loop():
+    # Flask runs each async view on a fresh loop; they must all share the pool
+    manager = OpenAIClientManager(api_key='test-key', http2=False)
+
+    async def grab(client):
+        return client
+
+    first = asyncio.run(manager.run(grab))
+    second = asyncio.run(manager.run(grab))
+    assert first is second
+    assert first.max_retries == 2
+    manager.close()
+    assert first.is_closed()
+
+def test_services_share_one_manager():
+    services = ServiceContainer()
+    services.__dict__['vector_service'] = MagicMock()
+    services.__dict__['storage_service'] = MagicMock()
+    assert services.audio_service.openai is services.openai_client
+    assert services.chat_service.openai is services.openai_client
+    assert services.tag_service.openai is services.openai_client
+
+async def test_chat_completions_overlap(fake_openai):
+    async def slow_completion(**kwargs):
+        await asyncio.sleep(0.2)
+        return MagicMock(choices=[MagicMock(message=MagicMock(content='reply'))])
+
+    client = MagicMock()
+    client.chat.completions.create = slow_completion
+    storage = MagicMock()
+    storage.search_thoughts = AsyncMock(return_value=[])
+    chat = ChatService(fake_openai(client), storage_service=storage)
+
+    start = time.perf_counter()
+    replies = await asyncio.gather(*(chat.process_message('+15550001', 'hi') for _ in range(5)))
+    assert replies == ['reply'] * 5
+    # Five 0.2s completions on one loop finish together rather than back to back
+    assert time.perf_counter() - start < 0.5
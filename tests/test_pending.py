@@ -0,0 +1,64 @@
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from api.services.pending import MemoryPendingStore, SQLitePendingStore, create_pending_store
+from api.services.sms import SMSService
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_store(request, tmp_path):
+    def make(**kwargs):
+        if request.param == 'memory':
+            return MemoryPendingStore(**kwargs)
+        return SQLitePendingStore(str(tmp_path / 'pending.db'), sweep_interval=1, **kwargs)
+    return make
+
+def test_put_get_pop(make_store):
+    store = make_store()
+    store.put('+15550001', 'thought-1')
+    assert store.get('+15550001') == 'thought-1'
+    assert store.pop('+15550001') == 'thought-1'
+    assert store.get('+15550001') is None
+    assert store.pop('+15550001') is None
+
+def test_entries_expire_without_being_read(make_store):
+    store = make_store(ttl=0.05)
+    store.put('+15550001', 'thought-1')
+    time.sleep(0.1)
+    assert store.get('+15550001') is None
+
+    # A later write sweeps the expired entry even though nobody read it again
+    store.put('+15550002', 'thought-2')
+    store.put('+15550003', 'thought-3')
+    assert store.expire() == 0
+    assert len(store) == 2
+
+def test_entry_cap(make_store):
+    store = make_store(max_entries=2)
+    for i in range(3):
+        store.put(f"+1555000{i}", f"thought-{i}")
+    assert len(store) == 2
+    assert store.get('+15550000') is None
+    assert store.get('+15550002') == 'thought-2'
+
+def test_sqlite_store_is_shared(tmp_path):
+    path = str(tmp_path / 'pending.db')
+    worker = create_pending_store('sqlite', path=path)
+    web = create_pending_store('sqlite', path=path)
+
+    worker.put('+15550001', 'thought-1')
+    assert web.get('+15550001') == 'thought-1'
+    assert web.pop('+15550001') == 'thought-1'
+    assert worker.get('+15550001') is None
+
+    with pytest.raises(ValueError):
+        create_pending_store('redis')
+
+async def test_skip_clears_pending_thought():
+    sms = SMSService(MagicMock(), '+15550000000', tag_service=MagicMock())
+    sms.send_sms = AsyncMock()
+
+    sms._store_pending_thought('+15550001', 'thought-1')
+    await sms.handle_message('+15550001', 'skip')
+
+    assert sms._get_pending_thought('+15550001') is None
+    sms.send_sms.assert_awaited_once()
@@ -0,0 +1,68 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from api.services.pipeline import Stage, run_stages, ThoughtPipeline
+
+async def test_stages_run_after_dependencies():
+    order = []
+    
+    async def first():
+        order.append('first')
+        return 1
+    
+    async def second(first):
+        order.append('second')
+        return first + 1
+    
+    results = await run_stages([Stage('second', second, depends_on=('first',)), Stage('first', first)])
+    
+    assert results == {'first': 1, 'second': 2}
+    assert order == ['first', 'second']
+
+async def test_cycle_is_rejected():
+    async def noop(**kwargs):
+        return None
+    
+    with pytest.raises(ValueError):
+        await run_stages([Stage('a', noop, depends_on=('b',)), Stage('b', noop, depends_on=('a',))])
+
+async def test_thought_pipeline_runs_calls_concurrently():
+    def slow(result):
+        async def call(*args, **kwargs):
+            await asyncio.sleep(0.1)
+            return result
+        return AsyncMock(side_effect=call)
+    
+    storage = MagicMock()
+    storage.store_thought = slow({'id': 'thought-1', 'created_at': 'now'})
+    vector = MagicMock()
+    vector.get_embedding = slow([0.1, 0.2])
+    vector.store_embedding = AsyncMock(return_value=True)
+    tags = MagicMock()
+    tags.suggest_tags = slow(['work'])
+    
+    start = time.monotonic()
+    result = await ThoughtPipeline(storage, vector, tags).run('+1234567890', 'Ship the report')
+    elapsed = time.monotonic() - start
+    
+    assert result == {'thought': {'id': 'thought-1', 'created_at': 'now'}, 'tags': ['work']}
+    assert elapsed < 0.25
+    
+    # The thought id is joined into the vector metadata once it is known
+    kwargs = vector.store_embedding.call_args.kwargs
+    assert kwargs['metadata']['thought_id'] == 'thought-1'
+    assert kwargs['embedding'] == [0.1, 0.2]
+    # Retries overwrite the thought's vector instead of adding another
+    assert kwargs['vector_id'] == 'thought-1'
+
+async def test_thought_pipeline_propagates_storage_failure():
+    storage = MagicMock()
+    storage.store_thought = AsyncMock(side_effect=Exception("Supabase down"))
+    vector = MagicMock()
+    vector.get_embedding = AsyncMock(return_value=[0.1])
+    vector.store_embedding = AsyncMock()
+    
+    with pytest.raises(Exception, match="Supabase down"):
+        await ThoughtPipeline(storage, vector).run('+1234567890', 'text')
+    vector.store_embedding.assert_not_called()
@@ -0,0 +1,58 @@
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+import pytest
+from api.services.audio import AudioService, PREPROCESS_BYTES
+from api.services.spool import MemoryMeter, SpooledAudio
+from api.services.transcoder import FFmpegTranscoder, TranscodeError
+
+SAMPLE_AMR = Path(__file__).parent.parent / 'test.amr'
+
+def test_preprocess_command():
+    cmd = FFmpegTranscoder('ffmpeg').preprocess_command(-45, '16k')
+    filters = cmd[cmd.index('-af') + 1]
+    assert filters.count('silenceremove') == 2 and filters.count('areverse') == 2
+    assert cmd[cmd.index('-ac') + 1] == '1'
+    assert cmd[cmd.index('-ar') + 1] == '16000'
+    assert cmd[cmd.index('-codec:a') + 1] == 'libopus'
+    assert cmd[-3:] == ['-f', 'ogg', 'pipe:1']
+
+@pytest.mark.skipif(not FFmpegTranscoder.available(), reason="ffmpeg is not installed")
+async def test_preprocess_amr():
+    transcoder = FFmpegTranscoder()
+    ogg = await transcoder.preprocess(SAMPLE_AMR.read_bytes())
+    assert ogg.startswith(b'OggS')
+    transcoder.close()
+
+async def test_preprocessed_clips_skip_conversion(audio_service):
+    transcoder = MagicMock(sample_rate=16000)
+    transcoder.preprocess = AsyncMock(return_value=b'OggS small')
+    service = audio_service(audio=b'#!AMR\n' + b'\x00' * 100, transcoder=transcoder, preprocess_fraction=1)
+    saved_before = PREPROCESS_BYTES.value(stage='input') - PREPROCESS_BYTES.value(stage='output')
+
+    assert await service.transcribe_media('https://media', 'audio/amr', '+15550001') == 'a thought'
+    service.convert.assert_not_awaited()
+    assert service._transcribe_audio.await_args.kwargs == {'timeout': None, 'filename': 'audio.ogg', 'preprocessed': True}
+    assert PREPROCESS_BYTES.value(stage='input') - PREPROCESS_BYTES.value(stage='output') - saved_before == 96
+
+async def test_failed_preprocessing_falls_back_to_conversion(audio_service):
+    transcoder = MagicMock(sample_rate=16000)
+    transcoder.preprocess = AsyncMock(side_effect=TranscodeError("Invalid data found"))
+    transcoder.transcode = AsyncMock(return_value=b'ID3 mp3')
+    service = audio_service(audio=b'#!AMR\n' + b'\x00' * 100, transcoder=transcoder, preprocess_fraction=1)
+
+    assert await service.transcribe_media('https://media', 'audio/amr', '+15550001') == 'a thought'
+    service.convert.assert_awaited_once()
+
+async def test_meter_is_released_when_whisper_fails(audio_service):
+    transcoder = MagicMock(sample_rate=16000)
+    transcoder.preprocess = AsyncMock(return_value=b'OggS small')
+    service = audio_service(transcoder=transcoder, preprocess_fraction=1)
+    service._transcribe_audio.side_effect = RuntimeError("Whisper is down")
+    meter = MemoryMeter()
+
+    with SpooledAudio.from_bytes(b'#!AMR\n') as audio, pytest.raises(RuntimeError):
+        await service._transcribe_preprocessed(audio, meter)
+    assert meter.current == 0 and meter.peak == len(b'OggS small')
+
+def test_preprocessing_needs_the_local_transcoder():
+    assert AudioService(None, 'http://converter', preprocess_fraction=1).preprocess_fraction == 0
@@ -0,0 +1,137 @@
+import asyncio
+import time
+import pytest
+from api.services.queue import JobQueue
+from api.worker import drain
+
+@pytest.fixture
+def job_queue(tmp_path):
+    return JobQueue(str(tmp_path / 'jobs.db'), visibility_timeout=60, max_attempts=2, retry_backoff=0)
+
+def test_enqueue_claim_ack(job_queue):
+    job_id = job_queue.enqueue('audio_callback', {'from_number': '+1234567890'})
+    
+    job = job_queue.claim()
+    assert job['id'] == job_id
+    assert job['payload'] == {'from_number': '+1234567890'}
+    assert job['attempts'] == 1
+    
+    # Claimed jobs are invisible to other workers
+    assert job_queue.claim() is None
+    assert job_queue.stats()['running'] == 1
+    
+    assert job_queue.ack(job_id, job['token'])
+    assert job_queue.stats()['running'] == 0
+
+def test_failed_job_retries_then_dies(job_queue):
+    job_id = job_queue.enqueue('audio_callback', {})
+    
+    job = job_queue.claim()
+    job_queue.fail(job_id, 'boom', job['token'])
+    assert job_queue.stats()['pending'] == 1
+    
+    job = job_queue.claim()
+    assert job['attempts'] == 2
+    job_queue.fail(job_id, 'boom', job['token'])
+    
+    assert job_queue.claim() is None
+    assert job_queue.stats()['dead'] == 1
+
+def test_visibility_timeout_redelivers(tmp_path):
+    job_queue = JobQueue(str(tmp_path / 'jobs.db'), visibility_timeout=0)
+    job_id = job_queue.enqueue('audio_callback', {})
+    
+    assert job_queue.claim()['id'] == job_id
+    # The first worker never acked, so the job becomes visible again
+    assert job_queue.claim()['id'] == job_id
+
+def test_late_ack_from_a_lost_claim_is_ignored(tmp_path):
+    job_queue = JobQueue(str(tmp_path / 'jobs.db'), visibility_timeout=0)
+    job_id = job_queue.enqueue('audio_callback', {})
+    
+    stale = job_queue.claim()
+    current = job_queue.claim()
+    assert stale['token'] != current['token']
+    
+    # The first worker finishes after its claim expired; the second attempt is untouched
+    assert not job_queue.ack(job_id, stale['token'])
+    assert not job_queue.fail(job_id, 'late', stale['token'])
+    assert job_queue.stats()['running'] == 1
+    assert job_queue.ack(job_id, current['token'])
+
+def test_jobs_for_one_sender_run_in_order(job_queue):
+    first = job_queue.enqueue('voice_note', {'from_number': '+15550001'})
+    second = job_queue.enqueue('audio_callback', {'from_number': '+15550001'})
+    other = job_queue.enqueue('audio_callback', {'from_number': '+15550002'})
+    
+    job = job_queue.claim()
+    assert job['id'] == first
+    # The sender's next job waits for the first; other senders don't
+    assert job_queue.claim()['id'] == other
+    assert job_queue.claim() is None
+    
+    job_queue.ack(first, job['token'])
+    assert job_queue.claim()['id'] == second
+
+def test_dead_jobs_stop_blocking_their_sender(job_queue):
+    first = job_queue.enqueue('voice_note', {'from_number': '+15550001'})
+    second = job_queue.enqueue('voice_note', {'from_number': '+15550001'})
+    
+    for _ in range(2):
+        job_queue.fail(first, 'boom', job_queue.claim()['token'])
+    assert job_queue.claim()['id'] == second
+
+async def test_drain_processes_jobs(job_queue):
+    processed = []
+    stop = asyncio.Event()
+    
+    async def handler(payload):
+        processed.append(payload)
+        stop.set()
+    
+    job_queue.enqueue('audio_callback', {'transcription': 'hello'})
+    await drain(job_queue, {'audio_callback': handler}, stop, poll_interval=0.01)
+    
+    assert processed == [{'transcription': 'hello'}]
+    assert job_queue.stats()['pending'] == 0
+
+async def test_drain_runs_jobs_concurrently(job_queue):
+    stop = asyncio.Event()
+    done = []
+    
+    async def handler(payload):
+        await asyncio.sleep(0.2)
+        done.append(payload['from_number'])
+        if len(done) == 3:
+            stop.set()
+    
+    for i in range(3):
+        job_queue.enqueue('audio_callback', {'from_number': f'+1555000{i}'})
+    
+    start = asyncio.get_running_loop().time()
+    await drain(job_queue, {'audio_callback': handler}, stop, poll_interval=0.01, concurrency=3)
+    assert asyncio.get_running_loop().time() - start < 0.5
+    assert sorted(done) == ['+15550000', '+15550001', '+15550002']
+
+async def test_drain_claims_off_the_event_loop(job_queue, monkeypatch):
+    stop = asyncio.Event()
+    claim = job_queue.claim
+    lags = []
+
+    def slow_claim():
+        # Stands in for a claim waiting on another process's write lock
+        time.sleep(0.3)
+        return claim()
+
+    async def handler(payload):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.sleep(0.01)
+        lags.append(loop.time() - start)
+        stop.set()
+
+    monkeypatch.setattr(job_queue, 'claim', slow_claim)
+    job_queue.enqueue('audio_callback', {'from_number': '+15550001'})
+    await drain(job_queue, {'audio_callback': handler}, stop, poll_interval=0.01, concurrency=2)
+    # The running job kept ticking while the next claim waited
+    assert lags and lags[0] < 0.2
@@ -0,0 +1,83 @@
+import os
+import pytest
+from aiohttp import web
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+from api.services.transcription_cache import TranscriptionCache
+
+@pytest.fixture
+async def media_servers():
+    """Local stand-ins for the Twilio media URL and the converter"""
+    audio = os.urandom(1024 * 1024)
+    received = {}
+    
+    async def media(request):
+        response = web.StreamResponse()
+        await response.prepare(request)
+        for i in range(0, len(audio), 8192):
+            await response.write(audio[i:i + 8192])
+        await response.write_eof()
+        return response
+    
+    async def convert(request):
+        received['chunked'] = 'chunked' in request.headers.get('Transfer-Encoding', '')
+        reader = await request.multipart()
+        async for part in reader:
+            received[part.name] = await part.read()
+        return web.json_response({'status': 'processing'})
+    
+    app = web.Application(client_max_size=10 * 1024 * 1024)
+    app.router.add_get('/media', media)
+    app.router.add_post('/convert', convert)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    
+    yield base_url, audio, received
+    await runner.cleanup()
+
+@pytest.mark.parametrize('streaming', [True, False])
+async def test_media_is_relayed_to_converter(media_servers, streaming):
+    from api import routes
+    base_url, audio, received = media_servers
+    
+    with patch.object(routes.settings, 'audio_converter_url', base_url), \
+         patch.object(routes.settings, 'twilio_account_sid', 'ACtest'), \
+         patch.object(routes.settings, 'twilio_auth_token', 'token'), \
+         patch.object(routes.settings, 'media_relay_streaming', streaming), \
+         patch.dict(routes.services.__dict__, {'transcription_cache': TranscriptionCache()}):
+        await routes.forward_to_rails_processor('+1234567890', f"{base_url}/media", 'audio/amr')
+    routes.http_client.close()
+    
+    assert received['audio'] == audio
+    assert received['from_number'] == b'+1234567890'
+    # Only the streamed upload has no known length up front
+    assert received['chunked'] is streaming
+
+async def test_buffered_relay_reuses_cached_transcription(media_servers):
+    from api import routes
+    base_url, audio, received = media_servers
+    
+    with patch.object(routes.settings, 'audio_converter_url', base_url), \
+         patch.object(routes.settings, 'twilio_account_sid', 'ACtest'), \
+         patch.object(routes.settings, 'twilio_auth_token', 'token'), \
+         patch.object(routes.settings, 'media_relay_streaming', False), \
+         patch.dict(routes.services.__dict__, {'transcription_cache': TranscriptionCache()}), \
+         patch('api.routes.job_queue.enqueue', return_value=1) as enqueue:
+        await routes.forward_to_rails_processor('+1234567890', f"{base_url}/media", 'audio/amr')
+        callback_url = received.pop('callback_url').decode()
+        cache_key = parse_qs(urlparse(callback_url).query)['cache_key'][0]
+        await routes.handle_audio_callback(
+            {'from_number': '+1234567890', 'transcription': 'a thought'}, cache_key=cache_key
+        )
+        
+        # The same clip again: no upload, the cached transcription is queued straight away
+        received.clear()
+        await routes.forward_to_rails_processor('+1234567890', f"{base_url}/media", 'audio/amr')
+    routes.http_client.close()
+    
+    assert received == {}
+    assert enqueue.call_count == 2
+    enqueue.assert_called_with('audio_callback', {'from_number': '+1234567890', 'transcription': 'a thought'})
@@ -0,0 +1,63 @@
+from unittest.mock import MagicMock
+from api.services.segments import count_segments, encoding, normalize_gsm, truncate_to_fit
+from api.services.sms import SMS_SEGMENTS, SMSService
+
+def test_encoding_detection():
+    assert encoding('Hello @ 5€ [ok]') == 'GSM-7'
+    assert encoding('It’s done') == 'UCS-2'
+    assert encoding('Thanks 🙏') == 'UCS-2'
+
+def test_normalization_keeps_whisper_output_in_gsm7():
+    text = 'I said “let’s go” — then… naïve'
+    normalized = normalize_gsm(text)
+    assert normalized == 'I said "let\'s go" - then... naive'
+    assert encoding(normalized) == 'GSM-7'
+    # Characters with no GSM equivalent are left alone
+    assert normalize_gsm('こんにちは') == 'こんにちは'
+
+def test_segment_counts():
+    assert count_segments('a' * 160) == 1
+    assert count_segments('a' * 161) == 2
+    assert count_segments('a' * 306) == 2
+    assert count_segments('a' * 307) == 3
+    # Extended characters take two septets
+    assert count_segments('€' * 80) == 1
+    assert count_segments('€' * 81) == 2
+    assert count_segments('é' * 70 + '’') == 2
+    # Emoji are two UTF-16 code units each
+    assert count_segments('🙂' * 35) == 1
+    assert count_segments('🙂' * 36) == 2
+
+def test_truncate_to_fit_cuts_at_word_boundary():
+    text = 'one two three four five'
+    assert truncate_to_fit(text, lambda s: len(s) <= 100) == text
+    assert truncate_to_fit(text, lambda s: len(s) <= 14) == 'one two...'
+    assert truncate_to_fit(text, lambda s: len(s) <= 2) == ''
+
+def test_thought_reply_stays_within_budget():
+    sms = SMSService(MagicMock(), '+15550000', segment_budget=2)
+    transcription = ('So I’ve been thinking about the “garden project” again — ' * 20).strip()
+
+    reply = sms.compose_thought_reply(transcription, ['garden', 'ideas'])
+
+    assert encoding(reply) == 'GSM-7'
+    assert count_segments(reply) <= 2
+    assert '...' in reply
+    assert reply.endswith("or 'skip' to skip tagging.")
+    assert 'Suggested tags: garden, ideas' in reply
+
+def test_short_thought_is_echoed_in_full():
+    sms = SMSService(MagicMock(), '+15550000', segment_budget=2)
+    reply = sms.compose_thought_reply('Buy milk', ['errands'])
+    assert "Here's what I heard: Buy milk" in reply
+
+async def test_sends_record_segments():
+    sms = SMSService(MagicMock(), '+15550000')
+    sms.dispatcher = MagicMock()
+    before = SMS_SEGMENTS.count(encoding='GSM-7')
+
+    await sms.send_message('+15550001', 'It’s saved ' + 'x' * 200)
+
+    sent_body = sms.dispatcher.submit.call_args[0][1]
+    assert sent_body.startswith("It's saved")
+    assert SMS_SEGMENTS.count(encoding='GSM-7') == before + 1
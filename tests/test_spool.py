@@ -0,0 +1,71 @@
+import hashlib
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from api.services.audio import AudioService
+from api.services.spool import AudioTooLarge, MemoryMeter, SpooledAudio, limit_stream, spool_stream
+from api.services.transcoder import FFmpegTranscoder
+
+async def chunks_of(data: bytes, size: int = 1024):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+async def test_small_audio_stays_in_memory():
+    meter = MemoryMeter()
+    audio = await spool_stream(chunks_of(b'#!AMR\n' + b'\x00' * 2000), spill_bytes=4096, meter=meter)
+
+    assert not audio.spilled
+    assert audio.head.startswith(b'#!AMR')
+    assert audio.sha256 == hashlib.sha256(audio.getvalue()).hexdigest()
+    assert meter.peak == 2006
+    audio.close()
+    assert meter.current == 0
+
+async def test_large_audio_spills_to_disk():
+    data = os.urandom(10000)
+    meter = MemoryMeter()
+    audio = await spool_stream(chunks_of(data), spill_bytes=4096, meter=meter)
+
+    assert audio.spilled
+    assert audio.getvalue() == data
+    assert len(audio) == 10000
+    # Only what fit under the threshold was ever held in memory
+    assert meter.peak <= 4096 and meter.current == 0
+    audio.close()
+
+async def test_oversized_audio_is_cut_off():
+    with pytest.raises(AudioTooLarge):
+        await spool_stream(chunks_of(b'\x00' * 5000), spill_bytes=1024, max_bytes=4096)
+
+    relayed = []
+    with pytest.raises(AudioTooLarge):
+        async for chunk in limit_stream(chunks_of(b'\x00' * 5000), max_bytes=4096):
+            relayed.append(chunk)
+    assert sum(map(len, relayed)) == 4096
+
+async def test_ffmpeg_reads_spilled_audio_from_disk(tmp_path):
+    ffmpeg = tmp_path / 'ffmpeg'
+    ffmpeg.write_text("#!/bin/sh\nexec cat\n")
+    ffmpeg.chmod(0o755)
+    transcoder = FFmpegTranscoder(str(ffmpeg))
+    data = os.urandom(10000)
+
+    for spill_bytes in (4096, 65536):
+        with SpooledAudio.from_bytes(data, spill_bytes=spill_bytes) as audio:
+            assert await transcoder.transcode(audio) == data
+    transcoder.close()
+
+async def test_oversized_voice_note_gets_a_reply(audio_service):
+    service = audio_service(max_audio_bytes=10)
+    service._download_audio.side_effect = AudioTooLarge(11, 10)
+    assert 'too large' in await service.process_audio('https://media', 'audio/amr', '+15550001')
+
+async def test_uploads_read_from_the_spool(fake_openai):
+    client = MagicMock()
+    uploaded = []
+    client.audio.transcriptions.create = AsyncMock(side_effect=lambda **kwargs: uploaded.append(kwargs['file'][1].read()) or 'a thought')
+    service = AudioService(fake_openai(client), 'http://converter')
+
+    with SpooledAudio.from_bytes(b'ID3 mp3', spill_bytes=4) as audio:
+        assert await service._transcribe_audio(audio, timeout=None) == 'a thought'
+    assert uploaded == [b'ID3 mp3']
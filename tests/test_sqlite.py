@@ -0,0 +1,15 @@
+import sqlite3
+import threading
+from api.services.sqlite import SQLiteConnections
+
+def test_one_connection_per_thread(tmp_path):
+    db = SQLiteConnections(str(tmp_path / 'shared.db'), row_factory=sqlite3.Row)
+    assert db.get() is db.get()
+    assert db.get().execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(db.get()))
+    thread.start()
+    thread.join()
+    assert other[0] is not db.get()
+    assert other[0].row_factory is sqlite3.Row
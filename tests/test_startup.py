@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from api import settings
+
+PROJECT_ROOT = Path(__file__).parent.parent
+HEAVY_SDKS = ('openai', 'supabase', 'pinecone', 'twilio.rest')
+
+def _importtime(module: str) -> dict:
+    """Cumulative import time in microseconds per module, from python -X importtime"""
+    # No credentials: importing the app must not build any client
+    env = {k: v for k, v in os.environ.items() if not k.startswith(('OPENAI', 'SUPABASE', 'PINECONE', 'TWILIO'))}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(cumulative), name.startswith('  '))
+    return times
+
+def test_app_import_skips_heavy_sdks():
+    times = _importtime('api.routes')
+    loaded = [name for name in times if name.startswith(HEAVY_SDKS)]
+    assert loaded == []
+
+def test_app_import_within_startup_budget():
+    times = _importtime('api.routes')
+    # Top-level api imports include everything they pull in
+    total_us = sum(cumulative for name, (cumulative, nested) in times.items()
+                   if not nested and name.split('.')[0] == 'api')
+    assert total_us / 1000 < settings.startup_import_budget_ms
@@ -0,0 +1,27 @@
+from unittest.mock import MagicMock
+from api.services.storage import StorageService
+
+class MissingColumn(Exception):
+    code = 'PGRST204'
+
+async def test_thoughts_are_upserted_on_message_sid():
+    supabase = MagicMock()
+    supabase.table.return_value.upsert.return_value.execute.return_value = MagicMock(data=[{'id': 'thought-1'}], error=None)
+    storage = StorageService(supabase)
+
+    assert await storage.store_thought('+15550001', 'a thought', message_sid='SM1') == {'id': 'thought-1'}
+    data = supabase.table.return_value.upsert.call_args.args[0]
+    assert data['message_sid'] == 'SM1'
+    supabase.table.return_value.upsert.assert_called_once_with(data, on_conflict='message_sid')
+
+async def test_table_without_message_sid_falls_back_to_insert():
+    supabase = MagicMock()
+    supabase.table.return_value.upsert.return_value.execute.side_effect = MissingColumn("Could not find the 'message_sid' column")
+    supabase.table.return_value.insert.return_value.execute.return_value = MagicMock(data=[{'id': 'thought-1'}], error=None)
+    storage = StorageService(supabase)
+
+    assert await storage.store_thought('+15550001', 'a thought', message_sid='SM1') == {'id': 'thought-1'}
+    assert await storage.store_thought('+15550001', 'another', message_sid='SM2') == {'id': 'thought-1'}
+    # The missing column is only tried once
+    assert supabase.table.return_value.upsert.call_count == 1
+    assert 'message_sid' not in supabase.table.return_value.insert.call_args.args[0]
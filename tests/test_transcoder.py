@@ -0,0 +1,79 @@
+import asyncio
+import os
+import time
+import pytest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+from api.services.audio import AudioService
+from api.services.transcoder import FFmpegTranscoder, TranscodeError
+
+SAMPLE_AMR = Path(__file__).parent.parent / 'test.amr'
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path):
+    """Write a stand-in ffmpeg executable with the given shell body"""
+    def make(body):
+        path = tmp_path / 'ffmpeg'
+        path.write_text(f"#!/bin/sh\n{body}\n")
+        path.chmod(0o755)
+        return str(path)
+    return make
+
+async def test_audio_is_piped_through(fake_ffmpeg):
+    transcoder = FFmpegTranscoder(fake_ffmpeg('exec cat'), max_workers=2)
+    audio = b'#!AMR\n' + os.urandom(256 * 1024)
+    assert await transcoder.transcode(audio) == audio
+    transcoder.close()
+
+async def test_failures_raise(fake_ffmpeg):
+    transcoder = FFmpegTranscoder(fake_ffmpeg('echo "Invalid data found" >&2; exit 1'))
+    with pytest.raises(TranscodeError, match='Invalid data found'):
+        await transcoder.transcode(b'not audio')
+    transcoder.close()
+
+async def test_slow_jobs_time_out(fake_ffmpeg):
+    transcoder = FFmpegTranscoder(fake_ffmpeg('sleep 5'), timeout=0.2)
+    start = time.perf_counter()
+    with pytest.raises(TranscodeError, match='timed out'):
+        await transcoder.transcode(b'audio')
+    assert time.perf_counter() - start < 2
+    transcoder.close()
+
+async def test_pool_is_bounded(fake_ffmpeg):
+    transcoder = FFmpegTranscoder(fake_ffmpeg('sleep 0.2; cat'), max_workers=2)
+    start = time.perf_counter()
+    await asyncio.gather(*(transcoder.transcode(b'audio') for _ in range(4)))
+    # Four jobs through two slots take two rounds
+    assert time.perf_counter() - start >= 0.4
+    transcoder.close()
+
+@pytest.mark.skipif(not FFmpegTranscoder.available(), reason="ffmpeg is not installed")
+async def test_amr_to_mp3():
+    transcoder = FFmpegTranscoder()
+    mp3 = await transcoder.transcode(SAMPLE_AMR.read_bytes())
+    assert mp3[:3] == b'ID3' or mp3[0] == 0xFF
+    transcoder.close()
+
+async def test_audio_service_prefers_local_transcoder():
+    transcoder = MagicMock()
+    transcoder.transcode = AsyncMock(return_value=b'mp3')
+    service = AudioService(None, 'http://converter', transcoder=transcoder)
+    service._convert_audio = AsyncMock()
+
+    assert await service.convert(b'amr', 'audio/amr', '+15550001') == b'mp3'
+    service._convert_audio.assert_not_awaited()
+
+async def test_webhook_queues_voice_note_for_local_transcoding():
+    from api import routes
+    form = {'MessageSid': 'SMlocal1', 'From': '+15550001', 'MediaUrl0': 'https://media', 'MediaContentType0': 'audio/amr'}
+
+    with patch.object(routes.settings, 'audio_transcoder', 'local'), \
+         patch.object(routes.services.job_queue, 'enqueue') as enqueue, \
+         patch.object(routes, 'forward_to_rails_processor', new_callable=AsyncMock) as forward:
+        await routes.handle_webhook(form)
+
+    enqueue.assert_called_once_with('voice_note', {
+        'from_number': '+15550001', 'media_url': 'https://media', 'content_type': 'audio/amr',
+        'message_sid': 'SMlocal1'
+    })
+    forward.assert_not_awaited()
@@ -0,0 +1,24 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+from api.services.audio import AudioService
+
+def make_service(fake_openai, spill_threshold):
+    client = MagicMock()
+    client.audio.transcriptions.create = AsyncMock(return_value='a thought')
+    return AudioService(fake_openai(client), 'http://converter', spill_threshold=spill_threshold), client
+
+async def test_small_clips_upload_from_memory(fake_openai):
+    service, client = make_service(fake_openai, spill_threshold=1024)
+
+    with patch('api.services.audio.tempfile') as tempfile:
+        assert await service._transcribe_audio(memoryview(b'mp3 bytes'), timeout=None) == 'a thought'
+
+    tempfile.TemporaryFile.assert_not_called()
+    assert client.audio.transcriptions.create.call_args.kwargs['file'] == ('audio.mp3', b'mp3 bytes')
+
+async def test_large_clips_spill_to_disk(fake_openai):
+    service, client = make_service(fake_openai, spill_threshold=4)
+    uploaded = []
+    client.audio.transcriptions.create.side_effect = lambda **kwargs: uploaded.append(kwargs['file'][1].read()) or 'a thought'
+
+    assert await service._transcribe_audio(b'mp3 bytes', timeout=None) == 'a thought'
+    assert uploaded == [b'mp3 bytes']
@@ -0,0 +1,41 @@
+from api.services.transcription_cache import TranscriptionCache
+
+def test_key_depends_on_audio_and_model():
+    key = TranscriptionCache.key(b'amr', 'whisper-1')
+    assert key == TranscriptionCache.key(b'amr', 'whisper-1')
+    assert key != TranscriptionCache.key(b'amr2', 'whisper-1')
+    assert key != TranscriptionCache.key(b'amr', 'gpt-4o-transcribe')
+
+def test_memory_tier_is_lru():
+    cache = TranscriptionCache(max_entries=2)
+    cache.put('a', 'first')
+    cache.put('b', 'second')
+    cache.get('a')
+    cache.put('c', 'third')
+
+    assert cache.get('a') == 'first'
+    assert cache.get('b') is None
+    assert cache.get('c') == 'third'
+
+def test_disk_tier_is_shared_and_size_bounded(tmp_path):
+    path = str(tmp_path / 'transcriptions.db')
+    first = TranscriptionCache(path=path, max_bytes=10, sweep_interval=1)
+    second = TranscriptionCache(path=path, max_bytes=10, sweep_interval=1)
+
+    first.put('old', 'aaaaa')
+    assert second.get('old') == 'aaaaa'
+    first.put('new', 'bbbbbbbb')
+
+    # The least recently used row goes once the file holds more than 10 bytes
+    third = TranscriptionCache(path=path)
+    assert third.get('old') is None
+    assert third.get('new') == 'bbbbbbbb'
+
+async def test_hit_skips_conversion_and_whisper(audio_service):
+    service = audio_service(audio=b'amr', transcription_cache=TranscriptionCache())
+
+    assert await service.transcribe_media('https://media', 'audio/amr', '+15550001') == 'a thought'
+    assert await service.transcribe_media('https://media', 'audio/amr', '+15550001') == 'a thought'
+
+    service.convert.assert_awaited_once()
+    service._transcribe_audio.assert_awaited_once()
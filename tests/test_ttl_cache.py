@@ -0,0 +1,29 @@
+from unittest.mock import patch
+from api.services.metrics import registry
+from api.services.ttl_cache import TTLCache
+
+LOOKUPS = registry.counter('test_ttl_cache_total', 'Test cache lookups by result', ('result',))
+
+def test_memory_tier_is_bounded_by_entries_and_bytes():
+    cache = TTLCache('test_cache', LOOKUPS, max_entries=3, memory_bytes=6)
+    cache.put('a', b'aa')
+    cache.put('b', b'bb')
+    cache.put('c', b'cc')
+    cache.put('d', b'dddd')
+
+    assert cache.get('a') is None
+    assert cache.get('b') is None
+    assert cache.get('c') == b'cc'
+    assert cache.stats()['memory_bytes'] == 6
+
+def test_entries_expire_after_ttl(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = TTLCache('test_cache', LOOKUPS, path=path, ttl=60)
+    with patch('api.services.ttl_cache.time.time', return_value=1000.0):
+        cache.put('a', 'value')
+        assert cache.get('a') == 'value'
+
+    with patch('api.services.ttl_cache.time.time', return_value=1061.0):
+        assert cache.get('a') is None
+        assert TTLCache('test_cache', LOOKUPS, path=path, ttl=60).get('a') is None
+        assert cache.evict() == 1
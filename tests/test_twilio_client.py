@@ -0,0 +1,46 @@
+import pytest
+from aiohttp import web
+from api.services.http_client import HTTPClientManager
+from api.services.twilio_client import AsyncTwilioClient, TwilioAPIError
+
+@pytest.fixture
+async def twilio_api():
+    """Local stand-in for the Messages endpoint"""
+    received = []
+
+    async def create_message(request):
+        form = await request.post()
+        received.append({'auth': request.headers.get('Authorization'), 'sid': request.match_info['sid'], **form})
+        if form['To'] == '+15559999999':
+            return web.json_response({'code': 20429, 'message': 'Too Many Requests', 'status': 429}, status=429)
+        return web.json_response({'sid': 'SM123', 'status': 'queued', 'body': form['Body']}, status=201)
+
+    app = web.Application()
+    app.router.add_post('/2010-04-01/Accounts/{sid}/Messages.json', create_message)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    client = AsyncTwilioClient('ACtest', 'token', '+15550000000', HTTPClientManager(), base_url=base_url)
+    yield client, received
+    await client.close()
+    await runner.cleanup()
+
+async def test_send_message(twilio_api):
+    client, received = twilio_api
+    message = await client.send_message('+15550001', 'hello')
+
+    assert message['sid'] == 'SM123'
+    assert received[0]['sid'] == 'ACtest'
+    assert received[0]['From'] == '+15550000000'
+    assert received[0]['Body'] == 'hello'
+    assert received[0]['auth'].startswith('Basic ')
+
+async def test_errors_carry_status_for_retries(twilio_api):
+    client, _ = twilio_api
+    with pytest.raises(TwilioAPIError) as error:
+        await client.send_message('+15559999999', 'hello')
+    assert error.value.status == 429
+    assert error.value.code == 20429